@@ -0,0 +1,186 @@
+"""
+Admission control and load shedding.
+
+Every request is assigned to a RouteGroup by path prefix. A group serves at
+most `concurrency` requests at once; up to `max_queue` more may wait, each
+for at most `queue_timeout` seconds. Anything beyond that is refused straight
+away with 503 + Retry-After, so an overloaded worker answers quickly instead
+of queueing work that will time out anyway.
+
+TokenBucketLimiter adds a per-client rate limit (429 + Retry-After) keyed on
+the client address. X-Forwarded-For is only read when the peer is a trusted
+proxy, and then the rightmost hop that is not itself a trusted proxy is the
+client: everything left of it was written by the client and can be forged.
+"""
+
+import asyncio
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RouteGroup:
+    name: str
+    prefixes: tuple
+    concurrency: int
+    max_queue: int
+    queue_timeout: float
+    active: int = 0
+    waiting: int = 0
+    shed: int = 0
+    timed_out: int = 0
+    _semaphore: asyncio.Semaphore = field(default=None, repr=False)
+
+    @property
+    def semaphore(self):
+        # Created lazily so it binds to the loop that serves requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: float, max_clients: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, last refill)
+        self.limited = 0
+
+    def acquire(self, client: str) -> float:
+        """Take one token for `client`. Returns 0 if allowed, else seconds until a token is free."""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            wait = 0.0
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+            self.limited += 1
+        self._buckets[client] = (tokens, now)
+        # Oldest idle clients go first; a forgotten client simply starts with a full bucket
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def parse_trusted_proxies(spec: str) -> tuple:
+    """Networks from a comma-separated list of addresses / CIDR ranges ("127.0.0.1, 10.0.0.0/8")."""
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip())
+
+
+def _is_trusted(address: str, trusted_proxies) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_key(scope, trusted_proxies=()) -> str:
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not _is_trusted(peer, trusted_proxies):
+        return peer
+    hops = []
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            hops.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+    for hop in reversed(hops):
+        if hop and not _is_trusted(hop, trusted_proxies):
+            return hop
+    return peer
+
+
+async def _reject(send, status, retry_after, detail):
+    body = ('{"detail":"%s"}' % detail).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware enforcing RouteGroup limits and the optional rate limiter."""
+
+    def __init__(self, app, groups, limiter: TokenBucketLimiter = None, exclude_paths=("/api/health", "/metrics"),
+                 trusted_proxies=()):
+        self.app = app
+        self.trusted_proxies = trusted_proxies
+        # Longest prefix wins
+        self.routes = sorted(((prefix, group) for group in groups for prefix in group.prefixes), key=lambda r: -len(r[0]))
+        self.limiter = limiter
+        self.exclude_paths = set(exclude_paths)
+
+    def _group_for(self, path):
+        for prefix, group in self.routes:
+            if path.startswith(prefix):
+                return group
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        group = self._group_for(scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is not None:
+            wait = self.limiter.acquire(client_key(scope, self.trusted_proxies))
+            if wait:
+                await _reject(send, 429, wait, "Too many requests")
+                return
+
+        semaphore = group.semaphore
+        if semaphore.locked():
+            if group.waiting >= group.max_queue:
+                group.shed += 1
+                await _reject(send, 503, group.queue_timeout, "Server busy, try again shortly")
+                return
+            group.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), group.queue_timeout)
+            except asyncio.TimeoutError:
+                group.timed_out += 1
+                await _reject(send, 503, group.queue_timeout, "Server busy, try again shortly")
+                return
+            finally:
+                group.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        group.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.active -= 1
+            semaphore.release()
+
+
+def admission_snapshot(groups, limiter: TokenBucketLimiter = None) -> dict:
+    return {
+        "groups": {group.name: group.snapshot() for group in groups},
+        "rate_limited": limiter.limited if limiter else 0,
+    }
@@ -0,0 +1,65 @@
+"""
+Benchmark: perft of chessdata.bitboard on the standard test positions.
+
+Perft counts the leaf nodes of the legal move tree to a fixed depth. The
+counts below are the published reference values, so every row checks the
+move generator (castling, en passant, promotions, pins, checks) as well as
+timing it. Exits non-zero on any mismatch.
+
+Usage (from chessrep-main/backend):
+    python benchmarks/bench_perft.py [--max-nodes 2000000] [--repeat 1]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chessdata.bitboard import STARTING_FEN, Board, perft
+
+# (name, FEN, [nodes at depth 1, 2, ...]) from the chessprogramming.org perft results
+SUITE = [
+    ("start", STARTING_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--max-nodes", type=int, default=2_000_000, help="skip depths with more expected nodes")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    failures = 0
+    total_nodes = total_time = 0
+    for name, fen, expected in SUITE:
+        board = Board(fen)
+        for depth, want in enumerate(expected, start=1):
+            if want > args.max_nodes:
+                break
+            best = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                got = perft(board, depth)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            status = "ok" if got == want else f"MISMATCH (expected {want})"
+            failures += got != want
+            total_nodes += got
+            total_time += best
+            print(f"{name:<11} depth {depth}: {got:>9} nodes {best * 1000:>9.1f} ms "
+                  f"{got / best if best else 0:>10,.0f} nps  {status}")
+
+    print(f"total:     {total_nodes} nodes in {total_time:.2f} s, {total_nodes / total_time:,.0f} nps")
+    if failures:
+        sys.exit(f"{failures} perft mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: streaming PGN parser over the lichess_studies corpus.
+
+Reports throughput (MB/s, chapters/s, moves/s) and, with --memory, the peak
+traced allocation while parsing, which should track the largest chapter
+rather than the largest file.
+
+Usage (from chessrep-main/backend):
+    python benchmarks/bench_pgn.py [--dir ../../lichess_studies] [--repeat 3] [--memory]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chessdata.pgn import iter_chapters
+
+DEFAULT_DIR = Path(__file__).resolve().parents[3] / "lichess_studies"
+
+
+def parse_corpus(files):
+    chapters = moves = 0
+    for path in files:
+        for chapter in iter_chapters(path):
+            chapters += 1
+            moves += sum(1 for _ in chapter.iter_moves())
+    return chapters, moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dir", type=Path, default=DEFAULT_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory (slower)")
+    args = parser.parse_args()
+
+    files = sorted(args.dir.glob("*.pgn"))
+    if not files:
+        sys.exit(f"No .pgn files in {args.dir}")
+    total_bytes = sum(f.stat().st_size for f in files)
+
+    best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        chapters, moves = parse_corpus(files)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"files:     {len(files)} ({total_bytes / 1e6:.2f} MB, largest {max(f.stat().st_size for f in files) / 1e3:.0f} kB)")
+    print(f"chapters:  {chapters}")
+    print(f"moves:     {moves} (mainlines + variations)")
+    print(f"time:      {best * 1000:.1f} ms (best of {args.repeat})")
+    print(f"rate:      {total_bytes / 1e6 / best:.2f} MB/s, {chapters / best:,.0f} chapters/s, {moves / best:,.0f} moves/s")
+
+    if args.memory:
+        tracemalloc.start()
+        parse_corpus(files)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak mem:  {peak / 1e3:.0f} kB traced")
+
+
+if __name__ == "__main__":
+    main()
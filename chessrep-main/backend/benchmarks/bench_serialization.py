@@ -0,0 +1,80 @@
+"""
+Benchmark: encoding a GET /api/status list response.
+
+Compares the default path (StatusCheck(**doc) for every document, then
+FastAPI's response_model validation + jsonable_encoder + json.dumps) with the
+fast path (fastjson.dumps straight from the Motor documents).
+
+Usage (from chessrep-main/backend):
+    python benchmarks/bench_serialization.py [--sizes 1000 10000 100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, TypeAdapter
+
+from fastjson import dumps, orjson
+
+
+# Same shape as server.StatusCheck; defined here so the benchmark does not need MONGO_URL
+class StatusCheck(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    client_name: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+def make_documents(n):
+    start = datetime(2024, 1, 1)
+    return [
+        {"id": str(uuid.uuid4()), "client_name": f"client-{i % 50}", "timestamp": start + timedelta(seconds=i)}
+        for i in range(n)
+    ]
+
+
+def default_path(docs, adapter):
+    models = [StatusCheck(**doc) for doc in docs]
+    validated = adapter.validate_python(models, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(docs, adapter):
+    return dumps(docs)
+
+
+def best_of(fn, docs, adapter, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs, adapter)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[StatusCheck])
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"{'docs':>8} {'default docs/s':>16} {'fast docs/s':>16} {'speedup':>8}")
+    for n in args.sizes:
+        docs = make_documents(n)
+        slow = best_of(default_path, docs, adapter, args.repeat)
+        fast = best_of(fast_path, docs, adapter, args.repeat)
+        print(f"{n:>8} {n / slow:>16,.0f} {n / fast:>16,.0f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
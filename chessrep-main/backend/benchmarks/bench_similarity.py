@@ -0,0 +1,95 @@
+"""
+Benchmark: similar-position search (chessdata.similarity) at corpus scale.
+
+The position table's signatures are grown to --size positions by copying
+random rows and moving one to three of their pawns (flipping pawn bits,
+material unchanged), which keeps the real corpus's skew towards common
+structures. Queries are further perturbed corpus positions. Reports the
+build time, query latency percentiles of SimilarityIndex.nearest and
+recall@k against an exact brute-force ranking of every position.
+
+Usage (from chessrep-main/backend, after python -m chessdata.position_table build):
+    python benchmarks/bench_similarity.py [--size 1000000] [--queries 200] [-k 10]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chessdata.features import popcount
+from chessdata.position_codec import key_bitboards
+from chessdata.position_table import DEFAULT_TABLE_DIR, PositionTable
+from chessdata.similarity import BITS, PAWN_MASK, TABLES, SimilarityIndex, signatures
+
+PAWN_SQUARES = np.flatnonzero([(int(PAWN_MASK) >> sq) & 1 for sq in range(64)]).astype(np.uint64)
+
+
+def move_pawns(signature, occupancy, rng):
+    """Flip one to three random pawn-square bits per row (in place)."""
+    for _ in range(3):
+        rows = np.flatnonzero(rng.random(len(signature)) < 0.6)
+        word = rng.integers(0, 2, len(rows))
+        bit = np.uint64(1) << rng.choice(PAWN_SQUARES, len(rows))
+        signature[rows, word] ^= bit
+        occupancy[rows] ^= bit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--table", type=Path, default=DEFAULT_TABLE_DIR)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--tables", type=int, default=TABLES)
+    parser.add_argument("--bits", type=int, default=BITS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not PositionTable.exists(args.table):
+        sys.exit(f"No position table at {args.table}; run python -m chessdata.position_table build first")
+
+    rng = np.random.default_rng(args.seed)
+    table = PositionTable(args.table)
+    base_signature, base_material, base_occupancy = signatures(key_bitboards(np.asarray(table.keys)))
+    rows = np.concatenate([np.arange(len(table)), rng.integers(0, len(table), max(args.size - len(table), 0))])
+    signature, material, occupancy = base_signature[rows], base_material[rows], base_occupancy[rows]
+    grown = slice(len(table), None)
+    move_pawns(signature[grown], occupancy[grown], rng)
+
+    started = time.perf_counter()
+    index = SimilarityIndex.build(signature, material, occupancy, args.tables, args.bits, args.seed)
+    build = time.perf_counter() - started
+
+    picks = rng.integers(0, len(signature), args.queries)
+    q_signature, q_material, q_occupancy = signature[picks].copy(), material[picks], occupancy[picks].copy()
+    move_pawns(q_signature, q_occupancy, rng)
+    for i in range(min(10, args.queries)):  # warm-up
+        index.nearest(q_signature[i], q_material[i], q_occupancy[i], args.k)
+
+    latencies, candidates, hits = [], [], 0
+    for i in range(args.queries):
+        started = time.perf_counter()
+        result = index.nearest(q_signature[i], q_material[i], q_occupancy[i], args.k)
+        latencies.append(time.perf_counter() - started)
+        candidates.append(result["candidates"])
+        # Exact ranking over every position; a hit is a result within the true k-th best distance
+        distance = (popcount(signature[:, 0] ^ q_signature[i, 0]) + popcount(signature[:, 1] ^ q_signature[i, 1])
+                    + (np.abs(material.astype(np.int16) - q_material[i]) * index._weights).sum(axis=1))
+        kth = np.partition(distance, args.k - 1)[args.k - 1]
+        hits += int(np.count_nonzero(result["distance"] <= kth))
+
+    latencies = np.array(latencies) * 1000
+    print(f"positions: {len(signature):,} ({len(table):,} from the table)")
+    print(f"index:     {index.meta['tables']} tables x {index.meta['bits']} bits, built in {build:.2f} s")
+    print(f"queries:   {args.queries}, k={args.k}, {np.mean(candidates):,.0f} candidates on average")
+    print(f"latency:   p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, "
+          f"max {latencies.max():.2f} ms")
+    print(f"recall@{args.k}: {hits / (args.queries * args.k):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Read-through response cache for API GET routes.
+
+ResponseCacheMiddleware serves cached bodies for the routes it is configured
+with, keyed by path plus sorted query parameters, and stores successful
+responses on a miss. Each route belongs to a namespace; write handlers call
+ResponseCache.invalidate(namespace) once their write has landed.
+
+Two backends:
+- LocalCacheBackend: bounded LRU with TTL, per worker process.
+- RedisCacheBackend: shared by every uvicorn worker (set REDIS_URL), so one
+  worker's invalidation is seen by all of them.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+
+def _pack(status, headers, body) -> bytes:
+    meta = json.dumps([status, [[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers]])
+    return meta.encode() + b"\n" + body
+
+
+def _unpack(value: bytes):
+    meta, body = value.split(b"\n", 1)
+    status, headers = json.loads(meta)
+    return status, [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers], body
+
+
+class LocalCacheBackend:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, namespace, value)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    async def set(self, namespace, key, value, ttl):
+        self._entries[key] = (time.monotonic() + ttl, namespace, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, namespace):
+        for key in [k for k, entry in self._entries.items() if entry[1] == namespace]:
+            del self._entries[key]
+
+    def size(self):
+        return len(self._entries)
+
+    async def close(self):
+        self._entries.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, url, prefix="chessrep:cache:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key):
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, namespace, key, value, ttl):
+        # A per-namespace key set makes invalidation one SMEMBERS + DEL, and
+        # keeps lookups to a single GET
+        members = f"{self.prefix}ns:{namespace}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, value, px=int(ttl * 1000))
+            pipe.sadd(members, self.prefix + key)
+            pipe.pexpire(members, int(ttl * 1000) * 2)
+            await pipe.execute()
+
+    async def invalidate(self, namespace):
+        members = f"{self.prefix}ns:{namespace}"
+        keys = await self._redis.smembers(members)
+        await self._redis.delete(members, *keys)
+
+    def size(self):
+        return None
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=5.0, max_body=1024 * 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_body = max_body
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # Bumped on every invalidation so a miss that raced with a write is not stored
+        self._generations = {}
+
+    def generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    @staticmethod
+    def make_key(path, query_string: bytes):
+        query = urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+        return f"{path}?{query}"
+
+    async def lookup(self, key):
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never fail the request; treat it as a miss
+            self.errors += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _unpack(value)
+
+    async def store(self, namespace, key, status, headers, body):
+        try:
+            await self.backend.set(namespace, key, _pack(status, headers, body), self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache store failed: {e}")
+
+    async def invalidate(self, namespace):
+        self._generations[namespace] = self.generation(namespace) + 1
+        try:
+            await self.backend.invalidate(namespace)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache invalidation failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if isinstance(self.backend, RedisCacheBackend) else "local",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+            "entries": self.backend.size(),
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+
+class ResponseCacheMiddleware:
+    """Pure ASGI middleware caching GET responses for `routes` (path -> namespace)."""
+
+    def __init__(self, app, cache: ResponseCache, routes: dict):
+        self.app = app
+        self.cache = cache
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope["headers"])
+        if b"no-cache" in request_headers.get(b"cache-control", b""):
+            await self.app(scope, receive, send)
+            return
+
+        namespace = self.routes[scope["path"]]
+        key = self.cache.make_key(scope["path"], scope.get("query_string", b""))
+        cached = await self.cache.lookup(key)
+        if cached is not None:
+            status, headers, body = cached
+            await send({"type": "http.response.start", "status": status, "headers": headers + [(b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        generation = self.cache.generation(namespace)
+        captured = {"status": None, "headers": None, "chunks": [], "size": 0, "cacheable": True}
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+                captured["cacheable"] = message["status"] == 200
+                message = dict(message)
+                message["headers"] = captured["headers"] + [(b"x-cache", b"MISS")]
+            elif message["type"] == "http.response.body" and captured["cacheable"]:
+                body = message.get("body", b"")
+                captured["size"] += len(body)
+                if captured["size"] > self.cache.max_body:
+                    captured["cacheable"] = False
+                    captured["chunks"] = []
+                else:
+                    captured["chunks"].append(body)
+            await send(message)
+
+        await self.app(scope, receive, capturing_send)
+        if captured["cacheable"] and captured["status"] is not None and self.cache.generation(namespace) == generation:
+            await self.cache.store(namespace, key, captured["status"], captured["headers"], b"".join(captured["chunks"]))
@@ -0,0 +1,19 @@
+"""
+Chess data tooling shared by the API and the offline import/indexing jobs.
+
+- pgn: streaming PGN parser for the lichess_studies corpus
+- importer: process-pool bulk import of study PGNs into MongoDB
+- manifest: content-hash manifest for incremental re-scrapes and re-imports
+- archive: single-file compressed study store with an offset index
+- bitboard: bitboard move generator, SAN parsing/emission, perft and Zobrist keys
+- position_index: Zobrist key -> chapters index, memory-mapped by the API
+- explorer: opening tree with move/opening/study statistics per position
+- eco: ECO classification table and header back-fill for the study corpus
+- positions: column store of the two-choice training positions (aimchess_fens.csv)
+- validate: batch legality check and normalization of the positions and study replays
+- export: incremental, dictionary-encoded Parquet export of positions and study chapters
+- features: vectorized (N, 12, 64) piece tensors and position features for difficulty scoring
+- position_codec: fixed-width 26/30-byte binary position encoding
+- position_table: content-addressed position table referenced by the puzzles and study chapters
+- similarity: LSH similar-position search (pawn structure and material) over the position table
+"""
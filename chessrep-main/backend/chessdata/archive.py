@@ -0,0 +1,362 @@
+"""
+Single-archive study store.
+
+Instead of one NNN_<id>.pgn file per study, studies can be kept in one
+append-only pack file plus an offset index:
+
+    lichess_studies.pack       12-byte header (b"CRPACK01" + codec), then one
+                               independently compressed frame per study
+    lichess_studies.pack.idx   one JSON line per frame:
+                               {"id", "offset", "length", "size", "sha256", "file"}
+
+Each frame is a complete zstd frame / gzip member (or raw bytes for codec
+"none"), so a single study is read by seeking to its offset, without touching
+the rest of the pack, and a frame whose codec the client accepts can be sent
+over HTTP as-is. Re-downloading a changed study appends a new frame and index
+line; the last line for an id wins. Writes stream chunk by chunk (the raw
+PGN is never held in memory) and only the copy into the pack is serialised.
+
+Readers memory-map the pack: for an uncompressed archive read() is a slice of
+the map, otherwise the frame is decompressed from the mapped bytes.
+
+    archive = StudyArchive("lichess_studies.pack")
+    for chapter in iter_chapters(archive.open("Je3kmuYC")):
+        ...
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.archive pack [--dir ../../lichess_studies] [--codec zstd]
+    python -m chessdata.archive list | cat <studyId>
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+MAGIC = b"CRPACK01"
+HEADER_SIZE = len(MAGIC) + 4
+CODECS = ("zstd", "gzip", "none")
+DEFAULT_CODEC = "zstd" if zstandard is not None else "gzip"
+# HTTP Content-Encoding a stored frame can be sent as without re-encoding
+CONTENT_ENCODINGS = {"zstd": "zstd", "gzip": "gzip"}
+
+CHUNK_SIZE = 1 << 16
+# Compressed frames larger than this spill from memory to a temp file while being written
+SPOOL_SIZE = 8 << 20
+
+
+def default_archive_path(studies_dir) -> Path:
+    studies_dir = Path(studies_dir)
+    return studies_dir.parent / f"{studies_dir.name}.pack"
+
+
+def index_path(pack_path) -> Path:
+    pack_path = Path(pack_path)
+    return pack_path.with_suffix(pack_path.suffix + ".idx")
+
+
+class _FrameCompressor:
+    def __init__(self, codec, level=None):
+        self.codec = codec
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("codec 'zstd' needs the zstandard package")
+            self._c = zstandard.ZstdCompressor(level=level if level is not None else 10).compressobj()
+        elif codec == "gzip":
+            self._c = zlib.compressobj(level if level is not None else 9, zlib.DEFLATED, 31)
+        elif codec == "none":
+            self._c = None
+        else:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+    def compress(self, data: bytes) -> bytes:
+        return data if self._c is None else self._c.compress(data)
+
+    def finish(self) -> bytes:
+        return b"" if self._c is None else self._c.flush()
+
+
+class _Section(io.RawIOBase):
+    """Read-only view of [offset, offset + length) of a memory-mapped pack."""
+
+    def __init__(self, mm, offset, length):
+        self._mm = mm
+        self._start = offset
+        self._end = offset + length
+        self._pos = offset
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._end - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._mm[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+class StudyArchive:
+    def __init__(self, path, codec=None, writable=False):
+        self.path = Path(path)
+        self.index_path = index_path(self.path)
+        self.writable = writable
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._mm = None
+        self._index_stat = None
+
+        if not self.path.exists():
+            if not writable:
+                raise FileNotFoundError(self.path)
+            self.codec = codec or DEFAULT_CODEC
+            if self.codec not in CODECS:
+                raise ValueError(f"Unsupported codec: {self.codec}")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "wb") as f:
+                f.write(MAGIC + self.codec.encode().ljust(4, b"\0"))
+            self.index_path.touch()
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a study archive")
+        self.codec = header[len(MAGIC):].rstrip(b"\0").decode()
+        if codec and codec != self.codec:
+            raise ValueError(f"{self.path} uses codec {self.codec!r}, not {codec!r}")
+        if writable and self.index_path.exists():
+            self._drop_torn_index_line()
+        self._load_index()
+
+        self._pack = None
+        self._index = None
+        if writable:
+            # Frames written after the last index line (crash mid-append) are dropped
+            end = max((e["offset"] + e["length"] for e in self._all_entries), default=HEADER_SIZE)
+            self._pack = open(self.path, "r+b")
+            self._pack.truncate(end)
+            self._pack.seek(end)
+            self._index = open(self.index_path, "a", encoding="utf-8")
+
+    def _drop_torn_index_line(self):
+        # A crash mid-append can leave a line without its newline; the next
+        # append would otherwise be written onto the end of it and lost too
+        with open(self.index_path, "r+b") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _load_index(self):
+        self.entries = {}
+        self._all_entries = []
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    self._all_entries.append(entry)
+                    self.entries[entry["id"]] = entry
+            stat = self.index_path.stat()
+            self._index_stat = (stat.st_size, stat.st_mtime_ns)
+
+    def refresh(self):
+        """Pick up studies appended by another process (e.g. a scraper run) since opening."""
+        if self.writable or not self.index_path.exists():
+            return
+        stat = self.index_path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != self._index_stat:
+            self._load_index()
+            self._mm = None
+
+    def __contains__(self, study_id):
+        return study_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ids(self):
+        return list(self.entries)
+
+    def entry(self, study_id):
+        return self.entries.get(study_id)
+
+    # -- writing ---------------------------------------------------------------
+
+    def append(self, study_id, chunks, file_name=None, skip_if_sha256=None, level=None):
+        """Compress `chunks` (an iterable of bytes) into a new frame for `study_id`.
+
+        Returns the index entry, or None when the content hash equals
+        `skip_if_sha256` (nothing is written).
+        """
+        if not self.writable:
+            raise RuntimeError("archive opened read-only")
+        digest = hashlib.sha256()
+        size = 0
+        compressor = _FrameCompressor(self.codec, level)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                digest.update(chunk)
+                size += len(chunk)
+                spool.write(compressor.compress(chunk))
+            spool.write(compressor.finish())
+            sha256 = digest.hexdigest()
+            if skip_if_sha256 is not None and sha256 == skip_if_sha256:
+                return None
+            length = spool.tell()
+            spool.seek(0)
+            with self._lock:
+                offset = self._pack.tell()
+                shutil.copyfileobj(spool, self._pack, CHUNK_SIZE)
+                self._pack.flush()
+                entry = {
+                    "id": study_id,
+                    "offset": offset,
+                    "length": length,
+                    "size": size,
+                    "sha256": sha256,
+                    "file": file_name,
+                    "added_at": datetime.utcnow().isoformat(timespec="seconds"),
+                }
+                # Index line only after the frame is in the pack
+                self._index.write(json.dumps(entry) + "\n")
+                self._index.flush()
+                self.entries[study_id] = entry
+                self._all_entries.append(entry)
+        return entry
+
+    def add_file(self, study_id, path, skip_if_sha256=None):
+        with open(path, "rb") as f:
+            return self.append(study_id, iter(lambda: f.read(CHUNK_SIZE), b""), Path(path).name, skip_if_sha256)
+
+    def sync(self):
+        if self.writable:
+            with self._lock:
+                for f in (self._pack, self._index):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def close(self):
+        if self.writable:
+            self.sync()
+            self._pack.close()
+            self._index.close()
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- reading ---------------------------------------------------------------
+
+    def _map(self, end):
+        # The pack only grows; remap when a frame lies beyond the current map.
+        # Old maps are left to the garbage collector since open streams may use them.
+        if self._mm is None or len(self._mm) < end:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _entry_or_raise(self, study_id):
+        entry = self.entries.get(study_id)
+        if entry is None:
+            raise KeyError(study_id)
+        return entry
+
+    def open_raw(self, study_id):
+        """The stored (compressed) frame as a binary stream."""
+        entry = self._entry_or_raise(study_id)
+        mm = self._map(entry["offset"] + entry["length"])
+        return io.BufferedReader(_Section(mm, entry["offset"], entry["length"]), CHUNK_SIZE)
+
+    def open(self, study_id):
+        """The study's PGN as a binary stream, decompressed on the fly."""
+        raw = self.open_raw(study_id)
+        if self.codec == "zstd":
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw), CHUNK_SIZE)
+        if self.codec == "gzip":
+            return io.BufferedReader(gzip.GzipFile(fileobj=raw), CHUNK_SIZE)
+        return raw
+
+    def read(self, study_id) -> bytes:
+        entry = self._entry_or_raise(study_id)
+        if self.codec == "none":
+            mm = self._map(entry["offset"] + entry["length"])
+            return mm[entry["offset"]:entry["offset"] + entry["length"]]
+        with self.open(study_id) as f:
+            return f.read()
+
+    def iter_content(self, study_id, raw=False, chunk_size=CHUNK_SIZE):
+        """Yield the study (or, with raw=True, its stored frame) in chunks."""
+        with (self.open_raw(study_id) if raw else self.open(study_id)) as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+
+def pack_directory(studies_dir, archive: StudyArchive):
+    """Add every NNN_<id>.pgn in `studies_dir` whose content is not already archived."""
+    added = 0
+    for path in sorted(Path(studies_dir).glob("*.pgn")):
+        stem = path.stem
+        study_id = stem.split("_", 1)[1] if "_" in stem else stem
+        known = archive.entry(study_id)
+        if archive.add_file(study_id, path, skip_if_sha256=known["sha256"] if known else None):
+            added += 1
+    return added
+
+
+def main():
+    backend_dir = Path(__file__).resolve().parent.parent
+    default_dir = Path(os.getenv("STUDIES_DIR", backend_dir.parent.parent / "lichess_studies"))
+    parser = argparse.ArgumentParser(description="Pack lichess study PGNs into a single archive")
+    parser.add_argument("--archive", type=Path, help="defaults to <dir>.pack next to the studies folder")
+    parser.add_argument("--dir", type=Path, default=default_dir)
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack = sub.add_parser("pack", help="add the folder's .pgn files to the archive")
+    pack.add_argument("--codec", choices=CODECS, default=None)
+    sub.add_parser("list", help="list archived studies")
+    cat = sub.add_parser("cat", help="print one study's PGN")
+    cat.add_argument("study_id")
+    args = parser.parse_args()
+    archive_path = args.archive or default_archive_path(args.dir)
+
+    if args.command == "pack":
+        with StudyArchive(archive_path, codec=args.codec, writable=True) as archive:
+            added = pack_directory(args.dir, archive)
+            raw = sum(e["size"] for e in archive.entries.values())
+            stored = sum(e["length"] for e in archive.entries.values())
+        print(f"Added {added} studies; {len(archive)} in {archive_path} ({archive.codec}), "
+              f"{raw / 1024:.0f} KiB -> {stored / 1024:.0f} KiB")
+    elif args.command == "list":
+        archive = StudyArchive(archive_path)
+        for study_id, entry in archive.entries.items():
+            print(f"{study_id}\t{entry['size']}\t{entry['length']}\t{entry.get('file') or ''}")
+    else:
+        archive = StudyArchive(archive_path)
+        if args.study_id not in archive:
+            sys.exit(f"{args.study_id} not in {archive_path}")
+        for chunk in archive.iter_content(args.study_id):
+            sys.stdout.buffer.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
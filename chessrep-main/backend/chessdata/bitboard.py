@@ -0,0 +1,650 @@
+"""
+Bitboard chess engine for replaying and indexing positions.
+
+Piece sets are 64-bit Python ints (bit 0 = a1, bit 63 = h8). Knight, king
+and pawn attacks and the sliding rays are precomputed tables; sliders are
+resolved by finding the first blocker on each ray. Legal moves are
+generated directly from check and pin masks (no make/unmake test except for
+en passant), which is what keeps replaying the whole study corpus fast in
+pure Python.
+
+Moves are plain ints: from | to << 6 | promotion << 12 (promotion is a piece
+type, 0 for none). Castling is the king's two-square move.
+
+Board.zobrist() is a 64-bit Zobrist key of board, side to move, castling
+rights and en passant file (only when an en passant capture is actually
+available), so transposed move orders hash the same and the move counters
+are ignored. Keys come from a fixed seed: an index built today matches the
+lookups of every later process.
+
+    board = Board()
+    board.push_san("e4")
+    board.zobrist(), board.fen()
+    board.san(board.parse_san("Nf6"))   # "Nf6"
+"""
+
+import random
+import re
+from typing import Iterator, List, Optional
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_SYMBOLS = "pnbrqk"
+SAN_PIECES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+SQUARE_NAMES = [f + r for r in "12345678" for f in "abcdefgh"]
+_SQUARE_INDEX = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+BB_ALL = (1 << 64) - 1
+BB_FILES = [0x0101010101010101 << f for f in range(8)]
+BB_RANKS = [0xFF << (8 * r) for r in range(8)]
+
+# Castling rights bits
+WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO = 1, 2, 4, 8
+CASTLING_FEN = (("K", WHITE_OO), ("Q", WHITE_OOO), ("k", BLACK_OO), ("q", BLACK_OOO))
+
+E1, G1, C1, H1, A1, F1, D1 = 4, 6, 2, 7, 0, 5, 3
+E8, G8, C8, H8, A8, F8, D8 = 60, 62, 58, 63, 56, 61, 59
+
+
+class IllegalMoveError(ValueError):
+    pass
+
+
+def square(name: str) -> int:
+    return _SQUARE_INDEX[name]
+
+
+def lsb(bb: int) -> int:
+    return (bb & -bb).bit_length() - 1
+
+
+def scan(bb: int) -> Iterator[int]:
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def popcount(bb: int) -> int:
+    return bin(bb).count("1")
+
+
+def _step_table(deltas):
+    table = []
+    for sq in range(64):
+        f, r = sq & 7, sq >> 3
+        bb = 0
+        for df, dr in deltas:
+            if 0 <= f + df < 8 and 0 <= r + dr < 8:
+                bb |= 1 << (sq + df + 8 * dr)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_table([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = [_step_table([(-1, 1), (1, 1)]), _step_table([(-1, -1), (1, -1)])]
+
+# Ray directions as (file step, rank step); a ray is "positive" when square indexes increase along it
+ROOK_DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+BISHOP_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+
+
+def _ray_table(df, dr):
+    table = []
+    for sq in range(64):
+        f, r = (sq & 7) + df, (sq >> 3) + dr
+        bb = 0
+        while 0 <= f < 8 and 0 <= r < 8:
+            bb |= 1 << (f + 8 * r)
+            f, r = f + df, r + dr
+        table.append(bb)
+    return table
+
+
+RAYS = {d: _ray_table(*d) for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS}
+
+
+def _rays_from(directions):
+    # Per square: (ray, table of the same direction, positive?)
+    return [
+        [(RAYS[d][sq], RAYS[d], d[1] > 0 or (d[1] == 0 and d[0] > 0)) for d in directions]
+        for sq in range(64)
+    ]
+
+
+_ROOK_RAYS = _rays_from(ROOK_DIRECTIONS)
+_BISHOP_RAYS = _rays_from(BISHOP_DIRECTIONS)
+
+
+def _slide(rays, occupied):
+    attacks = 0
+    for ray, table, positive in rays:
+        blockers = ray & occupied
+        if blockers:
+            first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            attacks |= ray ^ table[first]
+        else:
+            attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    return _slide(_ROOK_RAYS[sq], occupied)
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    return _slide(_BISHOP_RAYS[sq], occupied)
+
+
+def _between_and_line():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            opposite = RAYS[(-d[0], -d[1])][a]
+            for b in scan(RAYS[d][a]):
+                between[a][b] = RAYS[d][a] & ~RAYS[d][b] & ~(1 << b)
+                line[a][b] = RAYS[d][a] | opposite | (1 << a)
+    return between, line
+
+
+BETWEEN, LINE = _between_and_line()
+
+# Castling rights kept after a move touches a square (king or rook moved / rook captured)
+CASTLING_KEEP = [0xF] * 64
+CASTLING_KEEP[E1] &= ~(WHITE_OO | WHITE_OOO)
+CASTLING_KEEP[H1] &= ~WHITE_OO
+CASTLING_KEEP[A1] &= ~WHITE_OOO
+CASTLING_KEEP[E8] &= ~(BLACK_OO | BLACK_OOO)
+CASTLING_KEEP[H8] &= ~BLACK_OO
+CASTLING_KEEP[A8] &= ~BLACK_OOO
+
+# Zobrist keys from a fixed seed, so hashes are stable across processes and builds
+_rng = random.Random(0x5EED_C4E5)
+ZOBRIST_PIECES = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+_castling_bits = [_rng.getrandbits(64) for _ in range(4)]
+ZOBRIST_CASTLING = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            ZOBRIST_CASTLING[_rights] ^= _castling_bits[_bit]
+ZOBRIST_EP = [_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK = _rng.getrandbits(64)
+
+SAN_RE = re.compile(r"^([NBKRQ])?([a-h])?([1-8])?[\-x]?([a-h][1-8])(=?[nbrqNBRQ])?$")
+
+
+def move_from(move: int) -> int:
+    return move & 63
+
+
+def move_to(move: int) -> int:
+    return (move >> 6) & 63
+
+
+def move_promotion(move: int) -> int:
+    return move >> 12
+
+
+def make_move(from_sq: int, to_sq: int, promotion: int = 0) -> int:
+    return from_sq | (to_sq << 6) | (promotion << 12)
+
+
+def move_uci(move: int) -> str:
+    promotion = move >> 12
+    return SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63] + (PIECE_SYMBOLS[promotion] if promotion else "")
+
+
+class Board:
+    """Mutable position: 12 piece bitboards (color * 6 + piece type) plus a square -> piece mailbox."""
+
+    __slots__ = ("pieces", "occupied_co", "mailbox", "turn", "castling", "ep_square", "halfmove", "fullmove", "_hash")
+
+    def __init__(self, fen: Optional[str] = STARTING_FEN):
+        if fen is not None:
+            self.set_fen(fen)
+
+    # -- setup -------------------------------------------------------------------
+
+    def set_fen(self, fen: str):
+        parts = fen.split()
+        if not parts:
+            raise ValueError("empty FEN")
+        placement = parts[0]
+        turn = parts[1] if len(parts) > 1 else "w"
+        castling = parts[2] if len(parts) > 2 else "-"
+        ep = parts[3] if len(parts) > 3 else "-"
+
+        self.pieces = [0] * 12
+        self.occupied_co = [0, 0]
+        self.mailbox = [-1] * 64
+        self._hash = 0
+        rows = placement.split("/")
+        if len(rows) != 8:
+            raise ValueError(f"invalid FEN placement: {placement!r}")
+        for rank, row in zip(range(7, -1, -1), rows):
+            file = 0
+            for ch in row:
+                if ch.isdigit():
+                    file += int(ch)
+                    continue
+                kind = PIECE_SYMBOLS.find(ch.lower())
+                if kind < 0 or file > 7:
+                    raise ValueError(f"invalid FEN placement: {placement!r}")
+                self._put(8 * rank + file, (WHITE if ch.isupper() else BLACK) * 6 + kind)
+                file += 1
+            if file != 8:
+                raise ValueError(f"invalid FEN placement: {placement!r}")
+        if popcount(self.pieces[KING]) != 1 or popcount(self.pieces[6 + KING]) != 1:
+            raise ValueError("FEN must have exactly one king per side")
+        if turn not in ("w", "b"):
+            raise ValueError(f"invalid side to move: {turn!r}")
+        self.turn = WHITE if turn == "w" else BLACK
+        if self.turn == BLACK:
+            self._hash ^= ZOBRIST_BLACK
+
+        self.castling = 0
+        if castling != "-":
+            for symbol, bit in CASTLING_FEN:
+                if symbol in castling:
+                    self.castling |= bit
+        # Drop rights the placement contradicts (king or rook not on its home square)
+        for sq, bit, piece in ((H1, WHITE_OO, ROOK), (A1, WHITE_OOO, ROOK), (H8, BLACK_OO, 6 + ROOK), (A8, BLACK_OOO, 6 + ROOK)):
+            king = E1 if bit in (WHITE_OO, WHITE_OOO) else E8
+            if self.mailbox[sq] != piece or self.mailbox[king] != piece - ROOK + KING:
+                self.castling &= ~bit
+        self._hash ^= ZOBRIST_CASTLING[self.castling]
+
+        self.ep_square = square(ep) if ep in _SQUARE_INDEX else None
+        try:
+            self.halfmove = int(parts[4]) if len(parts) > 4 else 0
+            self.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        except ValueError:
+            raise ValueError(f"invalid move counters in FEN: {fen!r}")
+
+    def copy(self) -> "Board":
+        board = Board(None)
+        board.pieces = self.pieces[:]
+        board.occupied_co = self.occupied_co[:]
+        board.mailbox = self.mailbox[:]
+        board.turn = self.turn
+        board.castling = self.castling
+        board.ep_square = self.ep_square
+        board.halfmove = self.halfmove
+        board.fullmove = self.fullmove
+        board._hash = self._hash
+        return board
+
+    def _put(self, sq: int, piece: int):
+        bit = 1 << sq
+        self.pieces[piece] |= bit
+        self.occupied_co[piece // 6] |= bit
+        self.mailbox[sq] = piece
+        self._hash ^= ZOBRIST_PIECES[piece][sq]
+
+    def _remove(self, sq: int) -> int:
+        piece = self.mailbox[sq]
+        bit = 1 << sq
+        self.pieces[piece] ^= bit
+        self.occupied_co[piece // 6] ^= bit
+        self.mailbox[sq] = -1
+        self._hash ^= ZOBRIST_PIECES[piece][sq]
+        return piece
+
+    # -- output ------------------------------------------------------------------
+
+    def board_fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                piece = self.mailbox[8 * rank + file]
+                if piece < 0:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                symbol = PIECE_SYMBOLS[piece % 6]
+                row += symbol.upper() if piece < 6 else symbol
+            rows.append(row + (str(empty) if empty else ""))
+        return "/".join(rows)
+
+    def castling_fen(self) -> str:
+        return "".join(symbol for symbol, bit in CASTLING_FEN if self.castling & bit) or "-"
+
+    def epd(self) -> str:
+        """Board, side, castling and en passant (only when capturable): the part that identifies a position."""
+        ep = SQUARE_NAMES[self.ep_square] if self.has_ep_capture() else "-"
+        return f"{self.board_fen()} {'wb'[self.turn]} {self.castling_fen()} {ep}"
+
+    def fen(self) -> str:
+        ep = SQUARE_NAMES[self.ep_square] if self.ep_square is not None else "-"
+        return f"{self.board_fen()} {'wb'[self.turn]} {self.castling_fen()} {ep} {self.halfmove} {self.fullmove}"
+
+    def __repr__(self):
+        return f"Board({self.fen()!r})"
+
+    # -- queries -----------------------------------------------------------------
+
+    @property
+    def occupied(self) -> int:
+        return self.occupied_co[WHITE] | self.occupied_co[BLACK]
+
+    def piece_at(self, sq: int) -> int:
+        """Piece index (color * 6 + type) on `sq`, or -1."""
+        return self.mailbox[sq]
+
+    def king(self, color: int) -> int:
+        return lsb(self.pieces[color * 6 + KING])
+
+    def attackers(self, color: int, sq: int, occupied: int = None) -> int:
+        if occupied is None:
+            occupied = self.occupied
+        p = self.pieces
+        base = color * 6
+        queens = p[base + QUEEN]
+        return (
+            (KNIGHT_ATTACKS[sq] & p[base + KNIGHT])
+            | (KING_ATTACKS[sq] & p[base + KING])
+            | (PAWN_ATTACKS[color ^ 1][sq] & p[base + PAWN])
+            | (rook_attacks(sq, occupied) & (p[base + ROOK] | queens))
+            | (bishop_attacks(sq, occupied) & (p[base + BISHOP] | queens))
+        )
+
+    def is_check(self) -> bool:
+        return bool(self.attackers(self.turn ^ 1, self.king(self.turn)))
+
+    def has_legal_moves(self) -> bool:
+        return next(self.generate_legal_moves(), None) is not None
+
+    def is_checkmate(self) -> bool:
+        return self.is_check() and not self.has_legal_moves()
+
+    def is_stalemate(self) -> bool:
+        return not self.is_check() and not self.has_legal_moves()
+
+    def problems(self) -> List[str]:
+        """Why the position cannot arise in a game (set_fen() only rejects unparsable FENs); empty if none."""
+        problems = []
+        p = self.pieces
+        if (p[PAWN] | p[6 + PAWN]) & (BB_RANKS[0] | BB_RANKS[7]):
+            problems.append("pawn on the first or last rank")
+        for color, name in ((WHITE, "white"), (BLACK, "black")):
+            if popcount(self.occupied_co[color]) > 16 or popcount(p[color * 6 + PAWN]) > 8:
+                problems.append(f"too many {name} pieces")
+        if self.attackers(self.turn, self.king(self.turn ^ 1)):
+            problems.append("side not to move is in check")
+        if popcount(self.attackers(self.turn ^ 1, self.king(self.turn))) > 2:
+            problems.append("more than two checkers")
+        if self.ep_square is not None:
+            behind = self.ep_square - 8 if self.turn == WHITE else self.ep_square + 8
+            rank = 5 if self.turn == WHITE else 2
+            if self.ep_square >> 3 != rank or self.mailbox[behind] != (self.turn ^ 1) * 6 + PAWN:
+                problems.append("invalid en passant square")
+        return problems
+
+    def has_ep_capture(self) -> bool:
+        """Whether a pawn of the side to move stands next to the en passant square (pseudo-legal)."""
+        if self.ep_square is None:
+            return False
+        return bool(PAWN_ATTACKS[self.turn ^ 1][self.ep_square] & self.pieces[self.turn * 6 + PAWN])
+
+    def zobrist(self) -> int:
+        if self.ep_square is not None and self.has_ep_capture():
+            return self._hash ^ ZOBRIST_EP[self.ep_square & 7]
+        return self._hash
+
+    def _pinned(self, us: int, king: int) -> int:
+        them = (us ^ 1) * 6
+        p = self.pieces
+        occupied = self.occupied
+        snipers = (
+            (rook_attacks(king, 0) & (p[them + ROOK] | p[them + QUEEN]))
+            | (bishop_attacks(king, 0) & (p[them + BISHOP] | p[them + QUEEN]))
+        )
+        pinned = 0
+        for sniper in scan(snipers):
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & self.occupied_co[us]:
+                pinned |= blockers
+        return pinned
+
+    # -- move generation ---------------------------------------------------------
+
+    def generate_legal_moves(self, from_mask: int = BB_ALL, to_mask: int = BB_ALL) -> Iterator[int]:
+        us = self.turn
+        them = us ^ 1
+        p = self.pieces
+        base = us * 6
+        ours = self.occupied_co[us]
+        theirs = self.occupied_co[them]
+        occupied = ours | theirs
+        king = lsb(p[base + KING])
+        checkers = self.attackers(them, king, occupied)
+
+        # King steps: the target must not be attacked once the king has left its square
+        if from_mask & (1 << king):
+            without_king = occupied ^ (1 << king)
+            for to in scan(KING_ATTACKS[king] & ~ours & to_mask):
+                if not self.attackers(them, to, without_king):
+                    yield king | (to << 6)
+            if not checkers and self.castling:
+                yield from self._castling_moves(us, to_mask, occupied)
+
+        if checkers & (checkers - 1):
+            return  # double check: only the king may move
+
+        target = ~ours & to_mask
+        if checkers:
+            target &= BETWEEN[king][lsb(checkers)] | checkers
+        pinned = self._pinned(us, king)
+
+        for kind, attacks in ((KNIGHT, None), (BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, None)):
+            for frm in scan(p[base + kind] & from_mask):
+                if kind == KNIGHT:
+                    moves = KNIGHT_ATTACKS[frm]
+                elif kind == QUEEN:
+                    moves = rook_attacks(frm, occupied) | bishop_attacks(frm, occupied)
+                else:
+                    moves = attacks(frm, occupied)
+                moves &= target
+                if pinned & (1 << frm):
+                    moves &= LINE[king][frm]
+                for to in scan(moves):
+                    yield frm | (to << 6)
+
+        forward = 8 if us == WHITE else -8
+        last_rank = BB_RANKS[7] if us == WHITE else BB_RANKS[0]
+        start_rank = BB_RANKS[1] if us == WHITE else BB_RANKS[6]
+        # A pawn on its own last rank (only in FENs problems() rejects) has nowhere to go
+        for frm in scan(p[base + PAWN] & from_mask & ~last_rank):
+            allowed = LINE[king][frm] if pinned & (1 << frm) else BB_ALL
+            moves = PAWN_ATTACKS[us][frm] & theirs & target & allowed
+            one = frm + forward
+            if not occupied & (1 << one):
+                if (1 << one) & target & allowed:
+                    moves |= 1 << one
+                two = one + forward
+                if (1 << frm) & start_rank and not occupied & (1 << two) and (1 << two) & target & allowed:
+                    moves |= 1 << two
+            for to in scan(moves):
+                if (1 << to) & last_rank:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        yield frm | (to << 6) | (promotion << 12)
+                else:
+                    yield frm | (to << 6)
+            ep = self.ep_square
+            if ep is not None and PAWN_ATTACKS[us][frm] & (1 << ep) & to_mask and self._ep_is_legal(frm, ep, king):
+                yield frm | (ep << 6)
+
+    def _ep_is_legal(self, frm: int, ep: int, king: int) -> bool:
+        captured = ep - 8 if self.turn == WHITE else ep + 8
+        if self.mailbox[captured] != (self.turn ^ 1) * 6 + PAWN or self.mailbox[ep] != -1:
+            return False
+        occupied = (self.occupied ^ (1 << frm) ^ (1 << captured)) | (1 << ep)
+        return not (self.attackers(self.turn ^ 1, king, occupied) & ~(1 << captured))
+
+    def _castling_moves(self, us: int, to_mask: int, occupied: int) -> Iterator[int]:
+        them = us ^ 1
+        if us == WHITE:
+            options = ((WHITE_OO, E1, G1, H1, (F1, G1)), (WHITE_OOO, E1, C1, A1, (D1, C1)))
+        else:
+            options = ((BLACK_OO, E8, G8, H8, (F8, G8)), (BLACK_OOO, E8, C8, A8, (D8, C8)))
+        for bit, king, to, rook, path in options:
+            if not self.castling & bit or not to_mask & (1 << to):
+                continue
+            if BETWEEN[king][rook] & occupied:
+                continue
+            if any(self.attackers(them, sq, occupied) for sq in path):
+                continue
+            yield king | (to << 6)
+
+    def legal_moves(self) -> List[int]:
+        return list(self.generate_legal_moves())
+
+    def is_legal(self, move: int) -> bool:
+        return move in self.generate_legal_moves(1 << (move & 63), 1 << ((move >> 6) & 63))
+
+    # -- making moves ------------------------------------------------------------
+
+    def push(self, move: int):
+        """Play a legal move (not checked: use is_legal() or parse_san() first)."""
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = move >> 12
+        us = self.turn
+        piece = self._remove(frm)
+        kind = piece % 6
+        capture = self.mailbox[to] >= 0
+        if capture:
+            self._remove(to)
+
+        if kind == PAWN:
+            if to == self.ep_square and not capture:
+                self._remove(to - 8 if us == WHITE else to + 8)
+                capture = True
+            if promotion:
+                piece = us * 6 + promotion
+        elif kind == KING and abs(to - frm) == 2:
+            # Castling: move the rook too
+            rook_from, rook_to = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+            self._put(rook_to, self._remove(rook_from))
+        self._put(to, piece)
+
+        rights = self.castling & CASTLING_KEEP[frm] & CASTLING_KEEP[to]
+        if rights != self.castling:
+            self._hash ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[rights]
+            self.castling = rights
+        self.ep_square = (frm + to) // 2 if kind == PAWN and abs(to - frm) == 16 else None
+        self.halfmove = 0 if kind == PAWN or capture else self.halfmove + 1
+        if us == BLACK:
+            self.fullmove += 1
+        self.turn = us ^ 1
+        self._hash ^= ZOBRIST_BLACK
+
+    def push_null(self):
+        self.ep_square = None
+        self.halfmove += 1
+        if self.turn == BLACK:
+            self.fullmove += 1
+        self.turn ^= 1
+        self._hash ^= ZOBRIST_BLACK
+
+    # -- SAN ---------------------------------------------------------------------
+
+    def parse_san(self, san: str) -> int:
+        """The legal move a SAN string denotes; raises IllegalMoveError if none or ambiguous."""
+        text = san.rstrip("+#!?")
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            king = self.king(self.turn)
+            to = king + (2 if len(text) == 3 else -2)
+            if 0 <= to < 64:
+                for move in self.generate_legal_moves(1 << king, 1 << to):
+                    return move
+            raise IllegalMoveError(f"illegal castling {san!r} in {self.fen()}")
+
+        match = SAN_RE.match(text)
+        if match is None:
+            raise IllegalMoveError(f"invalid SAN {san!r}")
+        piece, file, rank, to_name, promotion = match.groups()
+        kind = SAN_PIECES[piece] if piece else PAWN
+        from_mask = self.pieces[self.turn * 6 + kind]
+        if file:
+            from_mask &= BB_FILES[ord(file) - 97]
+        if rank:
+            from_mask &= BB_RANKS[int(rank) - 1]
+        promotion = PIECE_SYMBOLS.index(promotion[-1].lower()) if promotion else 0
+
+        found = None
+        for move in self.generate_legal_moves(from_mask, 1 << square(to_name)):
+            if move >> 12 != promotion:
+                continue
+            if found is not None:
+                raise IllegalMoveError(f"ambiguous SAN {san!r} in {self.fen()}")
+            found = move
+        if found is None:
+            raise IllegalMoveError(f"illegal SAN {san!r} in {self.fen()}")
+        return found
+
+    def push_san(self, san: str) -> int:
+        if san in ("--", "Z0"):
+            self.push_null()
+            return 0
+        move = self.parse_san(san)
+        self.push(move)
+        return move
+
+    def san(self, move: int) -> str:
+        """Standard algebraic notation of a legal move, with the minimal disambiguation and +/# suffix."""
+        if not move:
+            return "--"
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = move >> 12
+        kind = self.mailbox[frm] % 6
+        if kind == KING and abs(to - frm) == 2:
+            text = "O-O" if to > frm else "O-O-O"
+        elif kind == PAWN:
+            text = SQUARE_NAMES[to]
+            if frm & 7 != to & 7:  # capture, en passant included
+                text = SQUARE_NAMES[frm][0] + "x" + text
+            if promotion:
+                text += "=" + PIECE_SYMBOLS[promotion].upper()
+        else:
+            text = PIECE_SYMBOLS[kind].upper()
+            # Other pieces of the same kind that can also reach the target square
+            others = 0
+            for other in self.generate_legal_moves(self.pieces[self.turn * 6 + kind] & ~(1 << frm), 1 << to):
+                others |= 1 << (other & 63)
+            if others:
+                if not others & BB_FILES[frm & 7]:
+                    text += SQUARE_NAMES[frm][0]
+                elif not others & BB_RANKS[frm >> 3]:
+                    text += SQUARE_NAMES[frm][1]
+                else:
+                    text += SQUARE_NAMES[frm]
+            if self.mailbox[to] >= 0:
+                text += "x"
+            text += SQUARE_NAMES[to]
+        after = self.copy()
+        after.push(move)
+        if after.is_check():
+            text += "#" if not after.has_legal_moves() else "+"
+        return text
+
+
+def perft(board: Board, depth: int) -> int:
+    """Number of leaf nodes of the legal move tree to `depth` (the standard move generator test)."""
+    if depth <= 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in board.generate_legal_moves())
+    nodes = 0
+    for move in board.generate_legal_moves():
+        child = board.copy()
+        child.push(move)
+        nodes += perft(child, depth - 1)
+    return nodes
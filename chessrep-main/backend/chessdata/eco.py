@@ -0,0 +1,392 @@
+"""
+ECO classification.
+
+The classification table maps a normalized position (board, side to move,
+castling rights, en passant square; move counters ignored: the Zobrist key
+of chessdata.bitboard) to an ECO code and opening name. It is built from:
+
+- an optional reference opening table, TSV lines of "eco<TAB>name<TAB>moves"
+  (the layout of the lichess chess-openings files); the position after each
+  line's last move gets its label, and these entries always win;
+- the study corpus itself: every chapter whose ECO/Opening headers are set
+  labels the mainline positions it reaches (up to --max-ply). A position
+  keeps the label most of its chapters agree on, and positions where no
+  label has a majority stay unlabelled.
+
+A game is classified by its deepest position found in the table, a single
+position by one dict lookup. classify_keys() does the same for many games
+at once with NumPy: one searchsorted over every position of every game, then
+a per-game "last hit" reduction.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.eco build [--reference eco.tsv] [--max-ply 30]
+    python -m chessdata.eco backfill [--dir ../../lichess_studies] [--dry-run]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import STARTING_FEN, Board, IllegalMoveError
+from chessdata.importer import DEFAULT_STUDIES_DIR
+from chessdata.pgn import HEADER_RE, iter_chapters, parse_pgn
+from chessdata.position_index import is_standard
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_TABLE_FILE = Path(os.getenv("ECO_TABLE_FILE", BACKEND_DIR / "data" / "eco" / "eco_table.json"))
+ECO_RE = re.compile(r"^[A-E]\d\d$")
+
+logger = logging.getLogger("chessdata.eco")
+
+
+def chapter_label(headers):
+    """(eco, opening) from a chapter's headers, or None when either is unknown."""
+    eco = headers.get("ECO", "?")
+    name = headers.get("Opening", "?")
+    if not ECO_RE.match(eco) or not name or name == "?":
+        return None
+    return eco, name
+
+
+def game_ply(board) -> int:
+    """Ply from the standard start, per the FEN move counters (chapters may start mid-game)."""
+    return 2 * (board.fullmove - 1) + board.turn
+
+
+def mainline_keys(moves, fen=None, max_ply=None, strict=False):
+    """(Zobrist keys, game plies) of the start position and of each mainline position.
+
+    Stops at the first illegal move (raises IllegalMoveError instead when
+    `strict`), or after `max_ply` moves.
+    """
+    board = Board(fen or STARTING_FEN)
+    keys = [board.zobrist()]
+    plies = [game_ply(board)]
+    for san in moves:
+        if max_ply is not None and len(keys) > max_ply:
+            break
+        try:
+            board.push_san(san)
+        except IllegalMoveError:
+            if strict:
+                raise
+            break
+        keys.append(board.zobrist())
+        plies.append(game_ply(board))
+    return keys, plies
+
+
+def chapter_keys(source, max_ply=None) -> list:
+    """Process-pool task: (label or None, keys, plies) for each standard chapter of a file, None for the rest."""
+    result = []
+    for chapter in iter_chapters(Path(source)):
+        if not is_standard(chapter):
+            result.append(None)
+            continue
+        try:
+            keys, plies = mainline_keys([m.san for m in chapter.moves], chapter.starting_fen, max_ply)
+        except ValueError:
+            result.append(None)  # unusable FEN header
+            continue
+        result.append((chapter_label(chapter.headers), keys, plies))
+    return result
+
+
+def read_reference(path):
+    """(eco, name, Zobrist key and ply of the line's final position) per line of a reference TSV."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 3 or not ECO_RE.match(parts[0]):
+                continue  # header row or malformed
+            chapters = parse_pgn(parts[2])
+            if not chapters:
+                continue
+            keys, plies = mainline_keys([m.san for m in chapters[0].moves])
+            yield parts[0], parts[1], keys[-1], plies[-1]
+
+
+class EcoClassifier:
+    def __init__(self, labels, keys, label_ids, plies):
+        self.labels = [tuple(label) for label in labels]
+        order = np.argsort(keys, kind="stable")
+        self.keys = np.asarray(keys, dtype=np.uint64)[order]
+        self.label_ids = np.asarray(label_ids, dtype=np.int32)[order]
+        self.plies = np.asarray(plies, dtype=np.uint16)[order]
+        # O(1) single-position lookups
+        self.table = {int(k): (int(l), int(p)) for k, l, p in zip(self.keys, self.label_ids, self.plies)}
+
+    @classmethod
+    def load(cls, path) -> "EcoClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data["entries"]
+        return cls(
+            data["labels"],
+            [int(e[0], 16) for e in entries],
+            [e[1] for e in entries],
+            [e[2] for e in entries],
+        )
+
+    def save(self, path, stats=None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": 1,
+            "stats": stats or {},
+            "labels": self.labels,
+            "entries": [[f"{int(k):016x}", int(l), int(p)] for k, l, p in zip(self.keys, self.label_ids, self.plies)],
+        }
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _result(self, label_id, ply):
+        eco, name = self.labels[label_id]
+        return {"eco": eco, "opening": name, "ply": ply}
+
+    def classify_key(self, key: int):
+        hit = self.table.get(key)
+        return self._result(*hit) if hit else None
+
+    def classify_fen(self, fen: str):
+        """Label of exactly this position (move counters ignored), or None."""
+        return self.classify_key(Board(fen).zobrist())
+
+    def classify_moves(self, moves, fen=None):
+        """Label of the deepest position of a move sequence found in the table, or None.
+
+        Raises IllegalMoveError for a move that is not legal where it is played.
+        """
+        best = None
+        for key in mainline_keys(moves, fen, strict=True)[0]:
+            hit = self.table.get(key)
+            if hit:
+                best = hit
+        return self._result(*best) if best else None
+
+    def classify_keys(self, keys, game_ids, n_games):
+        """Deepest-match label id per game (-1 for none) for positions given in game order."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        game_ids = np.asarray(game_ids, dtype=np.int64)
+        best = np.full(n_games, -1, dtype=np.int32)
+        if not len(keys) or not len(self.keys):
+            return best
+        idx = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        hit = self.keys[idx] == keys
+        games = game_ids[hit]
+        labels = self.label_ids[idx[hit]]
+        # Positions are in move order within a game, so the last hit is the deepest one
+        last = np.ones(len(games), dtype=bool)
+        last[:-1] = games[1:] != games[:-1]
+        best[games[last]] = labels[last]
+        return best
+
+
+def build_classifier(files, reference=None, max_ply=30, workers=None):
+    votes = defaultdict(Counter)   # key -> Counter(label)
+    first_ply = {}
+    chapters = labelled = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(chapter_keys, files, [max_ply] * len(files), chunksize=4):
+            for item in result:
+                if item is None:
+                    continue
+                chapters += 1
+                label, keys, plies = item
+                if label is None:
+                    continue
+                labelled += 1
+                for key, ply in zip(keys, plies):
+                    votes[key][label] += 1
+                    first_ply[key] = min(first_ply.get(key, ply), ply)
+
+    entries = {}
+    for key, counter in votes.items():
+        (label, count), = counter.most_common(1)
+        if count * 2 > sum(counter.values()):
+            entries[key] = (label, first_ply[key])
+    from_corpus = len(entries)
+
+    reference_lines = 0
+    if reference:
+        for eco, name, key, ply in read_reference(reference):
+            reference_lines += 1
+            entries[key] = ((eco, name), ply)
+
+    label_ids = {}
+    labels = []
+    for label, _ in entries.values():
+        if label not in label_ids:
+            label_ids[label] = len(labels)
+            labels.append(label)
+    classifier = EcoClassifier(
+        labels,
+        list(entries),
+        [label_ids[label] for label, _ in entries.values()],
+        [ply for _, ply in entries.values()],
+    )
+    stats = {
+        "chapters": chapters,
+        "labelled_chapters": labelled,
+        "corpus_positions": from_corpus,
+        "reference_lines": reference_lines,
+        "positions": len(classifier),
+        "labels": len(labels),
+    }
+    return classifier, stats
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def fill_headers(text: str, labels) -> tuple:
+    """Replace ECO/Opening "?" headers of chapter i with labels[i]; returns (text, headers changed).
+
+    Header blocks are counted the way the parser counts chapters (header lines
+    outside comments), and the caller checks the block count matches.
+    """
+    out = []
+    chapter = -1
+    in_headers = False
+    in_comment = False
+    changed = 0
+    for line in text.splitlines(keepends=True):
+        match = None if in_comment else HEADER_RE.match(line.rstrip("\r\n"))
+        if match:
+            if not in_headers:
+                chapter += 1
+                in_headers = True
+            name, value = match.group(1), match.group(2)
+            label = labels[chapter] if chapter < len(labels) else None
+            if label and value == "?" and name in ("ECO", "Opening"):
+                ending = line[len(line.rstrip("\r\n")):]
+                line = f'[{name} "{_escape(label[0] if name == "ECO" else label[1])}"]{ending}'
+                changed += 1
+            out.append(line)
+            continue
+        in_headers = False
+        # Track {...} comments across lines so "[" inside them is never taken for a header
+        for ch in line:
+            if ch == "{" and not in_comment:
+                in_comment = True
+            elif ch == "}" and in_comment:
+                in_comment = False
+            elif ch == ";" and not in_comment:
+                break
+        out.append(line)
+    return "".join(out), changed, chapter + 1
+
+
+def backfill(files, classifier: EcoClassifier, workers=None, dry_run=False) -> dict:
+    """Classify every chapter of every file in one pass and fill in their "?" ECO/Opening headers."""
+    started = time.perf_counter()
+    # Mainline keys of every chapter, flattened for a single vectorized lookup
+    per_file = []
+    keys, game_ids = [], []
+    needs = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for path, result in zip(files, pool.map(chapter_keys, files, chunksize=4)):
+            first = len(needs)
+            for item in result:
+                game = len(needs)
+                if item is None or item[0] is not None:
+                    needs.append(False)
+                    continue
+                needs.append(True)
+                keys.extend(item[1])
+                game_ids.extend([game] * len(item[1]))
+            per_file.append((path, first, len(result)))
+
+    best = classifier.classify_keys(np.array(keys, dtype=np.uint64), np.array(game_ids), len(needs))
+    stats = {"files": 0, "chapters": len(needs), "unlabelled": sum(needs), "classified": 0, "headers": 0,
+             "skipped_files": []}
+    for path, first, count in per_file:
+        labels = []
+        for game in range(first, first + count):
+            label_id = int(best[game]) if needs[game] else -1
+            labels.append(classifier.labels[label_id] if label_id >= 0 else None)
+        found = sum(1 for label in labels if label)
+        if not found:
+            continue
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            text = f.read()
+        new_text, changed, blocks = fill_headers(text, labels)
+        if blocks != count:
+            # Header layout the line scanner can't map to chapters: leave the file alone
+            stats["skipped_files"].append(Path(path).name)
+            continue
+        stats["classified"] += found
+        stats["headers"] += changed
+        if changed and not dry_run:
+            tmp = Path(str(path) + ".tmp")
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(new_text)
+            os.replace(tmp, path)
+            stats["files"] += 1
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ECO classification table / back-fill ECO headers")
+    parser.add_argument("--table", type=Path, default=DEFAULT_TABLE_FILE)
+    parser.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--reference", type=Path, help="TSV of eco<TAB>name<TAB>moves lines")
+    build.add_argument("--max-ply", type=int, default=30)
+    fill = sub.add_parser("backfill")
+    fill.add_argument("--dry-run", action="store_true")
+    classify = sub.add_parser("classify")
+    classify.add_argument("moves", nargs="+", help="SAN moves from the start position, or one FEN")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    files = sorted(args.dir.glob("*.pgn"))
+    if args.command == "build":
+        if not files and not args.reference:
+            sys.exit(f"No .pgn files in {args.dir}")
+        classifier, stats = build_classifier(files, args.reference, args.max_ply, args.workers)
+        classifier.save(args.table, stats)
+        logger.info(f"ECO table {args.table}: {stats['positions']} positions, {stats['labels']} openings "
+                    f"({stats['labelled_chapters']}/{stats['chapters']} labelled chapters, "
+                    f"{stats['reference_lines']} reference lines)")
+        return
+
+    classifier = EcoClassifier.load(args.table)
+    if args.command == "classify":
+        if len(args.moves) == 1 and "/" in args.moves[0]:
+            result = classifier.classify_fen(args.moves[0])
+        else:
+            result = classifier.classify_moves(args.moves)
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    if not files:
+        sys.exit(f"No .pgn files in {args.dir}")
+    stats = backfill(files, classifier, args.workers, args.dry_run)
+    logger.info(f"{stats['classified']}/{stats['unlabelled']} unlabelled chapters classified, "
+                f"{stats['headers']} headers {'would be ' if args.dry_run else ''}filled in "
+                f"{stats['files']} files in {stats['seconds']}s")
+    if stats["skipped_files"]:
+        logger.warning(f"Skipped (header layout not understood): {', '.join(stats['skipped_files'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Opening explorer over the study corpus.
+
+The builder walks every standard chapter (mainline and variations, up to
+--max-ply) and aggregates per position (Zobrist key, so transpositions
+share one node):
+
+    occurrences   chapters that reach the position
+    moves         next moves played from it, with the number of chapters each
+    openings      "ECO Opening" header values of those chapters, most frequent first
+    studies       studies the position occurs in, most frequent first
+
+and writes a single binary file. Nodes are shared by every line that
+reaches them and move/opening/study strings are stored once in a string
+table, so the tree stays compact:
+
+    header     magic b"CREXPL01", node count, section offsets
+    keys       uint64[n]  sorted Zobrist keys (node id = position in this array)
+    offsets    uint32[n]  byte offset of each node record
+    nodes      per node: occurrences u32, move/opening/study counts u16 x 3, then
+               moves    (child node id u32, count u32, SAN string id u32, move u16)
+               openings (string id u32, count u32)
+               studies  (string id u32, count u32)
+    strings    uint32 offsets + UTF-8 blob
+
+The API memory-maps the file and decodes one node per request (binary
+search on the key column, then a struct read), so explorer clicks never
+touch MongoDB.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.explorer build [--dir ../../lichess_studies | --archive ...] [--max-ply 40]
+    python -m chessdata.explorer show "<fen>"
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import STARTING_FEN, Board, move_uci
+from chessdata.importer import DEFAULT_STUDIES_DIR, ArchivedStudy, _open_archive, study_id_from_filename
+from chessdata.pgn import iter_chapters
+from chessdata.position_index import is_standard, iter_positions
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_TREE_FILE = Path(os.getenv("EXPLORER_TREE_FILE", BACKEND_DIR / "data" / "explorer" / "opening_tree.bin"))
+
+MAGIC = b"CREXPL01"
+HEADER = struct.Struct("<8sIIIIII")   # magic, nodes, keys, offsets, records, strings, string count
+NODE = struct.Struct("<IHHH")
+EDGE = struct.Struct("<IIIH")
+PAIR = struct.Struct("<II")
+
+# Per node, only the most frequent openings / studies are kept
+MAX_OPENINGS = 5
+MAX_STUDIES = 10
+
+logger = logging.getLogger("chessdata.explorer")
+
+
+def opening_label(headers) -> str:
+    eco = headers.get("ECO", "?")
+    name = headers.get("Opening", "?")
+    parts = [p for p in (eco, name) if p and p != "?"]
+    return " ".join(parts)
+
+
+def collect_study(source, max_ply=40) -> list:
+    """Process-pool task: per chapter, its opening label, study id, positions and edges (deduplicated)."""
+    study_id = study_id_from_filename(source)
+    if isinstance(source, ArchivedStudy):
+        stream = _open_archive(source.archive).open(source.study_id)
+    else:
+        stream = Path(source)
+    chapters = []
+    for chapter in iter_chapters(stream):
+        if not is_standard(chapter):
+            continue
+        positions = set()
+        edges = {}
+        try:
+            for board, ply, parent, san, move in iter_positions(chapter):
+                if ply > max_ply:
+                    continue
+                key = board.zobrist()
+                positions.add(key)
+                if move:  # skip the start position and null moves
+                    edges.setdefault((parent, move), (key, san))
+        except ValueError:
+            continue  # unusable FEN header
+        chapters.append({
+            "study_id": chapter.study_id or study_id,
+            "opening": opening_label(chapter.headers),
+            "positions": positions,
+            "edges": edges,
+        })
+    return chapters
+
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, value: str) -> int:
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return sid
+
+
+def build_tree(sources, out_file, max_ply=40, workers=None) -> dict:
+    started = time.perf_counter()
+    occurrences = Counter()
+    openings = defaultdict(Counter)
+    studies = defaultdict(Counter)
+    edges = {}   # (parent key, move) -> [child key, SAN, count]
+    chapters = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        tasks = pool.map(collect_study, sources, [max_ply] * len(sources), chunksize=4)
+        for result in tasks:
+            for chapter in result:
+                chapters += 1
+                occurrences.update(chapter["positions"])
+                for key in chapter["positions"]:
+                    studies[key][chapter["study_id"]] += 1
+                    if chapter["opening"]:
+                        openings[key][chapter["opening"]] += 1
+                for edge, (child, san) in chapter["edges"].items():
+                    entry = edges.get(edge)
+                    if entry is None:
+                        edges[edge] = [child, san, 1]
+                    else:
+                        entry[2] += 1
+
+    keys = np.array(sorted(occurrences), dtype=np.uint64)
+    node_ids = {int(key): i for i, key in enumerate(keys)}
+    children = defaultdict(list)
+    for (parent, move), (child, san, count) in edges.items():
+        children[parent].append((node_ids[child], count, san, move))
+
+    strings = _Strings()
+    records = bytearray()
+    offsets = np.zeros(len(keys), dtype=np.uint32)
+    for i, key in enumerate(keys):
+        key = int(key)
+        offsets[i] = len(records)
+        moves = sorted(children.get(key, ()), key=lambda m: -m[1])
+        top_openings = openings[key].most_common(MAX_OPENINGS) if key in openings else []
+        top_studies = studies[key].most_common(MAX_STUDIES)
+        records += NODE.pack(occurrences[key], len(moves), len(top_openings), len(top_studies))
+        for child_id, count, san, move in moves:
+            records += EDGE.pack(child_id, count, strings.id(san), move)
+        for label, count in top_openings:
+            records += PAIR.pack(strings.id(label), count)
+        for study_id, count in top_studies:
+            records += PAIR.pack(strings.id(study_id), count)
+
+    blob = bytearray()
+    string_offsets = np.zeros(len(strings.values) + 1, dtype=np.uint32)
+    for i, value in enumerate(strings.values):
+        blob += value.encode("utf-8")
+        string_offsets[i + 1] = len(blob)
+
+    keys_at = HEADER.size
+    offsets_at = keys_at + keys.nbytes
+    records_at = offsets_at + offsets.nbytes
+    strings_at = records_at + len(records)
+    out_file = Path(out_file)
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_file.with_suffix(out_file.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys), keys_at, offsets_at, records_at, strings_at, len(strings.values)))
+        f.write(keys.tobytes())
+        f.write(offsets.tobytes())
+        f.write(records)
+        f.write(string_offsets.tobytes())
+        f.write(blob)
+    # Swap in atomically: the API may have the previous file mapped
+    os.replace(tmp, out_file)
+    return {
+        "chapters": chapters,
+        "nodes": len(keys),
+        "edges": len(edges),
+        "strings": len(strings.values),
+        "bytes": out_file.stat().st_size,
+        "build_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+class OpeningTree:
+    """Read side: a memory-mapped tree file, decoded one node at a time."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.node_count, keys_at, offsets_at, self._records_at, strings_at, string_count = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an opening tree file")
+        self.keys = np.frombuffer(self._mm, dtype=np.uint64, count=self.node_count, offset=keys_at)
+        self._offsets = np.frombuffer(self._mm, dtype=np.uint32, count=self.node_count, offset=offsets_at)
+        self._string_offsets = np.frombuffer(self._mm, dtype=np.uint32, count=string_count + 1, offset=strings_at)
+        self._blob_at = strings_at + self._string_offsets.nbytes
+
+    def _string(self, sid: int) -> str:
+        start = self._blob_at + int(self._string_offsets[sid])
+        end = self._blob_at + int(self._string_offsets[sid + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def node_id(self, key: int):
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i < self.node_count and int(self.keys[i]) == key:
+            return i
+        return None
+
+    def _read_node(self, node_id: int) -> dict:
+        pos = self._records_at + int(self._offsets[node_id])
+        occurrences, n_moves, n_openings, n_studies = NODE.unpack_from(self._mm, pos)
+        pos += NODE.size
+        moves = []
+        for _ in range(n_moves):
+            child, count, san, move = EDGE.unpack_from(self._mm, pos)
+            moves.append((child, count, san, move))
+            pos += EDGE.size
+        openings = []
+        for _ in range(n_openings):
+            openings.append(PAIR.unpack_from(self._mm, pos))
+            pos += PAIR.size
+        studies = []
+        for _ in range(n_studies):
+            studies.append(PAIR.unpack_from(self._mm, pos))
+            pos += PAIR.size
+        return {"occurrences": occurrences, "moves": moves, "openings": openings, "studies": studies}
+
+    def explore(self, fen: str = STARTING_FEN) -> dict:
+        """One node: the position's statistics and its next moves (children are not expanded)."""
+        board = Board(fen)
+        key = board.zobrist()
+        result = {"position": board.epd(), "key": f"{key:016x}", "occurrences": 0,
+                  "moves": [], "openings": [], "studies": []}
+        node_id = self.node_id(key)
+        if node_id is None:
+            return result
+        node = self._read_node(node_id)
+        result["occurrences"] = node["occurrences"]
+        for child, count, san, move in node["moves"]:
+            after = board.copy()
+            after.push(move)
+            child_pos = self._records_at + int(self._offsets[child])
+            result["moves"].append({
+                "san": self._string(san),
+                "uci": move_uci(move),
+                "count": count,
+                # Chapters reaching the resulting position by any move order
+                "occurrences": NODE.unpack_from(self._mm, child_pos)[0],
+                "fen": after.fen(),
+            })
+        result["openings"] = [{"name": self._string(sid), "count": count} for sid, count in node["openings"]]
+        result["studies"] = [{"study_id": self._string(sid), "count": count} for sid, count in node["studies"]]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the opening explorer tree of the study corpus")
+    parser.add_argument("--tree", type=Path, default=DEFAULT_TREE_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    build.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+    build.add_argument("--max-ply", type=int, default=40)
+    build.add_argument("--workers", type=int, default=os.cpu_count())
+    show = sub.add_parser("show")
+    show.add_argument("fen", nargs="?", default=STARTING_FEN)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "build":
+        if args.archive:
+            from chessdata.archive import StudyArchive
+            sources = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+        else:
+            sources = sorted(args.dir.glob("*.pgn"))
+        if not sources:
+            sys.exit(f"No studies in {args.archive or args.dir}")
+        stats = build_tree(sources, args.tree, args.max_ply, args.workers)
+        logger.info(f"Built {args.tree}: {stats['nodes']} positions, {stats['edges']} moves from "
+                    f"{stats['chapters']} chapters, {stats['bytes'] / 1024:.0f} KiB in {stats['build_seconds']}s")
+        return
+
+    tree = OpeningTree(args.tree)
+    started = time.perf_counter()
+    result = tree.explore(args.fen)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(result, indent=1, ensure_ascii=False))
+    logger.info(f"Node read in {elapsed * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
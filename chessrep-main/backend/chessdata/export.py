@@ -0,0 +1,335 @@
+"""
+Columnar Parquet export of the training positions and the study corpus.
+
+Two tables under the export directory (EXPORT_DIR, default backend/data/warehouse),
+each a hive-partitioned Parquet dataset with one partition per export run:
+
+    positions/batch=<UTC timestamp>/part-0.parquet
+        one row per aimchess_fens.csv row: the FEN split into typed columns
+        (placement, side, castling, en passant, move counters), answers,
+        correct answer/move, piece count, material balance, validity
+        (chessdata.validate), source file
+    chapters/batch=<UTC timestamp>/part-0.parquet
+        one row per study chapter: ids, the common headers as columns plus
+        the full header map, ECO/opening, ply and move counts, variation,
+        comment, NAG and annotation counts, source file and its hash
+
+Low-cardinality string columns (side, castling, results, ECO, openings, SAN
+answers, study ids, ...) are dictionary-encoded both in the Arrow schema and
+in the files, and everything is zstd-compressed, so a reader pulling two
+columns reads a few kilobytes.
+
+Exports are incremental: export_state.json next to the tables records the
+row keys of exported positions and the content hash of every exported study
+file, and a run appends a new partition with only new positions and new or
+changed studies (a changed study appears again in the later batch; take the
+latest batch per study_id). --full drops both tables and starts over.
+
+    import pyarrow.dataset as ds
+    ds.dataset("data/warehouse/chapters", partitioning="hive").to_table(columns=["eco", "mainline_plies"])
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.export all [--full] [--csv ../../aimchess_fens.csv] [--dir ../../lichess_studies | --archive ...]
+    python -m chessdata.export show chapters --columns eco opening
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from chessdata.importer import DEFAULT_STUDIES_DIR, ArchivedStudy, _open_archive, study_id_from_filename
+from chessdata.manifest import sha256_file
+from chessdata.pgn import iter_chapters
+from chessdata.positions import DEFAULT_POSITIONS_CSV, material
+from chessdata.validate import check_position_row
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_EXPORT_DIR = Path(os.getenv("EXPORT_DIR", BACKEND_DIR / "data" / "warehouse"))
+STATE_FILE = "export_state.json"
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+POSITIONS_SCHEMA = pa.schema([
+    ("row_key", pa.string()),
+    ("index", pa.int32()),
+    ("fen", pa.string()),
+    ("placement", pa.string()),
+    ("side", _DICT),
+    ("castling", _DICT),
+    ("en_passant", _DICT),
+    ("halfmove", pa.int16()),
+    ("fullmove", pa.int16()),
+    ("answer1", _DICT),
+    ("answer2", _DICT),
+    ("correct_answer", _DICT),
+    ("correct_move", _DICT),
+    ("pieces", pa.int8()),
+    ("material_balance", pa.int16()),
+    ("valid", pa.bool_()),
+    ("errors", pa.string()),
+    ("source", _DICT),
+    ("exported_at", pa.timestamp("s", tz="UTC")),
+])
+
+# Headers promoted to their own columns; every header is also kept in `headers`
+CHAPTER_HEADERS = {
+    "event": "Event", "white": "White", "black": "Black", "result": "Result", "eco": "ECO",
+    "opening": "Opening", "variant": "Variant", "annotator": "Annotator", "date": "UTCDate",
+    "orientation": "Orientation", "starting_fen": "FEN",
+}
+_DICT_HEADERS = {"event", "white", "black", "result", "eco", "opening", "variant", "annotator", "orientation"}
+
+CHAPTERS_SCHEMA = pa.schema(
+    [
+        ("study_id", _DICT),
+        ("chapter_id", pa.string()),
+        ("chapter_index", pa.int16()),
+        ("name", pa.string()),
+    ]
+    + [(column, _DICT if column in _DICT_HEADERS else pa.string()) for column in CHAPTER_HEADERS]
+    + [
+        ("mainline_plies", pa.int32()),
+        ("moves", pa.int32()),
+        ("variations", pa.int32()),
+        ("comments", pa.int32()),
+        ("nags", pa.int32()),
+        ("annotations", pa.int32()),
+        ("headers", pa.map_(pa.string(), pa.string())),
+        ("source_file", _DICT),
+        ("sha256", _DICT),
+        ("exported_at", pa.timestamp("s", tz="UTC")),
+    ]
+)
+
+logger = logging.getLogger("chessdata.export")
+
+
+def position_row_key(row: dict) -> str:
+    raw = "|".join((row.get(field) or "").strip() for field in ("FEN", "Answer1", "Answer2", "CorrectAnswer"))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def position_record(row: dict, source: str, exported_at) -> dict:
+    fen = (row.get("FEN") or "").strip()
+    fields = fen.split() + [None] * 6
+    answer1 = (row.get("Answer1") or "").strip() or None
+    answer2 = (row.get("Answer2") or "").strip() or None
+    correct = (row.get("CorrectAnswer") or "").strip() or None
+    pieces, balance = material(fields[0] or "")
+    errors = check_position_row(row)["errors"]
+    try:
+        index = int(row.get("Index"))
+    except (TypeError, ValueError):
+        index = None
+
+    def counter(value):
+        return int(value) if value and value.isdigit() else None
+
+    return {
+        "row_key": position_row_key(row),
+        "index": index,
+        "fen": fen,
+        "placement": fields[0],
+        "side": fields[1],
+        "castling": fields[2],
+        "en_passant": fields[3],
+        "halfmove": counter(fields[4]),
+        "fullmove": counter(fields[5]),
+        "answer1": answer1,
+        "answer2": answer2,
+        "correct_answer": correct,
+        "correct_move": answer1 if correct == "Answer1" else answer2 if correct == "Answer2" else None,
+        "pieces": pieces,
+        "material_balance": balance,
+        "valid": not errors,
+        "errors": "; ".join(errors) or None,
+        "source": source,
+        "exported_at": exported_at,
+    }
+
+
+def chapter_records(source, sha256: str, exported_at) -> list:
+    """Process-pool task: one record per chapter of a study file or ArchivedStudy."""
+    study_id = study_id_from_filename(source)
+    if isinstance(source, ArchivedStudy):
+        stream = _open_archive(source.archive).open(source.study_id)
+    else:
+        stream = Path(source)
+    records = []
+    for index, chapter in enumerate(iter_chapters(stream)):
+        moves = variations = nags = annotations = 0
+        for move in chapter.iter_moves():
+            moves += 1
+            variations += len(move.variations)
+            nags += len(move.nags)
+            annotations += len(move.annotations)
+        record = {
+            "study_id": chapter.study_id or study_id,
+            "chapter_id": chapter.chapter_id or str(index),
+            "chapter_index": index,
+            "name": chapter.headers.get("ChapterName") or chapter.headers.get("Event", ""),
+        }
+        for column, header in CHAPTER_HEADERS.items():
+            value = chapter.headers.get(header)
+            record[column] = None if value in (None, "", "?") else value
+        record.update({
+            "mainline_plies": len(chapter.moves),
+            "moves": moves,
+            "variations": variations,
+            "comments": chapter.comment_count(),
+            "nags": nags,
+            "annotations": annotations + len(chapter.annotations),
+            "headers": list(chapter.headers.items()),
+            "source_file": source.name,
+            "sha256": sha256,
+            "exported_at": exported_at,
+        })
+        records.append(record)
+    return records
+
+
+class ParquetExporter:
+    def __init__(self, export_dir, full=False):
+        self.export_dir = Path(export_dir)
+        self.state_path = self.export_dir / STATE_FILE
+        if full:
+            for table in ("positions", "chapters"):
+                shutil.rmtree(self.export_dir / table, ignore_errors=True)
+            self.state_path.unlink(missing_ok=True)
+        self.state = {"positions": {}, "chapters": {}}
+        if self.state_path.exists():
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+        now = datetime.now(timezone.utc)
+        self.exported_at = now.replace(microsecond=0)
+        # Microseconds keep two runs within one second apart; still sorts in time order
+        self.batch = now.strftime("%Y%m%dT%H%M%S.%fZ")
+
+    def _append(self, table_name: str, records: list, schema: pa.Schema) -> Path:
+        table = pa.Table.from_pylist(records, schema=schema)
+        partition = self.export_dir / table_name / f"batch={self.batch}"
+        # Never write into another run's partition
+        partition.parent.mkdir(parents=True, exist_ok=True)
+        partition.mkdir()
+        path = partition / "part-0.parquet"
+        tmp = partition / "part-0.parquet.tmp"
+        pq.write_table(
+            table, tmp, compression="zstd",
+            use_dictionary=[f.name for f in schema if pa.types.is_dictionary(f.type)],
+        )
+        os.replace(tmp, path)
+        return path
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def export_positions(self, csv_path) -> dict:
+        csv_path = Path(csv_path)
+        known = self.state["positions"]
+        records = []
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                key = position_row_key(row)
+                if key in known:
+                    continue
+                known[key] = self.batch
+                records.append(position_record(row, csv_path.name, self.exported_at))
+        if records:
+            self._append("positions", records, POSITIONS_SCHEMA)
+            self._save_state()
+        return {"rows": len(records), "batch": self.batch if records else None}
+
+    def export_chapters(self, sources, workers=None) -> dict:
+        known = self.state["chapters"]
+        todo = []
+        for source in sources:
+            if isinstance(source, ArchivedStudy):
+                sha256 = _open_archive(source.archive).entry(source.study_id)["sha256"]
+            else:
+                sha256 = sha256_file(source)
+            if known.get(source.name) != sha256:
+                todo.append((source, sha256))
+        records = []
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                results = pool.map(
+                    chapter_records, [s for s, _ in todo], [h for _, h in todo], [self.exported_at] * len(todo),
+                    chunksize=4,
+                )
+                for (source, sha256), result in zip(todo, results):
+                    records.extend(result)
+                    known[source.name] = sha256
+        if records:
+            self._append("chapters", records, CHAPTERS_SCHEMA)
+            self._save_state()
+        return {"studies": len(todo), "rows": len(records), "batch": self.batch if records else None}
+
+
+def read_table(export_dir, table: str, columns=None) -> pa.Table:
+    """All partitions of one exported table, reading only `columns` ("batch" is the partition key)."""
+    dataset = ds.dataset(Path(export_dir) / table, format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the training positions and the study corpus to Parquet")
+    parser.add_argument("--out", type=Path, default=DEFAULT_EXPORT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("positions", "studies", "all"):
+        export = sub.add_parser(name)
+        export.add_argument("--full", action="store_true", help="drop the exported tables and export everything")
+        export.add_argument("--csv", type=Path, default=DEFAULT_POSITIONS_CSV)
+        export.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+        export.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+        export.add_argument("--workers", type=int, default=os.cpu_count())
+    show = sub.add_parser("show")
+    show.add_argument("table", choices=["positions", "chapters"])
+    show.add_argument("--columns", nargs="+")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "show":
+        started = time.perf_counter()
+        table = read_table(args.out, args.table, args.columns)
+        elapsed = time.perf_counter() - started
+        print(table.slice(0, 10).to_pandas().to_string())
+        logger.info(f"{table.num_rows} rows x {table.num_columns} columns read in {elapsed * 1000:.1f} ms")
+        return
+
+    exporter = ParquetExporter(args.out, full=args.full)
+    started = time.perf_counter()
+    if args.command in ("positions", "all"):
+        if not args.csv.exists():
+            sys.exit(f"No positions dataset at {args.csv}")
+        stats = exporter.export_positions(args.csv)
+        logger.info(f"positions: {stats['rows']} new rows" + (f" -> batch={stats['batch']}" if stats["batch"] else ""))
+    if args.command in ("studies", "all"):
+        if args.archive:
+            from chessdata.archive import StudyArchive
+            sources = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+        else:
+            sources = sorted(args.dir.glob("*.pgn"))
+        stats = exporter.export_chapters(sources, args.workers)
+        logger.info(f"chapters: {stats['rows']} rows from {stats['studies']} new or changed studies"
+                    + (f" -> batch={stats['batch']}" if stats["batch"] else ""))
+    logger.info(f"Export to {args.out} finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Vectorized position features for difficulty scoring and filtering.
+
+A batch of FENs is decoded into an (N, 12, 64) uint8 piece tensor (plane =
+color * 6 + piece type as in chessdata.bitboard, square 0 = a1), which is
+stored bit-packed as (N, 12, 8) and viewed as (N, 12) uint64 bitboards. All
+features are then computed on whole columns with NumPy shifts, masks and
+popcounts; there is no per-position Python code past splitting the FEN.
+
+    material_white/black, material_balance (side to move's view), phase
+    mobility_white/black      squares attacked and not occupied by own pieces
+                              (union of attack sets: a mobility proxy)
+    king_zone_attacks_*       squares around the king attacked by the opponent
+    pawn_shield_*             own pawns on the two ranks in front of the king
+    hanging_*                 attacked, undefended pieces
+    in_check
+    doubled/isolated/passed_pawns_*, pawn_islands_*
+    pawn_signature            uint16: files with white pawns | black pawn files << 8
+    answer1/answer2/correct_*: capture, check, mate, promotion, castle, piece
+
+difficulty combines them into one 0-100 score (percentile within the batch):
+quiet solutions, a forcing-looking wrong answer, busy boards, balanced
+material and exposed kings rank higher.
+
+Features are written to backend/data/features (FEATURES_DIR): positions.npz
+for aimchess_fens.csv (tagged with the dataset's content hash, so the API
+only uses it for the CSV it was built from) and chapters.npz for the final
+mainline position of every standard study chapter.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.features positions [--csv ../../aimchess_fens.csv]
+    python -m chessdata.features chapters [--dir ../../lichess_studies] [--workers 8]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import STARTING_FEN, Board, IllegalMoveError
+from chessdata.importer import DEFAULT_STUDIES_DIR, study_id_from_filename
+from chessdata.pgn import iter_chapters
+from chessdata.position_index import is_standard
+from chessdata.positions import DEFAULT_POSITIONS_CSV, PositionStore
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_FEATURES_DIR = Path(os.getenv("FEATURES_DIR", BACKEND_DIR / "data" / "features"))
+
+PLANE_SYMBOLS = b"PNBRQKpnbrqk"
+PIECE_WEIGHTS = np.array([1, 3, 3, 5, 9, 0], dtype=np.int16)
+# Non-pawn material (both sides) at or below which a position counts as an endgame (index 1 of chessdata.positions.PHASES)
+ENDGAME_MATERIAL = 26
+
+_U = np.uint64
+FILE_A = _U(0x0101010101010101)
+FILE_H = _U(0x8080808080808080)
+NOT_A = ~FILE_A
+NOT_H = ~FILE_H
+RANK_1 = _U(0xFF)
+_DIGITS = {ord(str(n)): "." * n for n in range(1, 9)}
+_DIGITS[ord("/")] = None
+
+logger = logging.getLogger("chessdata.features")
+
+
+# -- decoding ------------------------------------------------------------------
+
+def decode_planes(fens) -> np.ndarray:
+    """(N, 12, 64) uint8 piece tensor of FEN strings; unparsable placements decode to an empty board."""
+    squares = []
+    for fen in fens:
+        expanded = fen.split(" ", 1)[0].translate(_DIGITS)
+        squares.append(expanded if len(expanded) == 64 else "." * 64)
+    chars = np.frombuffer("".join(squares).encode("ascii", "replace"), dtype=np.uint8).reshape(-1, 8, 8)
+    chars = chars[:, ::-1, :].reshape(-1, 64)  # FEN lists rank 8 first; square 0 is a1
+    symbols = np.frombuffer(PLANE_SYMBOLS, dtype=np.uint8)
+    return (chars[:, None, :] == symbols[None, :, None]).astype(np.uint8)
+
+
+def pack_planes(planes: np.ndarray) -> np.ndarray:
+    """(N, 12, 64) 0/1 -> (N, 12, 8) uint8, bit i of byte j = square 8 * j + i."""
+    return np.packbits(planes, axis=2, bitorder="little")
+
+
+def unpack_planes(packed: np.ndarray) -> np.ndarray:
+    return np.unpackbits(packed, axis=2, bitorder="little", count=64)
+
+
+def bitboards(packed: np.ndarray) -> np.ndarray:
+    """(N, 12) uint64 bitboards viewing a packed tensor."""
+    return np.ascontiguousarray(packed).view("<u8").reshape(len(packed), 12)
+
+
+def side_to_move(fens) -> np.ndarray:
+    """0 = white, 1 = black, per FEN."""
+    return np.array([fen.split(" ")[1:2] == ["b"] for fen in fens], dtype=np.uint8)
+
+
+# -- bitboard column ops ---------------------------------------------------------
+
+if hasattr(np, "bitwise_count"):
+    def popcount(bb):
+        return np.bitwise_count(bb).astype(np.int16)
+else:  # NumPy < 2.0
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.int16)
+
+    def popcount(bb):
+        bb = np.ascontiguousarray(bb, dtype=np.uint64)
+        return _POPCOUNT8[bb.view(np.uint8)].reshape(bb.shape + (8,)).sum(axis=-1, dtype=np.int16)
+
+
+def north(bb):
+    return bb << _U(8)
+
+
+def south(bb):
+    return bb >> _U(8)
+
+
+def east(bb):
+    return (bb << _U(1)) & NOT_A
+
+
+def west(bb):
+    return (bb >> _U(1)) & NOT_H
+
+
+_DIRECTIONS = {
+    "n": north, "s": south, "e": east, "w": west,
+    "ne": lambda b: east(north(b)), "nw": lambda b: west(north(b)),
+    "se": lambda b: east(south(b)), "sw": lambda b: west(south(b)),
+}
+
+
+def north_fill(bb):
+    for shift in (8, 16, 32):
+        bb = bb | (bb << _U(shift))
+    return bb
+
+
+def south_fill(bb):
+    for shift in (8, 16, 32):
+        bb = bb | (bb >> _U(shift))
+    return bb
+
+
+def file_set(bb):
+    """8-bit mask of the files that have at least one bit of `bb`."""
+    return (south_fill(bb) & RANK_1).astype(np.uint8)
+
+
+def knight_attacks(bb):
+    n, s = north(bb), south(bb)
+    nn, ss = north(n), south(s)
+    return (east(nn) | west(nn) | east(ss) | west(ss)
+            | east(east(n)) | west(west(n)) | east(east(s)) | west(west(s)))
+
+
+def king_attacks(bb):
+    row = bb | east(bb) | west(bb)
+    return (row | north(row) | south(row)) & ~bb
+
+
+def pawn_attacks(bb, color: int):
+    forward = north(bb) if color == 0 else south(bb)
+    return east(forward) | west(forward)
+
+
+def slider_attacks(bb, empty, directions):
+    attacks = np.zeros_like(bb)
+    for name in directions:
+        step = _DIRECTIONS[name]
+        ray = step(bb)
+        for _ in range(7):
+            attacks |= ray
+            ray = step(ray & empty)
+    return attacks
+
+
+def attack_maps(bb):
+    """(white, black) union of attacked squares, sliders blocked by the current occupancy."""
+    occupied = np.bitwise_or.reduce(bb, axis=1)
+    empty = ~occupied
+    maps = []
+    for color in (0, 1):
+        base = color * 6
+        queens = bb[:, base + 4]
+        maps.append(
+            pawn_attacks(bb[:, base], color)
+            | knight_attacks(bb[:, base + 1])
+            | slider_attacks(bb[:, base + 2] | queens, empty, ("ne", "nw", "se", "sw"))
+            | slider_attacks(bb[:, base + 3] | queens, empty, ("n", "s", "e", "w"))
+            | king_attacks(bb[:, base + 5])
+        )
+    return maps
+
+
+# -- features ------------------------------------------------------------------
+
+def position_features(packed: np.ndarray, side: np.ndarray) -> dict:
+    bb = bitboards(packed)
+    counts = popcount(bb)                                      # (N, 12)
+    material = counts[:, :6] @ PIECE_WEIGHTS, counts[:, 6:] @ PIECE_WEIGHTS
+    non_pawn = (counts[:, 1:5] @ PIECE_WEIGHTS[1:5]) + (counts[:, 7:11] @ PIECE_WEIGHTS[1:5])
+    own = np.bitwise_or.reduce(bb[:, :6], axis=1), np.bitwise_or.reduce(bb[:, 6:], axis=1)
+    attacks = attack_maps(bb)
+    balance = (material[0] - material[1]).astype(np.int16)
+
+    features = {
+        "material_white": material[0].astype(np.int16),
+        "material_black": material[1].astype(np.int16),
+        "material_balance": np.where(side == 1, -balance, balance).astype(np.int16),
+        "phase": (non_pawn <= ENDGAME_MATERIAL).astype(np.uint8),
+        "pieces": counts.sum(axis=1).astype(np.int16),
+    }
+    pawns = bb[:, 0], bb[:, 6]
+    kings = bb[:, 5], bb[:, 11]
+    for color, name in ((0, "white"), (1, "black")):
+        them = color ^ 1
+        features[f"mobility_{name}"] = popcount(attacks[color] & ~own[color])
+        zone = kings[color] | king_attacks(kings[color])
+        features[f"king_zone_attacks_{name}"] = popcount(zone & attacks[them])
+        # The king's file and its neighbours, one and two ranks ahead of the king
+        step = north if color == 0 else south
+        front = step(kings[color]) | step(step(kings[color]))
+        front |= east(front) | west(front)
+        features[f"pawn_shield_{name}"] = popcount(front & pawns[color])
+        features[f"hanging_{name}"] = popcount(own[color] & ~kings[color] & attacks[them] & ~attacks[color])
+
+        files = file_set(pawns[color])
+        features[f"doubled_pawns_{name}"] = popcount(pawns[color]) - popcount(files)
+        file_fill = south_fill(north_fill(pawns[color]))
+        features[f"isolated_pawns_{name}"] = popcount(pawns[color] & ~(east(file_fill) | west(file_fill)))
+        if color == 0:
+            front_span = south_fill(south(pawns[1]))
+        else:
+            front_span = north_fill(north(pawns[0]))
+        features[f"passed_pawns_{name}"] = popcount(pawns[color] & ~(front_span | east(front_span) | west(front_span)))
+        features[f"pawn_islands_{name}"] = popcount(files & ~(files << np.uint8(1)))
+    features["in_check"] = np.where(
+        side == 0, (kings[0] & attacks[1]) != 0, (kings[1] & attacks[0]) != 0
+    ).astype(np.uint8)
+    features["pawn_signature"] = (
+        file_set(pawns[0]).astype(np.uint16) | (file_set(pawns[1]).astype(np.uint16) << np.uint16(8))
+    )
+    return features
+
+
+_PIECE_OF = np.zeros(256, dtype=np.uint8)  # SAN first character -> piece type (pawn = 0)
+for _i, _c in enumerate(b"NBRQK", start=1):
+    _PIECE_OF[_c] = _i
+
+
+def move_features(sans, prefix: str) -> dict:
+    """Properties read straight off SAN strings, as whole-column string ops."""
+    sans = np.asarray(sans, dtype=np.bytes_)
+    castle = np.char.startswith(sans, b"O") | np.char.startswith(sans, b"0")
+    piece = _PIECE_OF[sans.astype("S1").view(np.uint8)]
+    return {
+        f"{prefix}_capture": (np.char.find(sans, b"x") >= 0).astype(np.uint8),
+        f"{prefix}_check": ((np.char.find(sans, b"+") >= 0) | (np.char.find(sans, b"#") >= 0)).astype(np.uint8),
+        f"{prefix}_mate": (np.char.find(sans, b"#") >= 0).astype(np.uint8),
+        f"{prefix}_promotion": (np.char.find(sans, b"=") >= 0).astype(np.uint8),
+        f"{prefix}_castle": castle.astype(np.uint8),
+        f"{prefix}_piece": np.where(castle, 5, piece).astype(np.uint8),
+    }
+
+
+def difficulty(features: dict) -> np.ndarray:
+    """0-100 percentile of a weighted sum of the features above (higher = harder)."""
+    mobility = features["mobility_white"] + features["mobility_black"]
+    king_danger = features["king_zone_attacks_white"] + features["king_zone_attacks_black"]
+    raw = 0.02 * mobility + 0.05 * features["pieces"] + 0.1 * king_danger
+    raw = raw - 0.15 * np.minimum(np.abs(features["material_balance"]), 10)
+    if "correct_capture" in features:
+        quiet = (1 - features["correct_capture"]) * (1 - features["correct_check"])
+        tempting = np.maximum(features["wrong_capture"], features["wrong_check"])
+        raw = raw + 1.0 * quiet + 0.5 * tempting - 1.0 * features["correct_mate"]
+    ranks = np.argsort(np.argsort(raw, kind="stable"), kind="stable")
+    return (100 * ranks // max(len(raw) - 1, 1)).astype(np.uint8)
+
+
+def dataset_features(store: PositionStore) -> dict:
+    fens = store.fen.astype(str)
+    packed = pack_planes(decode_planes(fens))
+    features = position_features(packed, store.side)
+    correct = store.correct.astype(bool)
+    features.update(move_features(store.answer1, "answer1"))
+    features.update(move_features(store.answer2, "answer2"))
+    features.update(move_features(np.where(correct, store.answer2, store.answer1), "correct"))
+    features.update(move_features(np.where(correct, store.answer1, store.answer2), "wrong"))
+    features["difficulty"] = difficulty(features)
+    features["planes"] = packed
+    return features
+
+
+def save_features(path, features: dict, **meta):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, **features, **{f"meta_{k}": np.asarray(v) for k, v in meta.items()})
+    os.replace(tmp, path)
+
+
+def load_features(path) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def final_positions(source) -> list:
+    """Process-pool task: (chapter id, FEN after the last mainline move) per standard chapter."""
+    study_id = study_id_from_filename(source)
+    result = []
+    for index, chapter in enumerate(iter_chapters(Path(source))):
+        if not is_standard(chapter):
+            continue
+        try:
+            board = Board(chapter.starting_fen or STARTING_FEN)
+        except ValueError:
+            continue  # unusable FEN header
+        for move in chapter.moves:
+            try:
+                board.push_san(move.san)
+            except IllegalMoveError:
+                break
+        result.append((f"{chapter.study_id or study_id}:{chapter.chapter_id or index}", board.fen()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute position features for the positions dataset / studies")
+    parser.add_argument("--out", type=Path, default=DEFAULT_FEATURES_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    positions = sub.add_parser("positions")
+    positions.add_argument("--csv", type=Path, default=DEFAULT_POSITIONS_CSV)
+    chapters = sub.add_parser("chapters")
+    chapters.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    chapters.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "positions":
+        store = PositionStore.load(args.csv)
+        started = time.perf_counter()
+        features = dataset_features(store)
+        elapsed = time.perf_counter() - started
+        out = args.out / "positions.npz"
+        save_features(out, features, version=store.version, index=store.index)
+        logger.info(f"{len(store)} positions, {len(features) - 1} features in {elapsed * 1000:.1f} ms -> {out}")
+        return
+
+    files = sorted(args.dir.glob("*.pgn"))
+    if not files:
+        sys.exit(f"No .pgn files in {args.dir}")
+    ids, fens = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(final_positions, files, chunksize=4):
+            for chapter_id, fen in result:
+                ids.append(chapter_id)
+                fens.append(fen)
+    started = time.perf_counter()
+    packed = pack_planes(decode_planes(fens))
+    features = position_features(packed, side_to_move(fens))
+    features["difficulty"] = difficulty(features)
+    features["planes"] = packed
+    elapsed = time.perf_counter() - started
+    out = args.out / "chapters.npz"
+    save_features(out, features, chapter_ids=np.array(ids), fens=np.array(fens))
+    logger.info(f"{len(ids)} chapter end positions, {len(features) - 1} features in {elapsed * 1000:.1f} ms -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Bulk importer: lichess_studies/*.pgn -> MongoDB.
+
+PGN files are parsed in a process pool, one file per task. Parsed studies are
+turned into upsert operations and pushed through a bounded queue to a few
+writer tasks that send them as bulk_write(ordered=False) batches, so import
+time scales with cores instead of file count x database round trips.
+
+Studies are keyed on the study id from each chapter's ChapterURL header (the
+NNN_<id>.pgn file name is the fallback for exports without one):
+
+    lichess_studies   {_id: studyId, name, chapter_count, source_file, imported_at}
+    lichess_chapters  {_id: "studyId:chapterId", study_id, index, name, headers, moves, ...}
+
+With --archive the studies are read from a single-archive store (see
+chessdata.archive) instead of the folder of .pgn files.
+
+Re-imports are incremental: files whose hash matches the manifest's last
+import are skipped, and in changed files only chapters whose content hash
+changed are upserted (see chessdata.manifest). --full ignores the manifest.
+
+Usage (from chessrep-main/backend, MONGO_URL/DB_NAME from .env):
+    python -m chessdata.importer [--dir ../../lichess_studies] [--workers 8] [--full] [--dry-run]
+    python -m chessdata.importer --archive ../../lichess_studies.pack
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from pymongo import ASCENDING, DeleteMany, IndexModel, UpdateOne
+
+from chessdata.archive import StudyArchive
+from chessdata.manifest import StudyManifest, default_manifest_path, document_hash, sha256_file
+from chessdata.pgn import iter_chapters
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_STUDIES_DIR = Path(os.getenv("STUDIES_DIR", BACKEND_DIR.parent.parent / "lichess_studies"))
+
+STUDIES_COLLECTION = "lichess_studies"
+CHAPTERS_COLLECTION = "lichess_chapters"
+CHAPTER_INDEXES = [IndexModel([("study_id", ASCENDING), ("index", ASCENDING)], name="study_index")]
+
+logger = logging.getLogger("chessdata.importer")
+
+
+def move_to_dict(move) -> dict:
+    # Empty fields are left out to keep chapter documents small
+    doc = {"san": move.san}
+    if move.nags:
+        doc["nags"] = move.nags
+    if move.comment is not None:
+        doc["comment"] = move.comment
+    if move.comment_before is not None:
+        doc["comment_before"] = move.comment_before
+    if move.nags_before:
+        doc["nags_before"] = move.nags_before
+    if move.annotations:
+        doc["annotations"] = move.annotations
+    if move.variations:
+        doc["variations"] = [[move_to_dict(m) for m in line] for line in move.variations]
+    return doc
+
+
+class ArchivedStudy(NamedTuple):
+    archive: str
+    study_id: str
+
+    @property
+    def name(self) -> str:
+        return f"{Path(self.archive).name}:{self.study_id}"
+
+
+def study_id_from_filename(path) -> str:
+    if isinstance(path, ArchivedStudy):
+        return path.study_id
+    stem = path.stem
+    return stem.split("_", 1)[1] if "_" in stem else stem
+
+
+# Archives opened by this (worker) process, so the index is read once, not per study
+_archives = {}
+
+
+def _open_archive(path) -> StudyArchive:
+    archive = _archives.get(path)
+    if archive is None:
+        archive = _archives[path] = StudyArchive(path)
+    else:
+        archive.refresh()
+    return archive
+
+
+def chapter_document(chapter, study_id: str, index: int) -> dict:
+    chapter_id = chapter.chapter_id or str(index)
+    return {
+        "_id": f"{study_id}:{chapter_id}",
+        "study_id": study_id,
+        "chapter_id": chapter_id,
+        "index": index,
+        "name": chapter.headers.get("ChapterName") or chapter.headers.get("Event", ""),
+        "headers": chapter.headers,
+        "comment": chapter.comment,
+        "annotations": chapter.annotations,
+        "result": chapter.result,
+        "moves": [move_to_dict(m) for m in chapter.moves],
+    }
+
+
+def parse_study_file(path, known_sha256: str = None, known_chapter_hashes: dict = None) -> dict:
+    """Process-pool task: parse one PGN file (or ArchivedStudy) into a study document and its changed chapters.
+
+    With the hashes from the last import, an unchanged file is not parsed at
+    all and only chapters whose content hash differs are returned.
+    """
+    if isinstance(path, ArchivedStudy):
+        archive = _open_archive(path.archive)
+        entry = archive.entry(path.study_id)
+        manifest_id = path.study_id
+        # The index already records the content hash of each frame
+        file_hash = entry["sha256"]
+        source_name = entry.get("file") or f"{manifest_id}.pgn"
+        source = archive.open(path.study_id)
+    else:
+        path = Path(path)
+        manifest_id = study_id_from_filename(path)
+        file_hash = sha256_file(path)
+        source_name = path.name
+        source = path
+    if known_sha256 is not None and known_sha256 == file_hash:
+        return {"unchanged": True, "manifest_id": manifest_id, "sha256": file_hash}
+
+    known_chapter_hashes = known_chapter_hashes or {}
+    chapters = []
+    chapter_ids = []
+    chapter_hashes = {}
+    study_id = None
+    study_name = None
+    for index, chapter in enumerate(iter_chapters(source)):
+        if study_id is None:
+            study_id = chapter.study_id or manifest_id
+            study_name = chapter.headers.get("StudyName") or chapter.headers.get("Event", "")
+        document = chapter_document(chapter, study_id, index)
+        digest = document_hash(document)
+        chapter_ids.append(document["_id"])
+        chapter_hashes[document["chapter_id"]] = digest
+        if known_chapter_hashes.get(document["chapter_id"]) != digest:
+            chapters.append(document)
+    return {
+        "unchanged": False,
+        "manifest_id": manifest_id,
+        "sha256": file_hash,
+        "study": {
+            "_id": study_id or manifest_id,
+            "name": study_name,
+            "chapter_count": len(chapter_ids),
+            "source_file": source_name,
+        },
+        "chapters": chapters,
+        "chapter_ids": chapter_ids,
+        "chapter_hashes": chapter_hashes,
+    }
+
+
+def _upsert(document: dict) -> UpdateOne:
+    # _id goes in the filter only: an upsert inserts it from there, and $set may not touch it
+    fields = {key: value for key, value in document.items() if key != "_id"}
+    return UpdateOne({"_id": document["_id"]}, {"$set": fields}, upsert=True)
+
+
+def study_operations(parsed: dict, imported_at: datetime):
+    study = dict(parsed["study"], imported_at=imported_at)
+    chapter_ops = [_upsert(c) for c in parsed["chapters"]]
+    # Chapters that disappeared from the study since the last import
+    chapter_ops.append(DeleteMany({"study_id": study["_id"], "_id": {"$nin": parsed["chapter_ids"]}}))
+    return _upsert(study), chapter_ops
+
+
+class BulkImporter:
+    def __init__(self, db, workers=None, batch_size=500, queue_size=5000, writers=4, manifest: StudyManifest = None):
+        self.db = db
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.writers = writers
+        self.manifest = manifest
+        self.files_done = 0
+        self.files_unchanged = 0
+        self.chapters = 0
+        self.chapters_written = 0
+        self.operations = 0
+        self.failed_files = []
+        self._imported = []          # (manifest id, file hash, chapter hashes)
+        self._failed_studies = set()
+
+    async def run(self, files):
+        loop = asyncio.get_running_loop()
+        # (collection, operation, manifest id); bounded so parsing can't run far ahead of writing
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        writers = [asyncio.create_task(self._writer(queue)) for _ in range(self.writers)]
+        imported_at = datetime.utcnow()
+        # At most two parsed files per worker waiting to be queued
+        slots = asyncio.Semaphore(self.workers * 2)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            async def parse_and_queue(path):
+                known = self.manifest.get(study_id_from_filename(path)) if self.manifest else {}
+                if known.get("import_status") != "imported":
+                    known = {}
+                async with slots:
+                    try:
+                        parsed = await loop.run_in_executor(
+                            pool, parse_study_file, path if isinstance(path, ArchivedStudy) else str(path), known.get("imported_sha256"), known.get("chapter_hashes")
+                        )
+                    except Exception as e:
+                        logger.error(f"Failed to parse {path.name}: {e}")
+                        self.failed_files.append(path.name)
+                        if self.manifest:
+                            self.manifest.update(study_id_from_filename(path), import_status="failed")
+                        return
+                    self.files_done += 1
+                    if parsed["unchanged"]:
+                        self.files_unchanged += 1
+                        return
+                    manifest_id = parsed["manifest_id"]
+                    study_op, chapter_ops = study_operations(parsed, imported_at)
+                    await queue.put((STUDIES_COLLECTION, study_op, manifest_id))
+                    for op in chapter_ops:
+                        await queue.put((CHAPTERS_COLLECTION, op, manifest_id))
+                    self.chapters += len(parsed["chapter_ids"])
+                    self.chapters_written += len(parsed["chapters"])
+                    self._imported.append((manifest_id, parsed["sha256"], parsed["chapter_hashes"]))
+
+            await asyncio.gather(*[parse_and_queue(path) for path in files])
+
+        for _ in writers:
+            await queue.put(None)
+        await asyncio.gather(*writers)
+
+        if self.manifest:
+            # Only studies whose every batch was written count as imported
+            for manifest_id, file_hash, chapter_hashes in self._imported:
+                if manifest_id in self._failed_studies:
+                    self.manifest.update(manifest_id, import_status="failed")
+                else:
+                    self.manifest.record_import(manifest_id, file_hash, chapter_hashes)
+
+    async def _writer(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            # Take whatever else is already queued, up to a full batch
+            while len(batch) < self.batch_size and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            by_collection = {}
+            for collection, op, manifest_id in batch:
+                ops, studies = by_collection.setdefault(collection, ([], set()))
+                ops.append(op)
+                studies.add(manifest_id)
+            for collection, (ops, studies) in by_collection.items():
+                if not await self._flush(collection, ops):
+                    self._failed_studies.update(studies)
+            if stop:
+                return
+
+    async def _flush(self, collection, ops):
+        try:
+            await self.db[collection].bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.error(f"bulk_write of {len(ops)} operations to {collection} failed: {e}")
+            return False
+        self.operations += len(ops)
+        return True
+
+
+def dry_run(files, workers):
+    chapters = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for parsed in pool.map(parse_study_file, [f if isinstance(f, ArchivedStudy) else str(f) for f in files]):
+            chapters += len(parsed["chapters"])
+    return chapters
+
+
+async def import_studies(files, workers, batch_size, queue_size, manifest=None):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from health import mongo_client_options
+
+    load_dotenv(BACKEND_DIR / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], **mongo_client_options())
+    try:
+        db = client[os.environ["DB_NAME"]]
+        await db[CHAPTERS_COLLECTION].create_indexes(CHAPTER_INDEXES)
+        importer = BulkImporter(db, workers=workers, batch_size=batch_size, queue_size=queue_size, manifest=manifest)
+        await importer.run(files)
+        return importer
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import lichess study PGNs into MongoDB")
+    parser.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    parser.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--queue-size", type=int, default=5000)
+    parser.add_argument("--manifest", type=Path, help="defaults to <dir>.manifest.json next to the studies folder")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-import everything")
+    parser.add_argument("--dry-run", action="store_true", help="parse only, write nothing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.archive:
+        files = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+    else:
+        files = sorted(args.dir.glob("*.pgn"))
+    if not files:
+        sys.exit(f"No studies in {args.archive or args.dir}")
+
+    started = time.perf_counter()
+    if args.dry_run:
+        chapters = dry_run(files, args.workers)
+        logger.info(f"Parsed {len(files)} files / {chapters} chapters in {time.perf_counter() - started:.2f}s (dry run)")
+        return
+
+    manifest = StudyManifest(args.manifest or default_manifest_path(args.dir))
+    dropped = manifest.prune(study_id_from_filename(f) for f in files)
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} studies whose files are gone from the manifest")
+    if args.full:
+        for entry in manifest.studies.values():
+            entry.pop("imported_sha256", None)
+            entry.pop("chapter_hashes", None)
+    try:
+        importer = asyncio.run(import_studies(files, args.workers, args.batch_size, args.queue_size, manifest))
+    finally:
+        manifest.save()
+    logger.info(
+        f"Imported {importer.files_done}/{len(files)} files ({importer.files_unchanged} unchanged), "
+        f"{importer.chapters_written}/{importer.chapters} chapters changed, "
+        f"{importer.operations} write operations in {time.perf_counter() - started:.2f}s"
+    )
+    if importer.failed_files:
+        logger.warning(f"Failed files: {', '.join(importer.failed_files)}")
+
+
+if __name__ == "__main__":
+    main()
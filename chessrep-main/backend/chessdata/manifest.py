@@ -0,0 +1,123 @@
+"""
+Content-hash manifest for the lichess_studies corpus.
+
+One JSON file next to the studies folder (lichess_studies.manifest.json)
+records, per study id:
+
+    file             NNN_<id>.pgn file name
+    sha256, size     content hash and size of the file as last downloaded
+    etag, last_modified
+                     validators from the download, sent back as
+                     If-None-Match / If-Modified-Since on the next run
+    downloaded_at
+    import_status    "pending" | "imported" | "failed"
+    imported_sha256  file hash at the last successful import
+    chapter_hashes   {chapterId: hash} at the last successful import
+
+The scraper uses it to skip unchanged downloads, the importer to skip
+unchanged files and upsert only the chapters whose hash changed. Studies
+whose file has been deleted are dropped on the next import, so a file that
+comes back later is treated as new.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+def default_manifest_path(studies_dir) -> Path:
+    studies_dir = Path(studies_dir)
+    return studies_dir.parent / f"{studies_dir.name}.manifest.json"
+
+
+def sha256_file(path, chunk_size=1 << 16) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def document_hash(document: dict) -> str:
+    """Stable hash of a JSON-serialisable document (key order independent)."""
+    raw = json.dumps(document, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class StudyManifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.studies = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.studies = json.load(f).get("studies", {})
+        self._dirty = False
+
+    def get(self, study_id) -> dict:
+        return self.studies.get(study_id, {})
+
+    def update(self, study_id, **fields):
+        entry = self.studies.setdefault(study_id, {})
+        entry.update(fields)
+        self._dirty = True
+        return entry
+
+    def record_download(self, study_id, file_name, sha256, size, etag=None, last_modified=None):
+        entry = self.get(study_id)
+        changed = entry.get("sha256") != sha256
+        self.update(
+            study_id,
+            file=file_name,
+            sha256=sha256,
+            size=size,
+            etag=etag,
+            last_modified=last_modified,
+            downloaded_at=datetime.utcnow().isoformat(timespec="seconds"),
+        )
+        if changed:
+            self.update(study_id, import_status="pending")
+        return changed
+
+    def record_import(self, study_id, sha256, chapter_hashes):
+        self.update(
+            study_id,
+            import_status="imported",
+            imported_sha256=sha256,
+            chapter_hashes=chapter_hashes,
+            imported_at=datetime.utcnow().isoformat(timespec="seconds"),
+        )
+
+    def prune(self, study_ids) -> list:
+        """Drop the entries of studies not in `study_ids` (their files are gone); returns the dropped ids."""
+        keep = set(study_ids)
+        dropped = sorted(study_id for study_id in self.studies if study_id not in keep)
+        for study_id in dropped:
+            del self.studies[study_id]
+        if dropped:
+            self._dirty = True
+        return dropped
+
+    def conditional_headers(self, study_id) -> dict:
+        entry = self.get(study_id)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "studies": self.studies}, f, indent=1, sort_keys=True)
+        # Atomic replace so a crash mid-write never leaves a truncated manifest
+        os.replace(tmp, self.path)
+        self._dirty = False
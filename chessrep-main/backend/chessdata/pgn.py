@@ -0,0 +1,311 @@
+"""
+Streaming PGN parser.
+
+iter_chapters() reads a PGN file (or a text/binary stream) line by line and
+yields one Chapter at a time, so memory is bounded by the size of a single
+chapter rather than the whole file. Unlike splitting on "[Event", header
+lines are only recognised outside comments, and the full move tree is kept:
+mainline, nested variations, NAGs, comments and the [%cmd ...] annotations
+lichess embeds in comments (%cal, %csl, %clk, %eval).
+
+    for chapter in iter_chapters("lichess_studies/003_Je3kmuYC.pgn"):
+        print(chapter.study_id, chapter.headers["ChapterName"], len(chapter.moves))
+"""
+
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+HEADER_RE = re.compile(r'^\s*\[([A-Za-z0-9_]+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+ANNOTATION_RE = re.compile(r"\[%(\w+)\s+([^\]]*)\]")
+TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>\{)
+    |(?P<line_comment>;.*)
+    |(?P<open>\()
+    |(?P<close>\))
+    |(?P<nag>\$\d+)
+    |(?P<result>1-0|0-1|1/2-1/2|\*)
+    |(?P<san>(?:[NBRQK]?[a-h]?[1-8]?x?[a-h][1-8](?:=?[NBRQ])?|O-O(?:-O)?|0-0(?:-0)?|--|Z0)[+#]?)
+    |(?P<number>\d+\.*)
+    |(?P<suffix>[!?]+)
+    |(?P<other>\S)
+    """,
+    re.VERBOSE,
+)
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# Move suffix annotations and their standard NAG numbers
+SUFFIX_NAGS = {"!": 1, "?": 2, "!!": 3, "??": 4, "!?": 5, "?!": 6}
+
+
+@dataclass(slots=True)
+class Move:
+    san: str
+    nags: List[int] = field(default_factory=list)
+    comment: Optional[str] = None          # text after the move
+    comment_before: Optional[str] = None   # text before the first move of a variation
+    nags_before: List[int] = field(default_factory=list)  # NAGs before the first move of a line
+    annotations: Dict[str, str] = field(default_factory=dict)
+    variations: List[List["Move"]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Chapter:
+    headers: Dict[str, str] = field(default_factory=dict)
+    moves: List[Move] = field(default_factory=list)
+    comment: Optional[str] = None          # comment before the first move
+    annotations: Dict[str, str] = field(default_factory=dict)
+    result: str = "*"
+
+    def _url_ids(self):
+        # ChapterURL: https://lichess.org/study/<studyId>/<chapterId>
+        parts = self.headers.get("ChapterURL", "").rstrip("/").split("/")
+        if "study" not in parts:
+            return None, None
+        ids = parts[parts.index("study") + 1:]
+        return (ids[0] if ids else None), (ids[1] if len(ids) > 1 else None)
+
+    @property
+    def study_id(self) -> Optional[str]:
+        return self._url_ids()[0]
+
+    @property
+    def chapter_id(self) -> Optional[str]:
+        return self._url_ids()[1]
+
+    @property
+    def starting_fen(self) -> Optional[str]:
+        return self.headers.get("FEN")
+
+    def iter_moves(self) -> Iterator[Move]:
+        """Every move in the chapter: mainline and all variations, depth first."""
+        stack = [iter(self.moves)]
+        while stack:
+            move = next(stack[-1], None)
+            if move is None:
+                stack.pop()
+                continue
+            yield move
+            for variation in reversed(move.variations):
+                stack.append(iter(variation))
+
+    def comment_count(self) -> int:
+        count = 1 if self.comment else 0
+        for move in self.iter_moves():
+            count += (move.comment is not None) + (move.comment_before is not None)
+        return count
+
+
+def _unescape(value: str) -> str:
+    return value.replace('\\"', '"').replace("\\\\", "\\") if "\\" in value else value
+
+
+def _split_comment(text: str):
+    """Separate [%cmd args] annotations from the human-readable comment text."""
+    annotations = {}
+    if "[%" in text:
+        for name, value in ANNOTATION_RE.findall(text):
+            annotations[name] = value.strip()
+        text = ANNOTATION_RE.sub("", text)
+    text = text.strip()
+    return (text or None), annotations
+
+
+class _ChapterBuilder:
+    def __init__(self):
+        self.chapter = Chapter()
+        self.line = self.chapter.moves
+        self.stack = []
+        self._reset_pending()
+        self.started = False   # any movetext token seen
+
+    def _reset_pending(self):
+        # Comment text, NAGs, annotations and variations met before the first move of the current line
+        self.pending_comment = None
+        self.pending_nags = []
+        self.pending_annotations = {}
+        self.pending_variations = []
+
+    def header(self, name, value):
+        self.chapter.headers[name] = _unescape(value)
+
+    def move(self, san):
+        self.started = True
+        move = Move(san)
+        if not self.line:
+            move.comment_before = self.pending_comment
+            move.nags_before = self.pending_nags
+            move.annotations.update(self.pending_annotations)
+            # A variation opened before any move is an alternative to this first move
+            move.variations = self.pending_variations
+            self._reset_pending()
+        self.line.append(move)
+
+    def nag(self, value):
+        if self.line:
+            self.line[-1].nags.append(value)
+        else:
+            self.pending_nags.append(value)
+
+    def comment(self, text):
+        self.started = True
+        text, annotations = _split_comment(text)
+        if self.line:
+            move = self.line[-1]
+            if text is not None:
+                move.comment = text if move.comment is None else f"{move.comment} {text}"
+            move.annotations.update(annotations)
+        elif not self.stack:
+            # Comment before the first mainline move belongs to the chapter
+            if text is not None:
+                self.chapter.comment = text if self.chapter.comment is None else f"{self.chapter.comment} {text}"
+            self.chapter.annotations.update(annotations)
+        else:
+            if text is not None:
+                self.pending_comment = text if self.pending_comment is None else f"{self.pending_comment} {text}"
+            self.pending_annotations.update(annotations)
+
+    def open_variation(self):
+        self.started = True
+        variation = []
+        if self.line:
+            self.line[-1].variations.append(variation)
+        else:
+            self.pending_variations.append(variation)
+        self.stack.append((self.line, self.pending_comment, self.pending_nags, self.pending_annotations,
+                           self.pending_variations))
+        self.line = variation
+        self._reset_pending()
+
+    def _finish_line(self):
+        """Keep what is still pending when a line ends without a move to attach it to."""
+        variations = [variation for variation in self.pending_variations if variation]
+        if self.line or not variations:
+            return
+        # Only variations: the first one takes the line's place, the others stay its alternatives
+        first, *others = variations
+        comment, nags, annotations = self.pending_comment, self.pending_nags, self.pending_annotations
+        self.line.extend(first)
+        self._reset_pending()
+        head = self.line[0]
+        head.variations.extend(others)
+        if comment is not None:
+            head.comment_before = comment if head.comment_before is None else f"{comment} {head.comment_before}"
+        head.nags_before[:0] = nags
+        head.annotations = {**annotations, **head.annotations}
+
+    def close_variation(self):
+        if self.stack:
+            self._finish_line()
+            (self.line, self.pending_comment, self.pending_nags, self.pending_annotations,
+             self.pending_variations) = self.stack.pop()
+
+    def finish(self) -> Chapter:
+        while self.stack:
+            self.close_variation()
+        self._finish_line()
+        return self.chapter
+
+
+def _open_source(source):
+    """Return (line iterator, file to close or None) for a path, text stream or binary stream."""
+    if isinstance(source, (str, bytes, os.PathLike)):
+        f = open(source, "r", encoding="utf-8", errors="replace", newline=None)
+        return f, f
+    if isinstance(source, io.TextIOBase):
+        return source, None
+    if hasattr(source, "read"):
+        # Binary stream (file opened in "rb", HTTP response raw, archive member...)
+        return io.TextIOWrapper(source, encoding="utf-8", errors="replace"), None
+    return iter(source), None
+
+
+def iter_chapters(source) -> Iterator[Chapter]:
+    """Yield Chapter objects one at a time from a PGN path or stream."""
+    lines, to_close = _open_source(source)
+    try:
+        yield from _parse_lines(lines)
+    finally:
+        if to_close is not None:
+            to_close.close()
+
+
+def parse_pgn(text: str) -> List[Chapter]:
+    """Parse a PGN string that is already in memory."""
+    return list(_parse_lines(io.StringIO(text)))
+
+
+def _parse_lines(lines) -> Iterator[Chapter]:
+    builder = _ChapterBuilder()
+    comment_parts = None  # collecting a {...} comment that spans lines
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        pos = 0
+
+        if comment_parts is not None:
+            end = line.find("}")
+            if end < 0:
+                comment_parts.append(line)
+                continue
+            comment_parts.append(line[:end])
+            builder.comment("\n".join(comment_parts))
+            comment_parts = None
+            pos = end + 1
+        else:
+            if line.startswith("%"):
+                continue  # PGN escape line
+            if line.lstrip().startswith("["):
+                match = HEADER_RE.match(line)
+                if match:
+                    if builder.started:
+                        # New game without a termination marker on the previous one
+                        yield builder.finish()
+                        builder = _ChapterBuilder()
+                    builder.header(match.group(1), match.group(2))
+                    continue
+
+        length = len(line)
+        while pos < length:
+            match = TOKEN_RE.search(line, pos)
+            if match is None:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == "san":
+                builder.move(match.group())
+            elif kind == "number" or kind == "other":
+                continue
+            elif kind == "comment":
+                end = line.find("}", pos)
+                if end < 0:
+                    comment_parts = [line[pos:]]
+                    break
+                builder.comment(line[pos:end])
+                pos = end + 1
+            elif kind == "nag":
+                builder.nag(int(match.group()[1:]))
+            elif kind == "suffix":
+                nag = SUFFIX_NAGS.get(match.group())
+                builder.nag(nag if nag is not None else (3 if match.group().startswith("!") else 4))
+            elif kind == "open":
+                builder.open_variation()
+            elif kind == "close":
+                builder.close_variation()
+            elif kind == "result":
+                if builder.stack:
+                    continue  # stray result inside a variation
+                builder.chapter.result = match.group()
+                yield builder.finish()
+                builder = _ChapterBuilder()
+            elif kind == "line_comment":
+                builder.comment(match.group()[1:])
+                break
+
+    if comment_parts is not None:
+        builder.comment("\n".join(comment_parts))
+    if builder.started or builder.chapter.headers:
+        yield builder.finish()
@@ -0,0 +1,128 @@
+"""
+Fixed-width binary position encoding.
+
+A position is 26 bytes (KEY_SIZE), 30 with the move counters (RECORD_SIZE),
+instead of a 60-90 byte FEN:
+
+    offset  size
+    0       8     occupancy bitboard, uint64 little-endian (bit 0 = a1)
+    8       16    one nibble per occupied square in square order: color * 6 + piece
+                  type as in chessdata.bitboard (low nibble first, unused nibbles 0)
+    24      2     state, uint16 LE: bit 0 side to move, bits 1-4 castling rights,
+                  bit 5 en passant available, bits 6-8 en passant file
+    --- KEY_SIZE = 26: everything that identifies the position
+    26      2     halfmove clock, uint16 LE
+    28      2     fullmove number, uint16 LE
+
+The key follows the same normalization as Board.zobrist(): castling rights
+the placement contradicts are dropped by the parser, and the en passant
+file is only kept when an en passant capture is actually possible, so equal
+positions always encode to equal bytes. At most 32 pieces fit.
+
+    data = encode(Board(fen))          # 30 bytes
+    decode(data).fen() == Board(fen).fen()
+
+key_bitboards() decodes a whole (N, 26) block of keys at once into the
+(N, 12) uint64 bitboards chessdata.features works on.
+"""
+
+import struct
+
+import numpy as np
+
+from chessdata.bitboard import CASTLING_FEN, PIECE_SYMBOLS, SQUARE_NAMES, Board, popcount, scan
+
+KEY_SIZE = 26
+RECORD_SIZE = 30
+MAX_PIECES = 32
+
+_HEAD = struct.Struct("<Q")
+_FEN_SYMBOLS = PIECE_SYMBOLS.upper() + PIECE_SYMBOLS
+
+# numpy view of a block of encoded records
+KEY_DTYPE = np.dtype((np.void, KEY_SIZE))
+
+
+def encode_key(board: Board) -> bytes:
+    """The 26-byte key of a position (move counters excluded)."""
+    occupied = board.occupied
+    nibbles = bytearray(16)
+    mailbox = board.mailbox
+    for i, sq in enumerate(scan(occupied)):
+        if i >= MAX_PIECES:
+            raise ValueError(f"more than {MAX_PIECES} pieces: {board.fen()}")
+        nibbles[i >> 1] |= mailbox[sq] << (4 * (i & 1))
+    state = board.turn | (board.castling << 1)
+    if board.ep_square is not None and board.has_ep_capture():
+        state |= (1 << 5) | ((board.ep_square & 7) << 6)
+    return _HEAD.pack(occupied) + bytes(nibbles) + state.to_bytes(2, "little")
+
+
+def encode(board: Board) -> bytes:
+    """The 30-byte record: key plus halfmove clock and fullmove number."""
+    return encode_key(board) + struct.pack("<HH", min(board.halfmove, 0xFFFF), min(board.fullmove, 0xFFFF))
+
+
+def encode_fen(fen: str) -> bytes:
+    return encode(Board(fen))
+
+
+def decode_fen(data: bytes) -> str:
+    """FEN of a key (counters default to 0 1) or of a full record."""
+    if len(data) not in (KEY_SIZE, RECORD_SIZE):
+        raise ValueError(f"encoded position must be {KEY_SIZE} or {RECORD_SIZE} bytes, got {len(data)}")
+    occupied, = _HEAD.unpack_from(data)
+    squares = [None] * 64
+    for i, sq in enumerate(scan(occupied)):
+        squares[sq] = (data[8 + (i >> 1)] >> (4 * (i & 1))) & 0xF
+    rows = []
+    for rank in range(7, -1, -1):
+        row, empty = "", 0
+        for file in range(8):
+            piece = squares[8 * rank + file]
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += _FEN_SYMBOLS[piece]
+        rows.append(row + (str(empty) if empty else ""))
+    state = int.from_bytes(data[24:26], "little")
+    castling = "".join(symbol for symbol, bit in CASTLING_FEN if (state >> 1) & bit) or "-"
+    ep = "-"
+    if state & (1 << 5):
+        file = (state >> 6) & 7
+        ep = SQUARE_NAMES[file + (40 if state & 1 == 0 else 16)]
+    halfmove, fullmove = struct.unpack_from("<HH", data, KEY_SIZE) if len(data) == RECORD_SIZE else (0, 1)
+    return f"{'/'.join(rows)} {'wb'[state & 1]} {castling} {ep} {halfmove} {fullmove}"
+
+
+def decode(data: bytes) -> Board:
+    return Board(decode_fen(data))
+
+
+def key_bitboards(keys: np.ndarray) -> np.ndarray:
+    """(N, 12) uint64 piece bitboards (plane = color * 6 + piece type) of an (N, 26) uint8 block of keys."""
+    keys = np.ascontiguousarray(keys, dtype=np.uint8).reshape(-1, KEY_SIZE)
+    occupied = np.unpackbits(keys[:, :8], axis=1, bitorder="little").astype(bool)
+    nibbles = np.empty((len(keys), MAX_PIECES), dtype=np.uint8)
+    nibbles[:, 0::2] = keys[:, 8:24] & 0xF
+    nibbles[:, 1::2] = keys[:, 8:24] >> 4
+    # The n-th occupied square holds the n-th nibble
+    rank = np.maximum(np.cumsum(occupied, axis=1) - 1, 0)
+    pieces = np.take_along_axis(nibbles, rank, axis=1)
+    boards = np.empty((len(keys), 12), dtype=np.uint64)
+    for plane in range(12):
+        bits = np.packbits(occupied & (pieces == plane), axis=1, bitorder="little")
+        boards[:, plane] = bits.view("<u8").ravel()
+    return boards
+
+
+def key_of(record: bytes) -> bytes:
+    return bytes(record[:KEY_SIZE])
+
+
+def piece_count(data: bytes) -> int:
+    return popcount(_HEAD.unpack_from(data)[0])
+
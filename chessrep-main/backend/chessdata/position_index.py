@@ -0,0 +1,246 @@
+"""
+Zobrist position index: which study chapters contain a position.
+
+The builder replays every chapter of the corpus (mainline and all
+variations) with chessdata.bitboard and records the 64-bit Zobrist key of
+every position it reaches. The result is three parallel NumPy arrays sorted
+by key, one row per (position, chapter) pair:
+
+    hashes.npy     uint64  Zobrist key
+    chapters.npy   uint32  row in chapters.json
+    plies.npy      uint16  first ply at which the chapter reaches the position
+    chapters.json  [{"id": "studyId:chapterId", "study_id", "name"}, ...] + build stats
+
+The API memory-maps the arrays at startup; a lookup is two binary searches
+over the key column, so a FEN resolves to its chapters in microseconds.
+Because the key ignores move counters and move order, transpositions match.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.position_index build [--dir ../../lichess_studies | --archive ...] [--workers 8]
+    python -m chessdata.position_index lookup "<fen>"
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import STARTING_FEN, Board, IllegalMoveError
+from chessdata.importer import DEFAULT_STUDIES_DIR, ArchivedStudy, _open_archive, study_id_from_filename
+from chessdata.pgn import iter_chapters
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_INDEX_DIR = Path(os.getenv("POSITION_INDEX_DIR", BACKEND_DIR / "data" / "position_index"))
+
+# Chapters in other variants (Atomic, Antichess, ...) follow different rules and are skipped
+STANDARD_VARIANTS = ("", "Standard", "From Position")
+
+logger = logging.getLogger("chessdata.position_index")
+
+
+def is_standard(chapter) -> bool:
+    return chapter.headers.get("Variant", "Standard") in STANDARD_VARIANTS
+
+
+def iter_positions(chapter, errors: list = None):
+    """Yield (board, ply, parent key, san, move) for the start position and after every move.
+
+    Mainline and variations are walked depth first; a variation starts from
+    the position before the move it replaces. The board is live: copy() it to
+    keep it. A line stops at its first illegal move (noted in `errors`).
+    """
+    board = Board(chapter.starting_fen or STARTING_FEN)
+    yield board, 0, None, None, None
+    yield from _walk(board, chapter.moves, 0, errors)
+
+
+def _walk(board, line, ply, errors):
+    for move in line:
+        for variation in move.variations:
+            yield from _walk(board.copy(), variation, ply, errors)
+        parent = board.zobrist()
+        try:
+            played = board.push_san(move.san)
+        except IllegalMoveError as e:
+            if errors is not None:
+                errors.append(str(e))
+            return
+        ply += 1
+        yield board, ply, parent, move.san, played
+
+
+def index_study(source) -> dict:
+    """Process-pool task: the (key, chapter row, ply) triples of one study file or ArchivedStudy."""
+    study_id = study_id_from_filename(source)
+    if isinstance(source, ArchivedStudy):
+        stream = _open_archive(source.archive).open(source.study_id)
+    else:
+        stream = Path(source)
+    chapters, hashes, rows, plies, errors = [], [], [], [], []
+    skipped = 0
+    for index, chapter in enumerate(iter_chapters(stream)):
+        if not is_standard(chapter):
+            skipped += 1
+            continue
+        row = len(chapters)
+        study = chapter.study_id or study_id
+        chapters.append({
+            # Same id as the lichess_chapters documents written by the importer
+            "id": f"{study}:{chapter.chapter_id or index}",
+            "study_id": study,
+            "name": chapter.headers.get("ChapterName") or chapter.headers.get("Event", ""),
+        })
+        try:
+            for board, ply, *_ in iter_positions(chapter, errors):
+                hashes.append(board.zobrist())
+                rows.append(row)
+                plies.append(ply)
+        except ValueError as e:
+            errors.append(f"{chapters[-1]['id']}: {e}")  # bad FEN header
+    return {
+        "chapters": chapters,
+        "hashes": np.array(hashes, dtype=np.uint64),
+        "rows": np.array(rows, dtype=np.uint32),
+        "plies": np.array(np.minimum(plies, np.iinfo(np.uint16).max), dtype=np.uint16),
+        "errors": errors,
+        "skipped": skipped,
+    }
+
+
+def build_index(sources, out_dir, workers=None) -> dict:
+    started = time.perf_counter()
+    chapters, hashes, rows, plies = [], [], [], []
+    errors = skipped = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for source, result in zip(sources, pool.map(index_study, sources, chunksize=4)):
+            hashes.append(result["hashes"])
+            rows.append(result["rows"] + len(chapters))
+            plies.append(result["plies"])
+            chapters.extend(result["chapters"])
+            skipped += result["skipped"]
+            errors += len(result["errors"])
+            for error in result["errors"][:3]:
+                logger.debug(f"{source.name}: {error}")
+
+    hashes = np.concatenate(hashes) if hashes else np.empty(0, np.uint64)
+    rows = np.concatenate(rows) if rows else np.empty(0, np.uint32)
+    plies = np.concatenate(plies) if plies else np.empty(0, np.uint16)
+    positions = len(hashes)
+
+    # One row per (key, chapter), keeping the earliest ply; sorted by key
+    order = np.lexsort((plies, rows, hashes))
+    hashes, rows, plies = hashes[order], rows[order], plies[order]
+    first = np.ones(len(hashes), dtype=bool)
+    first[1:] = (hashes[1:] != hashes[:-1]) | (rows[1:] != rows[:-1])
+    hashes, rows, plies = hashes[first], rows[first], plies[first]
+
+    stats = {
+        "chapters": len(chapters),
+        "positions": positions,
+        "entries": len(hashes),
+        "unique_positions": int(np.count_nonzero(np.diff(hashes)) + 1) if len(hashes) else 0,
+        "skipped_chapters": skipped,
+        "errors": errors,
+        "build_seconds": round(time.perf_counter() - started, 2),
+    }
+
+    # Write next to the target and swap in, so a running API never sees half an index
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "hashes.npy", hashes)
+    np.save(tmp / "chapters.npy", rows)
+    np.save(tmp / "plies.npy", plies)
+    with open(tmp / "chapters.json", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "stats": stats, "chapters": chapters}, f, ensure_ascii=False)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return stats
+
+
+class PositionIndex:
+    """Read side: memory-mapped arrays plus the chapter table."""
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        self.hashes = np.load(directory / "hashes.npy", mmap_mode="r")
+        self.rows = np.load(directory / "chapters.npy", mmap_mode="r")
+        self.plies = np.load(directory / "plies.npy", mmap_mode="r")
+        with open(directory / "chapters.json", "r", encoding="utf-8") as f:
+            table = json.load(f)
+        self.chapters = table["chapters"]
+        self.stats = table.get("stats", {})
+
+    @staticmethod
+    def exists(directory) -> bool:
+        return (Path(directory) / "hashes.npy").exists()
+
+    def find(self, key: int):
+        """(chapter rows, plies) of every chapter containing the position with Zobrist `key`."""
+        key = np.uint64(key)
+        lo = int(np.searchsorted(self.hashes, key, side="left"))
+        hi = int(np.searchsorted(self.hashes, key, side="right"))
+        return self.rows[lo:hi], self.plies[lo:hi]
+
+    def lookup(self, fen: str, limit: int = 100) -> dict:
+        board = Board(fen)
+        key = board.zobrist()
+        rows, plies = self.find(key)
+        # Earliest occurrences first
+        order = np.argsort(plies, kind="stable")[:limit]
+        return {
+            "position": board.epd(),
+            "key": f"{key:016x}",
+            "total": len(rows),
+            "chapters": [
+                dict(self.chapters[int(rows[i])], ply=int(plies[i])) for i in order
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the Zobrist position index of the study corpus")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    build.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+    build.add_argument("--workers", type=int, default=os.cpu_count())
+    lookup = sub.add_parser("lookup")
+    lookup.add_argument("fen")
+    lookup.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "build":
+        if args.archive:
+            from chessdata.archive import StudyArchive
+            sources = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+        else:
+            sources = sorted(args.dir.glob("*.pgn"))
+        if not sources:
+            sys.exit(f"No studies in {args.archive or args.dir}")
+        stats = build_index(sources, args.index, args.workers)
+        logger.info(f"Indexed {stats['chapters']} chapters / {stats['positions']} positions "
+                    f"({stats['unique_positions']} unique) into {args.index} in {stats['build_seconds']}s; "
+                    f"{stats['skipped_chapters']} non-standard chapters skipped, {stats['errors']} lines with errors")
+        return
+
+    index = PositionIndex(args.index)
+    started = time.perf_counter()
+    result = index.lookup(args.fen, args.limit)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(result, indent=1, ensure_ascii=False))
+    logger.info(f"Lookup took {elapsed * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
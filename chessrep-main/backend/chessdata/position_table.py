@@ -0,0 +1,300 @@
+"""
+Content-addressed position table for the training positions and the study corpus.
+
+Every distinct position is stored once, as its 26-byte chessdata.position_codec
+key, under its Zobrist key (Board.zobrist()) as ID: the same ID the position
+index and the opening explorer use, so the three join without translation.
+Puzzles and study chapters only keep references:
+
+    ids.npy             uint64[n]      sorted position IDs
+    keys.npy            uint8[n, 26]   encoded position of each ID
+    puzzle_refs.npy     (index u4, row u4, halfmove u2, fullmove u2) per CSV row
+    chapter_refs.npy    (ply u2, row u4) per position a chapter reaches, in replay
+                        order (mainline and variations, depth first), chapter by chapter
+    chapter_offsets.npy uint32[chapters + 1]: chapter i is chapter_refs[offsets[i]:offsets[i + 1]]
+    meta.json           chapter table (as in chessdata.position_index), CSV version, stats
+
+References point at table rows (4 bytes) rather than IDs (8 bytes); the
+row's ID is ids[row].
+
+The builder checks that no two distinct positions share an ID, so an ID
+always resolves to exactly one position.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.position_table build [--csv ../../aimchess_fens.csv] [--dir ../../lichess_studies]
+    python -m chessdata.position_table show <id | puzzle index>
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import Board
+from chessdata.importer import DEFAULT_STUDIES_DIR, ArchivedStudy, _open_archive, study_id_from_filename
+from chessdata.manifest import sha256_file
+from chessdata.pgn import iter_chapters
+from chessdata.position_codec import KEY_SIZE, decode, decode_fen, encode_key
+from chessdata.position_index import is_standard, iter_positions
+from chessdata.positions import DEFAULT_POSITIONS_CSV
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_TABLE_DIR = Path(os.getenv("POSITION_TABLE_DIR", BACKEND_DIR / "data" / "position_table"))
+
+PUZZLE_REF = np.dtype([("index", "<u4"), ("row", "<u4"), ("halfmove", "<u2"), ("fullmove", "<u2")])
+CHAPTER_REF = np.dtype([("ply", "<u2"), ("row", "<u4")])
+
+logger = logging.getLogger("chessdata.position_table")
+
+
+class PositionCollision(ValueError):
+    pass
+
+
+def _add(table: dict, key: int, encoded: bytes):
+    known = table.setdefault(key, encoded)
+    if known != encoded:
+        raise PositionCollision(f"two positions share id {key:016x}: {decode_fen(known)} / {decode_fen(encoded)}")
+
+
+def table_study(source) -> dict:
+    """Process-pool task: chapters, their positions' IDs and plies, and the distinct positions of one study."""
+    study_id = study_id_from_filename(source)
+    if isinstance(source, ArchivedStudy):
+        stream = _open_archive(source.archive).open(source.study_id)
+    else:
+        stream = Path(source)
+    chapters, counts, plies, ids, positions = [], [], [], [], {}
+    fen_bytes = 0
+    for index, chapter in enumerate(iter_chapters(stream)):
+        if not is_standard(chapter):
+            continue
+        study = chapter.study_id or study_id
+        chapters.append({
+            "id": f"{study}:{chapter.chapter_id or index}",
+            "study_id": study,
+            "name": chapter.headers.get("ChapterName") or chapter.headers.get("Event", ""),
+        })
+        before = len(ids)
+        try:
+            for board, ply, *_ in iter_positions(chapter):
+                key = board.zobrist()
+                _add(positions, key, encode_key(board))
+                ids.append(key)
+                plies.append(min(ply, 0xFFFF))
+                fen_bytes += len(board.fen())
+        except ValueError:
+            pass  # unusable FEN header: the chapter has no positions
+        counts.append(len(ids) - before)
+    return {"chapters": chapters, "counts": counts, "plies": np.array(plies, dtype=np.uint16),
+            "ids": np.array(ids, dtype=np.uint64), "positions": positions, "fen_bytes": fen_bytes}
+
+
+def build_table(csv_path, sources, out_dir, workers=None) -> dict:
+    started = time.perf_counter()
+    positions = {}
+    fen_bytes = 0
+
+    puzzle_refs = []
+    version = None
+    if csv_path and Path(csv_path).exists():
+        version = sha256_file(csv_path)[:16]
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                fen = (row.get("FEN") or "").strip()
+                try:
+                    board = Board(fen)
+                    index = int(row.get("Index") or number)
+                except ValueError:
+                    continue
+                key = board.zobrist()
+                _add(positions, key, encode_key(board))
+                puzzle_refs.append((index, key, min(board.halfmove, 0xFFFF), min(board.fullmove, 0xFFFF)))
+                fen_bytes += len(fen)
+
+    chapters, counts, chapter_plies, chapter_ids = [], [], [], []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(table_study, sources, chunksize=4):
+            chapters.extend(result["chapters"])
+            counts.extend(result["counts"])
+            chapter_plies.append(result["plies"])
+            chapter_ids.append(result["ids"])
+            fen_bytes += result["fen_bytes"]
+            for key, encoded in result["positions"].items():
+                _add(positions, key, encoded)
+
+    ids = np.array(sorted(positions), dtype=np.uint64)
+    keys = np.frombuffer(b"".join(positions[int(key)] for key in ids), dtype=np.uint8).reshape(-1, KEY_SIZE)
+    # References by table row
+    chapter_refs = np.empty(sum(counts), dtype=CHAPTER_REF)
+    if len(chapter_refs):
+        chapter_refs["ply"] = np.concatenate(chapter_plies)
+        chapter_refs["row"] = np.searchsorted(ids, np.concatenate(chapter_ids))
+    chapter_offsets = np.zeros(len(chapters) + 1, dtype=np.uint32)
+    np.cumsum(counts, out=chapter_offsets[1:])
+    puzzles = puzzle_refs
+    puzzle_refs = np.empty(len(puzzles), dtype=PUZZLE_REF)
+    if puzzles:
+        index, key, halfmove, fullmove = zip(*puzzles)
+        puzzle_refs["index"], puzzle_refs["halfmove"], puzzle_refs["fullmove"] = index, halfmove, fullmove
+        # uint64 from the start: a mix of keys above and below 2**63 would otherwise go through float64
+        puzzle_refs["row"] = np.searchsorted(ids, np.array(key, dtype=np.uint64))
+    table_bytes = ids.nbytes + keys.nbytes + puzzle_refs.nbytes + chapter_refs.nbytes + chapter_offsets.nbytes
+    stats = {
+        "positions": len(ids),
+        "references": len(puzzle_refs) + len(chapter_refs),
+        "puzzles": len(puzzle_refs),
+        "chapters": len(chapters),
+        "fen_bytes": fen_bytes,
+        "table_bytes": table_bytes,
+        "build_seconds": round(time.perf_counter() - started, 2),
+    }
+
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "ids.npy", ids)
+    np.save(tmp / "keys.npy", keys)
+    np.save(tmp / "puzzle_refs.npy", puzzle_refs)
+    np.save(tmp / "chapter_refs.npy", chapter_refs)
+    np.save(tmp / "chapter_offsets.npy", chapter_offsets)
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "csv_version": version, "stats": stats, "chapters": chapters}, f, ensure_ascii=False)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return stats
+
+
+class PositionTable:
+    """Read side: memory-mapped ID/key columns and reference arrays."""
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        self.ids = np.load(directory / "ids.npy", mmap_mode="r")
+        self.keys = np.load(directory / "keys.npy", mmap_mode="r")
+        self.puzzle_refs = np.load(directory / "puzzle_refs.npy", mmap_mode="r")
+        self.chapter_refs = np.load(directory / "chapter_refs.npy", mmap_mode="r")
+        self.chapter_offsets = np.load(directory / "chapter_offsets.npy", mmap_mode="r")
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.chapters = meta["chapters"]
+        self.csv_version = meta.get("csv_version")
+        self.stats = meta.get("stats", {})
+        self._chapter_rows = {chapter["id"]: row for row, chapter in enumerate(self.chapters)}
+        self._by_row = self._sorted_rows = None
+
+    @staticmethod
+    def exists(directory) -> bool:
+        return (Path(directory) / "ids.npy").exists()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, position_id: int):
+        i = int(np.searchsorted(self.ids, np.uint64(position_id)))
+        if i < len(self.ids) and int(self.ids[i]) == position_id:
+            return i
+        return None
+
+    def key(self, position_id: int):
+        """The encoded position of an ID, or None."""
+        row = self.row(position_id)
+        return self.keys[row].tobytes() if row is not None else None
+
+    def fen(self, position_id: int):
+        key = self.key(position_id)
+        return decode_fen(key) if key is not None else None
+
+    def board(self, position_id: int):
+        key = self.key(position_id)
+        return decode(key) if key is not None else None
+
+    def puzzle_fen(self, index: int):
+        """Exact FEN (move counters included) of the positions CSV row with this Index."""
+        refs = self.puzzle_refs[self.puzzle_refs["index"] == index]
+        if not len(refs):
+            return None
+        ref = refs[0]
+        position = decode_fen(self.keys[int(ref["row"])].tobytes())
+        return position.rsplit(" ", 2)[0] + f" {int(ref['halfmove'])} {int(ref['fullmove'])}"
+
+    def chapter_positions(self, chapter_id: str) -> list:
+        """(ply, position ID) of every position a chapter reaches, in replay order."""
+        row = self._chapter_rows.get(chapter_id)
+        if row is None:
+            return []
+        refs = self.chapter_refs[int(self.chapter_offsets[row]):int(self.chapter_offsets[row + 1])]
+        return [(int(ply), int(self.ids[i])) for ply, i in zip(refs["ply"], refs["row"])]
+
+    def index_references(self):
+        """Sort the chapter references by row for references(); an API loads it up front, not per request."""
+        if self._by_row is None:
+            by_row = np.argsort(self.chapter_refs["row"], kind="stable")
+            self._sorted_rows = self.chapter_refs["row"][by_row]
+            self._by_row = by_row
+
+    def references(self, row: int, limit: int = 10) -> dict:
+        """Puzzle indexes and chapters (with the earliest ply) that reach the position in a table row."""
+        self.index_references()
+        puzzles = self.puzzle_refs["index"][self.puzzle_refs["row"] == row][:limit]
+        lo, hi = np.searchsorted(self._sorted_rows, [row, row + 1])
+        refs = self._by_row[lo:hi]
+        chapter_rows = np.searchsorted(self.chapter_offsets, refs, side="right") - 1
+        plies = self.chapter_refs["ply"][refs]
+        # Earliest ply per chapter, chapters in table order
+        order = np.lexsort((plies, chapter_rows))
+        firsts = order[np.unique(chapter_rows[order], return_index=True)[1]][:limit]
+        chapters = []
+        for chapter_row, ply in zip(chapter_rows[firsts], plies[firsts]):
+            chapter = self.chapters[int(chapter_row)]
+            chapters.append({"chapter_id": chapter["id"], "study_id": chapter["study_id"],
+                             "name": chapter["name"], "ply": int(ply)})
+        return {"puzzles": [int(index) for index in puzzles], "chapters": chapters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the content-addressed position table")
+    parser.add_argument("--table", type=Path, default=DEFAULT_TABLE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--csv", type=Path, default=DEFAULT_POSITIONS_CSV)
+    build.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    build.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+    build.add_argument("--workers", type=int, default=os.cpu_count())
+    show = sub.add_parser("show")
+    show.add_argument("ref", help="position id (16 hex digits) or a positions CSV Index")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "build":
+        if args.archive:
+            from chessdata.archive import StudyArchive
+            sources = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+        else:
+            sources = sorted(args.dir.glob("*.pgn"))
+        if not sources and not args.csv.exists():
+            sys.exit(f"Nothing to build from: no {args.csv} and no studies in {args.archive or args.dir}")
+        stats = build_table(args.csv, sources, args.table, args.workers)
+        logger.info(f"{stats['references']} position references ({stats['puzzles']} puzzles, {stats['chapters']} "
+                    f"chapters) -> {stats['positions']} distinct positions in {stats['build_seconds']}s; "
+                    f"{stats['fen_bytes'] / 1024:.0f} KiB of FEN text stored as {stats['table_bytes'] / 1024:.0f} KiB")
+        return
+
+    table = PositionTable(args.table)
+    if len(args.ref) == 16:
+        print(table.fen(int(args.ref, 16)))
+    else:
+        print(table.puzzle_fen(int(args.ref)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Column store for the two-choice training positions (aimchess_fens.csv).
+
+The CSV (Index, FEN, Answer1, Answer2, CorrectAnswer) is read once and kept
+as parallel NumPy columns: fixed-width byte strings for FEN and answers,
+small integers for everything the API filters on. A batch request is a
+vectorized mask over the filter columns, one sample of the matching row
+numbers and a fancy-index gather per column.
+
+    side        0 = white to move, 1 = black to move
+    pieces      pieces on the board, kings included
+    difficulty  piece-count bucket, same thresholds as routes/defender.js
+    balance     material balance (P=1, N=B=3, R=5, Q=9) for the side to move
+
+With a features file from chessdata.features attached (attach_features()),
+batches can also be filtered on the difficulty score, game phase and
+whether the solution is forcing (a capture or a check).
+
+Rows are returned in the shape routes/defender.js builds (fen, answer1,
+answer2, correctAnswer, correctMove, difficulty, pieceCount, puzzleId), so
+the training pages can switch to the batch endpoint without changes.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.positions [--csv ../../aimchess_fens.csv] [--side w] [--difficulty expert] [-n 5]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_POSITIONS_CSV = Path(os.getenv("POSITIONS_CSV", BACKEND_DIR.parent.parent / "aimchess_fens.csv"))
+
+SIDES = ("w", "b")
+# (name, max pieces) as in routes/defender.js
+DIFFICULTIES = (("beginner", 6), ("intermediate", 12), ("advanced", 20), ("expert", 32))
+BALANCES = ("behind", "equal", "ahead")
+PHASES = ("middlegame", "endgame")
+PIECE_VALUES = {"p": 1, "n": 3, "b": 3, "r": 5, "q": 9, "k": 0}
+
+logger = logging.getLogger("chessdata.positions")
+
+
+def material(placement: str):
+    """(piece count, white material - black material) of a FEN piece placement field."""
+    pieces = balance = 0
+    for ch in placement:
+        value = PIECE_VALUES.get(ch.lower())
+        if value is None:
+            continue
+        pieces += 1
+        balance += value if ch.isupper() else -value
+    return pieces, balance
+
+
+def difficulty_bucket(pieces: int) -> int:
+    for i, (_, limit) in enumerate(DIFFICULTIES):
+        if pieces <= limit:
+            return i
+    return len(DIFFICULTIES) - 1
+
+
+class PositionStore:
+    def __init__(self, rows, version: str):
+        self.version = version
+        self.index = np.array([r[0] for r in rows], dtype=np.uint32)
+        self.fen = np.array([r[1] for r in rows], dtype=np.bytes_)
+        self.answer1 = np.array([r[2] for r in rows], dtype=np.bytes_)
+        self.answer2 = np.array([r[3] for r in rows], dtype=np.bytes_)
+        self.correct = np.array([r[4] for r in rows], dtype=np.uint8)     # 0 = Answer1, 1 = Answer2
+        self.side = np.array([r[5] for r in rows], dtype=np.uint8)
+        self.pieces = np.array([r[6] for r in rows], dtype=np.uint8)
+        self.difficulty = np.array([difficulty_bucket(p) for p in self.pieces], dtype=np.uint8)
+        balance = np.array([r[7] for r in rows], dtype=np.int16)
+        # From the side to move's point of view: black to move flips the sign
+        self.balance = np.where(self.side == 1, -balance, balance).astype(np.int16)
+        self.score = self.phase = self.forcing = None
+        self.features_version = None
+
+    def attach_features(self, features: dict) -> bool:
+        """Use feature columns from chessdata.features; False if they were built from another CSV version."""
+        if str(features.get("meta_version")) != self.version or len(features["difficulty"]) != len(self):
+            return False
+        self.score = features["difficulty"]
+        self.phase = features["phase"]
+        self.forcing = (features["correct_capture"] | features["correct_check"]).astype(bool)
+        # Hash of the attached columns: a rebuilt features file changes every batch's ETag
+        digest = hashlib.sha256()
+        for column in (self.score, self.phase, self.forcing):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        self.features_version = digest.hexdigest()[:16]
+        return True
+
+    @property
+    def has_features(self) -> bool:
+        return self.score is not None
+
+    @classmethod
+    def load(cls, path) -> "PositionStore":
+        path = Path(path)
+        raw = path.read_bytes()
+        rows = []
+        skipped = 0
+        for record in csv.DictReader(raw.decode("utf-8-sig").splitlines()):
+            fen = (record.get("FEN") or "").strip()
+            answer1 = (record.get("Answer1") or "").strip()
+            answer2 = (record.get("Answer2") or "").strip()
+            correct = (record.get("CorrectAnswer") or "").strip()
+            fields = fen.split()
+            if len(fields) < 2 or fields[1] not in SIDES or not answer1 or not answer2 \
+                    or correct not in ("Answer1", "Answer2"):
+                skipped += 1
+                continue
+            try:
+                index = int(record.get("Index") or len(rows) + 1)
+            except ValueError:
+                index = len(rows) + 1
+            pieces, balance = material(fields[0])
+            rows.append((index, fen, answer1, answer2, correct == "Answer2", SIDES.index(fields[1]), pieces, balance))
+        if skipped:
+            logger.warning(f"{path.name}: skipped {skipped} incomplete rows")
+        # Content hash: the ETag of every batch changes when the dataset does
+        return cls(rows, hashlib.sha256(raw).hexdigest()[:16])
+
+    def __len__(self):
+        return len(self.index)
+
+    def mask(self, side: str = None, difficulty: str = None, balance: str = None,
+             min_score: int = None, max_score: int = None, phase: str = None, forcing: bool = None):
+        mask = np.ones(len(self), dtype=bool)
+        if side is not None:
+            mask &= self.side == SIDES.index(side)
+        if difficulty is not None:
+            mask &= self.difficulty == [name for name, _ in DIFFICULTIES].index(difficulty)
+        if balance == "behind":
+            mask &= self.balance < 0
+        elif balance == "equal":
+            mask &= self.balance == 0
+        elif balance == "ahead":
+            mask &= self.balance > 0
+        if min_score is not None or max_score is not None or phase is not None or forcing is not None:
+            if not self.has_features:
+                raise ValueError("position features are not loaded")
+            if min_score is not None:
+                mask &= self.score >= min_score
+            if max_score is not None:
+                mask &= self.score <= max_score
+            if phase is not None:
+                mask &= self.phase == PHASES.index(phase)
+            if forcing is not None:
+                mask &= self.forcing == forcing
+        return mask
+
+    def sample(self, n: int, seed: int, **filters):
+        """(row numbers of up to n distinct matching positions, number of matches) for a given seed."""
+        candidates = np.flatnonzero(self.mask(**filters))
+        rng = np.random.default_rng(seed)
+        if len(candidates) > n:
+            return rng.choice(candidates, size=n, replace=False), len(candidates)
+        return rng.permutation(candidates), len(candidates)
+
+    def rows(self, selected) -> list:
+        fens = self.fen[selected]
+        answers1 = self.answer1[selected]
+        answers2 = self.answer2[selected]
+        correct = self.correct[selected]
+        difficulty = self.difficulty[selected]
+        pieces = self.pieces[selected]
+        index = self.index[selected]
+        result = []
+        for i in range(len(selected)):
+            answer1 = answers1[i].decode()
+            answer2 = answers2[i].decode()
+            result.append({
+                "fen": fens[i].decode(),
+                "answer1": answer1,
+                "answer2": answer2,
+                "correctAnswer": "Answer2" if correct[i] else "Answer1",
+                "correctMove": answer2 if correct[i] else answer1,
+                "difficulty": DIFFICULTIES[difficulty[i]][0],
+                "pieceCount": int(pieces[i]),
+                "puzzleId": str(index[i]),
+            })
+        if self.has_features:
+            for row, score in zip(result, self.score[selected]):
+                row["score"] = int(score)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample positions from the training positions dataset")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_POSITIONS_CSV)
+    parser.add_argument("-n", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--side", choices=SIDES)
+    parser.add_argument("--difficulty", choices=[name for name, _ in DIFFICULTIES])
+    parser.add_argument("--balance", choices=BALANCES)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    store = PositionStore.load(args.csv)
+    selected, total = store.sample(args.n, args.seed, side=args.side, difficulty=args.difficulty, balance=args.balance)
+    print(json.dumps(store.rows(selected), indent=1))
+    logger.info(f"{len(selected)} of {total} matching positions ({len(store)} loaded, version {store.version})")
+
+
+if __name__ == "__main__":
+    main()
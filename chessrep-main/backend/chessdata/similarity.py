@@ -0,0 +1,312 @@
+"""
+Similar-position search over the position table (puzzles and study chapters).
+
+Every position in chessdata.position_table gets a 192-bit signature, three
+uint64 words:
+
+    0  white pawns on ranks 2-7 (bitboard)
+    1  black pawns on ranks 2-7
+    2  material, thermometer-coded per color and piece type (up to 8 pawns,
+       2 knights / bishops / rooks, 1 queen: 30 bits), so that the Hamming
+       distance of two words is the L1 distance of their piece counts
+
+Retrieval is bit-sampling locality-sensitive hashing: each of TABLES hash
+tables keys a position on BITS signature bits drawn at random (weighted
+towards bits that actually vary in the corpus), and positions that agree
+with the query on all of them in any table are candidates. Each table is a
+sorted uint32 key column plus the matching rows, so a probe is two binary
+searches. When the exact buckets hold fewer than k positions, the buckets
+one bit away are probed as well. At most BUCKET_SCAN rows are taken from a
+bucket; table rows are ordered by Zobrist key, so that is a uniform sample
+of an oversized bucket and bounds the re-ranking work per query.
+
+Candidates are re-ranked with NumPy on whole columns:
+
+    distance = pawn Hamming distance + sum over piece types of
+               |count difference| * piece value (1, 3, 3, 5, 9)
+
+and positions at equal distance by the Hamming distance of their occupancy
+bitboards (pieces on the same squares).
+
+The index rows are the position table's rows, so results carry the table's
+puzzle and chapter references; the index records a digest of the table's
+IDs and refuses to load against a different table.
+
+Files in backend/data/similarity (SIMILARITY_INDEX_DIR): signatures.npy,
+material.npy, occupancy.npy, bits.npy, bucket_keys.npy, bucket_rows.npy, meta.json.
+
+Usage (from chessrep-main/backend, after python -m chessdata.position_table build):
+    python -m chessdata.similarity build [--tables 16] [--bits 18]
+    python -m chessdata.similarity query "<fen>" [-k 10]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chessdata.bitboard import Board
+from chessdata.features import PIECE_WEIGHTS, popcount
+from chessdata.position_codec import encode_key, key_bitboards
+from chessdata.position_table import DEFAULT_TABLE_DIR, PositionTable
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SIMILARITY_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", BACKEND_DIR / "data" / "similarity"))
+
+TABLES = 16
+BITS = 18
+SEED = 0
+BUCKET_SCAN = 1024
+BUILD_CHUNK = 1 << 16
+SIGNATURE_BITS = 192
+
+PAWN_MASK = np.uint64(0x00FFFFFFFFFFFF00)
+# Material columns: white P N B R Q, black P N B R Q (planes as in chessdata.features)
+MATERIAL_PLANES = [0, 1, 2, 3, 4, 6, 7, 8, 9, 10]
+MATERIAL_CAPS = np.array([8, 2, 2, 2, 1] * 2, dtype=np.uint64)
+MATERIAL_OFFSETS = np.concatenate([[0], np.cumsum(MATERIAL_CAPS)[:-1]]).astype(np.uint64)
+MATERIAL_WEIGHTS = np.tile(PIECE_WEIGHTS[:5], 2)
+
+logger = logging.getLogger("chessdata.similarity")
+
+
+def signatures(boards: np.ndarray):
+    """(N, 3) uint64 signatures, (N, 10) uint8 piece counts and (N,) occupancy of (N, 12) bitboards."""
+    material = popcount(boards[:, MATERIAL_PLANES]).astype(np.uint8)
+    counts = np.minimum(material, MATERIAL_CAPS).astype(np.uint64)
+    thermometer = ((np.uint64(1) << counts) - np.uint64(1)) << MATERIAL_OFFSETS
+    signature = np.empty((len(boards), 3), dtype=np.uint64)
+    signature[:, 0] = boards[:, 0] & PAWN_MASK
+    signature[:, 1] = boards[:, 6] & PAWN_MASK
+    signature[:, 2] = np.bitwise_or.reduce(thermometer, axis=1)
+    return signature, material, np.bitwise_or.reduce(boards, axis=1)
+
+
+def signature_bits(signature: np.ndarray) -> np.ndarray:
+    """(N, 192) 0/1 view of signatures; bit b is bit b % 64 of word b // 64."""
+    signature = np.ascontiguousarray(signature, dtype="<u8")
+    return np.unpackbits(signature.view(np.uint8), axis=1, bitorder="little")
+
+
+def bucket_keys(signature: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """(tables, N) uint32 bucket keys: bit j of table t's key is signature bit bits[t, j]."""
+    keys = np.zeros((len(bits), len(signature)), dtype=np.uint32)
+    for t, sampled in enumerate(bits):
+        for j, b in enumerate(sampled):
+            bit = (signature[:, b >> 6] >> np.uint64(b & 63)) & np.uint64(1)
+            keys[t] |= bit.astype(np.uint32) << np.uint32(j)
+    return keys
+
+
+def sample_bits(signature: np.ndarray, tables: int, bits: int, seed: int) -> np.ndarray:
+    """Per table, `bits` distinct signature bits, drawn with weight p(1 - p) (p = how often the bit is set)."""
+    set_count = np.zeros(SIGNATURE_BITS, dtype=np.int64)
+    for start in range(0, len(signature), BUILD_CHUNK):
+        set_count += signature_bits(signature[start:start + BUILD_CHUNK]).sum(axis=0, dtype=np.int64)
+    p = set_count / max(len(signature), 1)
+    weights = p * (1 - p)
+    varying = int(np.count_nonzero(weights))
+    if not varying:
+        raise ValueError("no signature bit varies across the indexed positions")
+    bits = min(bits, varying)
+    rng = np.random.default_rng(seed)
+    return np.array([rng.choice(SIGNATURE_BITS, size=bits, replace=False, p=weights / weights.sum())
+                     for _ in range(tables)], dtype=np.int16)
+
+
+def table_digest(ids: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(ids).tobytes()).hexdigest()[:16]
+
+
+class SimilarityIndex:
+    def __init__(self, signature, material, occupancy, bits, keys, rows, meta=None):
+        self.signature = signature
+        self.material = material
+        self.occupancy = occupancy
+        self.bits = bits
+        self.keys = keys
+        self.rows = rows
+        self.meta = meta or {}
+        self.table = None
+        self._weights = MATERIAL_WEIGHTS.astype(np.int16)
+
+    @classmethod
+    def build(cls, signature, material, occupancy, tables=TABLES, bits=BITS, seed=SEED):
+        sampled = sample_bits(signature, tables, bits, seed)
+        keys = bucket_keys(signature, sampled)
+        order = np.argsort(keys, axis=1, kind="stable").astype(np.uint32)
+        keys = np.take_along_axis(keys, order, axis=1)
+        meta = {"version": 1, "positions": len(signature), "tables": tables, "bits": int(sampled.shape[1]),
+                "seed": seed}
+        return cls(signature, material, occupancy, sampled, keys, order, meta)
+
+    @classmethod
+    def load(cls, directory, table: PositionTable = None):
+        directory = Path(directory)
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(*(np.load(directory / f"{name}.npy", mmap_mode="r")
+                      for name in ("signatures", "material", "occupancy", "bits", "bucket_keys", "bucket_rows")), meta=meta)
+        if table is not None:
+            if meta.get("table_digest") != table_digest(table.ids):
+                raise ValueError(f"{directory} was built from another position table")
+            table.index_references()
+            index.table = table
+        return index
+
+    def save(self, directory, table: PositionTable = None):
+        directory = Path(directory)
+        tmp = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "signatures.npy", self.signature)
+        np.save(tmp / "material.npy", self.material)
+        np.save(tmp / "occupancy.npy", self.occupancy)
+        np.save(tmp / "bits.npy", self.bits)
+        np.save(tmp / "bucket_keys.npy", self.keys)
+        np.save(tmp / "bucket_rows.npy", self.rows)
+        meta = dict(self.meta)
+        if table is not None:
+            meta["table_digest"] = table_digest(table.ids)
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+
+    @staticmethod
+    def exists(directory) -> bool:
+        return (Path(directory) / "meta.json").exists()
+
+    def __len__(self):
+        return len(self.signature)
+
+    def _probe(self, keys: np.ndarray) -> list:
+        """Rows in the buckets keys[t] (one array of keys per table)."""
+        found = []
+        for t, wanted in enumerate(keys):
+            column = self.keys[t]
+            lo = np.searchsorted(column, wanted, side="left")
+            hi = np.searchsorted(column, wanted, side="right")
+            found.extend(self.rows[t][a:min(b, a + BUCKET_SCAN)]
+                         for a, b in zip(np.atleast_1d(lo), np.atleast_1d(hi)) if b > a)
+        return found
+
+    def nearest(self, signature, material, occupancy, k=10, exclude=None, max_distance=None) -> dict:
+        """Top-k rows by distance to one position's (3,) signature, (10,) piece counts and occupancy."""
+        flags = signature_bits(signature.reshape(1, 3))[0]
+        weights = np.uint32(1) << np.arange(self.bits.shape[1], dtype=np.uint32)
+        keys = (flags[self.bits].astype(np.uint32) * weights).sum(axis=1, dtype=np.uint32)
+        found = self._probe(keys[:, None])
+        candidates = np.unique(np.concatenate(found)) if found else np.empty(0, np.uint32)
+        if len(candidates) - (exclude is not None) < k:
+            # Multi-probe: the buckets one bit away from the query's in every table
+            found.extend(self._probe(keys[:, None] ^ weights[None, :]))
+            candidates = np.unique(np.concatenate(found)) if found else candidates
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+
+        pawn = (popcount(self.signature[candidates, 0] ^ signature[0])
+                + popcount(self.signature[candidates, 1] ^ signature[1]))
+        diff = np.abs(self.material[candidates].astype(np.int16) - material.astype(np.int16))
+        piece = (diff * self._weights).sum(axis=1, dtype=np.int16)
+        distance = pawn + piece
+        if max_distance is not None:
+            keep = distance <= max_distance
+            candidates, distance, pawn, piece = candidates[keep], distance[keep], pawn[keep], piece[keep]
+        # Distance first, then occupancy Hamming distance (0-64)
+        rank = distance.astype(np.int32) * 128 + popcount(self.occupancy[candidates] ^ occupancy)
+        if len(candidates) > k:
+            top = np.argpartition(rank, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], rank[top]))]
+        return {"rows": candidates[top], "distance": distance[top], "pawn_distance": pawn[top],
+                "material_distance": piece[top], "candidates": len(candidates)}
+
+    def search(self, fen: str, k: int = 10, max_distance: int = None, references: int = 5) -> dict:
+        """Positions of the table most similar to a FEN (not counting the position itself)."""
+        board = Board(fen)
+        key = encode_key(board)
+        signature, material, occupancy = signatures(key_bitboards(np.frombuffer(key, dtype=np.uint8)))
+        result = self.nearest(signature[0], material[0], occupancy[0], k, self.table.row(board.zobrist()),
+                              max_distance)
+        positions = []
+        for row, distance, pawn, piece in zip(result["rows"], result["distance"], result["pawn_distance"],
+                                              result["material_distance"]):
+            row = int(row)
+            position_id = int(self.table.ids[row])
+            positions.append({
+                "id": f"{position_id:016x}",
+                "fen": self.table.fen(position_id),
+                "distance": int(distance),
+                "pawn_distance": int(pawn),
+                "material_distance": int(piece),
+                **self.table.references(row, references),
+            })
+        return {"fen": board.fen(), "candidates": result["candidates"], "positions": positions}
+
+
+def largest_bucket(sorted_keys: np.ndarray) -> int:
+    starts = np.flatnonzero(np.diff(sorted_keys)) + 1
+    return int(np.diff(np.concatenate([[0], starts, [len(sorted_keys)]])).max()) if len(sorted_keys) else 0
+
+
+def build_similarity(table: PositionTable, out_dir, tables=TABLES, bits=BITS, seed=SEED) -> dict:
+    started = time.perf_counter()
+    signature = np.empty((len(table), 3), dtype=np.uint64)
+    material = np.empty((len(table), len(MATERIAL_PLANES)), dtype=np.uint8)
+    occupancy = np.empty(len(table), dtype=np.uint64)
+    for start in range(0, len(table), BUILD_CHUNK):
+        chunk = slice(start, start + BUILD_CHUNK)
+        signature[chunk], material[chunk], occupancy[chunk] = signatures(key_bitboards(table.keys[chunk]))
+    index = SimilarityIndex.build(signature, material, occupancy, tables, bits, seed)
+    index.meta["build_seconds"] = round(time.perf_counter() - started, 2)
+    index.meta["largest_bucket"] = max((largest_bucket(column) for column in index.keys), default=0)
+    index.save(out_dir, table)
+    return index.meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the similar-position index")
+    parser.add_argument("--table", type=Path, default=DEFAULT_TABLE_DIR)
+    parser.add_argument("--index", type=Path, default=DEFAULT_SIMILARITY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--tables", type=int, default=TABLES)
+    build.add_argument("--bits", type=int, default=BITS, help="signature bits per hash table (at most 32)")
+    build.add_argument("--seed", type=int, default=SEED)
+    query = sub.add_parser("query")
+    query.add_argument("fen")
+    query.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if not PositionTable.exists(args.table):
+        sys.exit(f"No position table at {args.table}; run python -m chessdata.position_table build first")
+    table = PositionTable(args.table)
+    if args.command == "build":
+        if not 1 <= args.bits <= 32:
+            parser.error("--bits must be between 1 and 32")
+        meta = build_similarity(table, args.index, args.tables, args.bits, args.seed)
+        logger.info(f"Indexed {meta['positions']} positions in {meta['tables']} tables x {meta['bits']} bits "
+                    f"(largest bucket {meta['largest_bucket']}) in {meta['build_seconds']}s -> {args.index}")
+        return
+
+    index = SimilarityIndex.load(args.index, table)
+    started = time.perf_counter()
+    result = index.search(args.fen, args.k)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(result, indent=1))
+    logger.info(f"{len(result['positions'])} positions from {result['candidates']} candidates in "
+                f"{elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Batch validation of the position data with chessdata.bitboard.
+
+positions: every row of aimchess_fens.csv is checked for
+    - a FEN that parses and describes a reachable position (Board.problems())
+      with at least one legal move
+    - Answer1 and Answer2 being distinct legal moves in that position
+and normalized: the FEN is rewritten by the engine (castling rights the
+placement contradicts are dropped, move counters filled in) and each answer
+becomes its canonical SAN (minimal disambiguation, "=Q" promotions, +/#).
+--output writes the normalized rows (valid ones only) as a new CSV.
+
+studies: every standard chapter of lichess_studies (mainline and all
+variations) is replayed through the process pool; starting FENs and moves
+that fail are reported per chapter.
+
+Usage (from chessrep-main/backend):
+    python -m chessdata.validate positions [--csv ../../aimchess_fens.csv] [--output fixed.csv]
+    python -m chessdata.validate studies [--dir ../../lichess_studies | --archive ...] [--workers 8]
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from chessdata.bitboard import Board, IllegalMoveError
+from chessdata.importer import DEFAULT_STUDIES_DIR, ArchivedStudy, _open_archive, study_id_from_filename
+from chessdata.pgn import iter_chapters
+from chessdata.position_index import is_standard, iter_positions
+from chessdata.positions import DEFAULT_POSITIONS_CSV
+
+CSV_FIELDS = ["Index", "FEN", "Answer1", "Answer2", "CorrectAnswer"]
+
+logger = logging.getLogger("chessdata.validate")
+
+
+def check_position_row(row: dict) -> dict:
+    """{"errors": [...], "normalized": row with canonical FEN/SAN, "changes": [...]} for one CSV row."""
+    errors, changes = [], []
+    fen = (row.get("FEN") or "").strip()
+    normalized = {field: (row.get(field) or "").strip() for field in CSV_FIELDS}
+    try:
+        board = Board(fen)
+    except ValueError as e:
+        return {"errors": [f"FEN: {e}"], "changes": [], "normalized": None}
+    errors.extend(f"FEN: {problem}" for problem in board.problems())
+    if not errors and not board.has_legal_moves():
+        errors.append("FEN: no legal moves (game over)")
+    normalized["FEN"] = board.fen()
+    if normalized["FEN"] != fen:
+        changes.append("FEN")
+
+    moves = []
+    for field in ("Answer1", "Answer2"):
+        san = normalized[field]
+        try:
+            move = board.parse_san(san)
+        except IllegalMoveError as e:
+            errors.append(f"{field}: {e}")
+            continue
+        moves.append(move)
+        canonical = board.san(move)
+        if canonical != san:
+            normalized[field] = canonical
+            changes.append(field)
+    if len(moves) == 2 and moves[0] == moves[1]:
+        errors.append("Answer1 and Answer2 are the same move")
+    if normalized["CorrectAnswer"] not in ("Answer1", "Answer2"):
+        errors.append(f"CorrectAnswer: {normalized['CorrectAnswer']!r}")
+    return {"errors": errors, "changes": changes, "normalized": None if errors else normalized}
+
+
+def validate_positions(path) -> dict:
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    invalid, normalized, changed = [], [], 0
+    for number, row in enumerate(rows, start=1):
+        result = check_position_row(row)
+        if result["errors"]:
+            invalid.append({"index": row.get("Index") or str(number), "errors": result["errors"]})
+            continue
+        normalized.append(result["normalized"])
+        changed += bool(result["changes"])
+    return {
+        "rows": len(rows),
+        "valid": len(normalized),
+        "normalized": changed,
+        "invalid": invalid,
+        "seconds": round(time.perf_counter() - started, 2),
+        "output": normalized,
+    }
+
+
+def check_study(source) -> dict:
+    """Process-pool task: replay every standard chapter of one study file or ArchivedStudy."""
+    study_id = study_id_from_filename(source)
+    if isinstance(source, ArchivedStudy):
+        stream = _open_archive(source.archive).open(source.study_id)
+    else:
+        stream = Path(source)
+    chapters = positions = skipped = 0
+    problems = []
+    for index, chapter in enumerate(iter_chapters(stream)):
+        if not is_standard(chapter):
+            skipped += 1
+            continue
+        chapters += 1
+        chapter_id = f"{chapter.study_id or study_id}:{chapter.chapter_id or index}"
+        errors = []
+        try:
+            for board, ply, *_ in iter_positions(chapter, errors):
+                if ply == 0:
+                    errors.extend(f"FEN: {problem}" for problem in board.problems())
+                positions += 1
+        except ValueError as e:
+            errors.append(f"FEN: {e}")
+        problems.extend({"chapter": chapter_id, "error": error} for error in errors)
+    return {"chapters": chapters, "positions": positions, "skipped": skipped, "problems": problems}
+
+
+def validate_studies(sources, workers=None) -> dict:
+    started = time.perf_counter()
+    totals = {"studies": len(sources), "chapters": 0, "positions": 0, "skipped_chapters": 0, "problems": []}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(check_study, sources, chunksize=4):
+            totals["chapters"] += result["chapters"]
+            totals["positions"] += result["positions"]
+            totals["skipped_chapters"] += result["skipped"]
+            totals["problems"].extend(result["problems"])
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the training positions and the study corpus")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+    positions = sub.add_parser("positions")
+    positions.add_argument("--csv", type=Path, default=DEFAULT_POSITIONS_CSV)
+    positions.add_argument("--output", type=Path, help="write the valid rows, normalized, to this CSV")
+    studies = sub.add_parser("studies")
+    studies.add_argument("--dir", type=Path, default=DEFAULT_STUDIES_DIR)
+    studies.add_argument("--archive", type=Path, help="read studies from this single-archive store instead of --dir")
+    studies.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "positions":
+        report = validate_positions(args.csv)
+        rows = report.pop("output")
+        if args.output:
+            tmp = args.output.with_name(args.output.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(tmp, args.output)
+            logger.info(f"Wrote {len(rows)} normalized rows to {args.output}")
+        if args.json:
+            print(json.dumps(report, indent=1))
+        else:
+            for row in report["invalid"]:
+                logger.warning(f"row {row['index']}: {'; '.join(row['errors'])}")
+        logger.info(f"{report['valid']}/{report['rows']} rows valid, {report['normalized']} normalized, "
+                    f"{len(report['invalid'])} invalid in {report['seconds']}s")
+        sys.exit(1 if report["invalid"] else 0)
+
+    if args.archive:
+        from chessdata.archive import StudyArchive
+        sources = [ArchivedStudy(str(args.archive), study_id) for study_id in StudyArchive(args.archive).ids()]
+    else:
+        sources = sorted(args.dir.glob("*.pgn"))
+    if not sources:
+        sys.exit(f"No studies in {args.archive or args.dir}")
+    report = validate_studies(sources, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        for problem in report["problems"]:
+            logger.warning(f"{problem['chapter']}: {problem['error']}")
+    logger.info(f"Replayed {report['chapters']} chapters / {report['positions']} positions from "
+                f"{report['studies']} studies in {report['seconds']}s; {report['skipped_chapters']} non-standard "
+                f"chapters skipped, {len(report['problems'])} problems")
+    sys.exit(1 if report["problems"] else 0)
+
+
+if __name__ == "__main__":
+    main()
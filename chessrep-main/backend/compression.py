@@ -0,0 +1,240 @@
+"""
+Response compression.
+
+CompressionMiddleware negotiates br / zstd / gzip from Accept-Encoding (br and
+zstd only when the brotli / zstandard packages are installed), leaves bodies
+under `minimum_size` alone and compresses everything else chunk by chunk, so
+streamed responses such as the NDJSON status stream are never buffered.
+
+PrecompressedFiles serves large static payloads (study PGNs, position
+datasets). Each encoding of a file is produced once, written to a cache
+directory, and reused until the source file changes.
+"""
+
+import asyncio
+import gzip
+import os
+import zlib
+from pathlib import Path
+
+from starlette.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoder
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoder
+    zstandard = None
+
+# Server preference when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = [e for e, available in (("br", brotli), ("zstd", zstandard), ("gzip", True)) if available]
+
+_COMPRESSIBLE_TYPES = (b"text/", b"application/json", b"application/x-ndjson", b"application/javascript",
+                       b"application/xml", b"application/x-chess-pgn", b"text/csv")
+
+
+def negotiate_encoding(accept_encoding: str, supported=None):
+    """Pick the best encoding from an Accept-Encoding header, or None for identity."""
+    supported = SUPPORTED_ENCODINGS if supported is None else supported
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _StreamCompressor:
+    """Uniform compress()/flush()/finish() over gzip, brotli and zstd."""
+
+    def __init__(self, encoding, level=None):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._c = zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._c = brotli.Compressor(quality=level if level is not None else 4)
+        elif encoding == "zstd":
+            self._c = zstandard.ZstdCompressor(level=level if level is not None else 3).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        # Emit what we have so far so streamed responses reach the client promptly
+        if self.encoding == "gzip":
+            return self._c.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._c.flush()
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+
+def compress_bytes(data: bytes, encoding: str, level=None) -> bytes:
+    compressor = _StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses at or above `minimum_size` bytes."""
+
+    def __init__(self, app, minimum_size=1024, level=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "buffer": b"", "compressor": None, "passthrough": False}
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                headers = dict((k.lower(), v) for k, v in message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if (
+                    b"content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(_COMPRESSIBLE_TYPES)
+                ):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    # Hold the start message until we know whether the body is big enough
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state["start"] is not None:
+                # Small leading chunks are held back until we know the body crosses the threshold
+                state["buffer"] += body
+                if more_body and len(state["buffer"]) < self.minimum_size:
+                    return
+                body, state["buffer"] = state["buffer"], b""
+                start, state["start"] = state["start"], None
+                if not more_body and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                state["compressor"] = _StreamCompressor(encoding, self.level)
+                vary = b"Accept-Encoding"
+                headers = []
+                for k, v in start.get("headers", []):
+                    if k.lower() == b"vary":
+                        vary = v + b", Accept-Encoding"
+                    elif k.lower() != b"content-length":
+                        headers.append((k, v))
+                headers += [(b"content-encoding", encoding.encode()), (b"vary", vary)]
+                if not more_body:
+                    data = compress_bytes(body, encoding, self.level)
+                    headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start, "headers": headers})
+
+            compressor = state["compressor"]
+            if more_body:
+                data = compressor.compress(body) + compressor.flush()
+            else:
+                data = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+class PrecompressedFiles:
+    """Serves static files with encodings prepared once and cached on disk."""
+
+    def __init__(self, cache_dir, encodings=None, level=None):
+        self.cache_dir = Path(cache_dir)
+        self.encodings = encodings or SUPPORTED_ENCODINGS
+        # Highest levels are fine here: the cost is paid once per file version
+        self.level = level
+        self._locks = {}
+
+    def _variant_path(self, source: Path, encoding: str) -> Path:
+        ext = {"gzip": "gz", "br": "br", "zstd": "zst"}[encoding]
+        return self.cache_dir / f"{source.parent.name}__{source.name}.{ext}"
+
+    def _build(self, source: Path, target: Path, encoding: str):
+        level = self.level
+        if level is None:
+            level = {"gzip": 9, "br": 11, "zstd": 19}[encoding]
+        data = source.read_bytes()
+        if encoding == "gzip":
+            # mtime=0 keeps the output byte-identical across rebuilds
+            payload = gzip.compress(data, compresslevel=level, mtime=0)
+        else:
+            payload = compress_bytes(data, encoding, level)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, target)
+
+    async def variant(self, source: Path, encoding: str) -> Path:
+        target = self._variant_path(source, encoding)
+        source_mtime = source.stat().st_mtime
+        if target.exists() and target.stat().st_mtime >= source_mtime:
+            return target
+        lock = self._locks.setdefault(target, asyncio.Lock())
+        async with lock:
+            if not (target.exists() and target.stat().st_mtime >= source_mtime):
+                await asyncio.to_thread(self._build, source, target, encoding)
+        return target
+
+    async def prepare(self, sources):
+        """Build every encoding for `sources` up front (e.g. from a startup task)."""
+        for source in sources:
+            for encoding in self.encodings:
+                await self.variant(Path(source), encoding)
+
+    async def response(self, source, accept_encoding: str, media_type: str, filename: str = None):
+        source = Path(source)
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding is None:
+            return FileResponse(source, media_type=media_type, filename=filename, headers=headers)
+        path = await self.variant(source, encoding)
+        headers["Content-Encoding"] = encoding
+        return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
@@ -0,0 +1,42 @@
+"""
+Fast JSON encoding for responses built straight from MongoDB documents.
+
+Documents we just read from our own collections are already in the shape the
+API returns, so there is no need to build pydantic models and let FastAPI
+validate and encode them a second time. dumps() serializes them to bytes in
+one step with orjson, falling back to the standard json module when orjson
+is not installed.
+"""
+
+import json
+from datetime import date, datetime
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(Response):
+    """JSONResponse that encodes with dumps() and skips response_model validation."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,223 @@
+"""
+Runtime diagnostics for the /api/health endpoint.
+
+- MongoPoolStats: pymongo connection pool listener counting checkouts, waits
+  and connections, so we can tell when the Motor pool is saturated.
+- EventLoopLagMonitor: background task measuring how late the event loop
+  wakes up from a short sleep.
+- InFlightCounter: number of HTTP requests currently being served, kept by
+  InFlightMiddleware (a request counts until its last body chunk is sent).
+- mongo_client_options(): pool size and timeouts for AsyncIOMotorClient,
+  read from the environment.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+
+def mongo_client_options() -> dict:
+    """Keyword arguments for AsyncIOMotorClient built from MONGO_* env vars."""
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    }
+
+
+async def warm_up_pool(db, connections: int, timeout: float = 5.0):
+    """Open `connections` pool connections up front by running concurrent pings.
+
+    Returns the number of pings that succeeded; failures are not fatal since
+    the pool will connect lazily anyway.
+    """
+    if connections <= 0:
+        return 0
+    results = await asyncio.wait_for(
+        asyncio.gather(*[db.command("ping") for _ in range(connections)], return_exceptions=True),
+        timeout,
+    )
+    return sum(1 for r in results if not isinstance(r, Exception))
+
+
+class MongoPoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters. Callbacks run on Motor's worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checkouts_started = 0
+        self.checkouts_succeeded = 0
+        self.checkouts_failed = 0
+        self.checkins = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.pool_clears = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            finished = self.checkouts_succeeded + self.checkouts_failed
+            return {
+                "connections_open": self.connections_created - self.connections_closed,
+                "checked_out": self.checkouts_succeeded - self.checkins,
+                "waiting": max(self.checkouts_started - finished, 0),
+                "checkouts": self.checkouts_succeeded,
+                "checkout_failures": self.checkouts_failed,
+                "avg_wait_ms": round(self.wait_time_total / self.checkouts_succeeded * 1000, 3) if self.checkouts_succeeded else 0.0,
+                "max_wait_ms": round(self.wait_time_max * 1000, 3),
+                "pool_clears": self.pool_clears,
+            }
+
+    # Checkout start and end happen on the same worker thread, so a
+    # thread-local start time pairs them without needing a request id.
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.checkouts_started += 1
+
+    def connection_checked_out(self, event):
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.checkouts_succeeded += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkouts_failed += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+class EventLoopLagMonitor:
+    """Samples event loop lag: how much later than requested a sleep wakes up."""
+
+    def __init__(self, interval: float = 0.5, window: int = 120):
+        self.interval = interval
+        self.window = window
+        self._samples = []
+        self._task: asyncio.Task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self._samples.append(lag)
+            if len(self._samples) > self.window:
+                del self._samples[0]
+
+    def snapshot(self) -> dict:
+        samples = self._samples
+        if not samples:
+            return {"last_ms": 0.0, "avg_ms": 0.0, "max_ms": 0.0}
+        return {
+            "last_ms": round(samples[-1] * 1000, 3),
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "max_ms": round(max(samples) * 1000, 3),
+        }
+
+
+class InFlightCounter:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.total = 0
+
+    def enter(self):
+        self.current += 1
+        self.total += 1
+        self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        self.current -= 1
+
+    def snapshot(self) -> dict:
+        return {"current": self.current, "peak": self.peak, "total": self.total}
+
+
+class InFlightMiddleware:
+    """Pure ASGI middleware counting a request from arrival until its final body chunk is sent.
+
+    Installed outside admission control and the response cache, so shed
+    requests and cache hits are counted too, and a streamed response counts
+    until its last chunk has gone out.
+    """
+
+    def __init__(self, app, counter: InFlightCounter):
+        self.app = app
+        self.counter = counter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                self.counter.exit()
+
+        async def tracking_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        self.counter.enter()
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            # No final body (error, client gone): still stop counting
+            finish()
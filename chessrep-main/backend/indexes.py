@@ -0,0 +1,111 @@
+"""
+MongoDB index management.
+
+INDEXES declares the indexes every collection needs. ensure_indexes() creates
+them at startup (the lifespan runs it as a background task so a slow build
+never delays serving) and keeps the TTL retention window in sync with
+STATUS_RETENTION_DAYS.
+
+Retention is off by default and status checks are kept forever. Set
+STATUS_RETENTION_DAYS=N to let MongoDB delete status checks older than N
+days (a TTL index on timestamp; changing N later updates it in place).
+Setting it back to 0 drops the TTL index again.
+
+With QUERY_EXPLAIN_DEBUG=true, check_query_plan() explains each route's query
+shape once and logs a warning when MongoDB would answer it with a COLLSCAN.
+"""
+
+import logging
+import os
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Days to keep status checks; 0 (the default) keeps them forever
+STATUS_RETENTION_DAYS = float(os.getenv("STATUS_RETENTION_DAYS", "0"))
+QUERY_EXPLAIN_DEBUG = os.getenv("QUERY_EXPLAIN_DEBUG", "false").lower() in ("1", "true", "yes")
+
+TTL_INDEX_NAME = "timestamp_ttl"
+
+INDEXES = {
+    "status_checks": [
+        # Keyset pagination: sort on (timestamp, id) and range-scan after a cursor
+        IndexModel([("timestamp", ASCENDING), ("id", ASCENDING)], name="timestamp_id"),
+    ],
+}
+
+# collection -> (field, seconds); TTL indexes must be single-field
+TTL_INDEXES = {
+    "status_checks": ("timestamp", int(STATUS_RETENTION_DAYS * 86400)),
+}
+
+_INDEX_OPTIONS_CONFLICT = 85
+
+
+async def ensure_indexes(db):
+    for collection_name, models in INDEXES.items():
+        try:
+            created = await db[collection_name].create_indexes(models)
+            logger.info(f"Indexes ready on {collection_name}: {', '.join(created)}")
+        except Exception as e:
+            logger.error(f"Failed to create indexes on {collection_name}: {e}")
+
+    for collection_name, (field, seconds) in TTL_INDEXES.items():
+        try:
+            await _ensure_ttl_index(db, collection_name, field, seconds)
+        except Exception as e:
+            logger.error(f"Failed to set up TTL index on {collection_name}: {e}")
+
+
+async def _ensure_ttl_index(db, collection_name, field, seconds):
+    collection = db[collection_name]
+    if seconds <= 0:
+        existing = await collection.index_information()
+        if TTL_INDEX_NAME in existing:
+            await collection.drop_index(TTL_INDEX_NAME)
+            logger.info(f"Retention disabled: dropped TTL index on {collection_name}")
+        return
+    try:
+        await collection.create_index([(field, ASCENDING)], name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code != _INDEX_OPTIONS_CONFLICT:
+            raise
+        # Same index, different retention window: change it in place instead of rebuilding
+        await db.command("collMod", collection_name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds})
+    logger.info(f"TTL on {collection_name}.{field}: documents expire after {seconds}s")
+
+
+_explained_shapes = set()
+
+
+def _plan_stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_query_plan(route: str, cursor, query: dict):
+    """Explain a route's query once per shape and warn if it scans the whole collection.
+
+    Only runs with QUERY_EXPLAIN_DEBUG enabled; explain() works on a clone so the
+    caller's cursor is left untouched.
+    """
+    if not QUERY_EXPLAIN_DEBUG:
+        return
+    shape = (route, tuple(sorted(query)))
+    if shape in _explained_shapes:
+        return
+    _explained_shapes.add(shape)
+    try:
+        explanation = await cursor.explain()
+    except Exception as e:
+        logger.debug(f"explain() failed for {route}: {e}")
+        return
+    winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+    if "COLLSCAN" in set(_plan_stages(winning_plan)):
+        logger.warning(f"Query for {route} does a COLLSCAN (filter keys: {list(query) or 'none'}); add an index")
@@ -0,0 +1,193 @@
+"""
+Prometheus metrics for the backend.
+
+- PrometheusMiddleware: per-route latency histogram, request/response sizes
+  and status counts. Routes are labelled with their path template
+  (/api/status, not /api/status?after=...) to keep label cardinality bounded,
+  cache hits and shed requests included.
+- MongoCommandMetrics: pymongo command listener timing every MongoDB
+  operation by command and collection.
+- metrics_response(): exposition for the /metrics endpoint. When
+  PROMETHEUS_MULTIPROC_DIR is set (required with `uvicorn --workers N`) the
+  per-process files in that directory are aggregated so every worker's
+  samples show up no matter which worker serves the scrape.
+"""
+
+import os
+import threading
+import time
+
+from pymongo import monitoring
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.responses import Response
+from starlette.routing import Match
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "HTTP request body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"], multiprocess_mode="livesum"
+)
+MONGO_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["command", "collection", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Internal commands that would only add noise to the per-operation view
+_IGNORED_COMMANDS = {"isMaster", "ismaster", "hello", "saslStart", "saslContinue", "endSessions"}
+
+
+def _match_route(routes, scope):
+    """(route, full match) of the first route handling `scope`, or (None, False)."""
+    partial = None
+    for candidate in routes:
+        match, child_scope = candidate.matches(scope)
+        if match == Match.NONE:
+            continue
+        # Mounted apps and included routers hold the route itself further down
+        inner = getattr(candidate, "routes", None)
+        if inner is None and hasattr(candidate, "original_router"):
+            inner = candidate.original_router.routes
+        if inner is not None:
+            route, full = _match_route(inner, {**scope, **child_scope})
+            if full:
+                return route, True
+            partial = partial or route
+        elif match == Match.FULL:
+            return candidate, True
+        else:
+            partial = partial or candidate  # path matches, method does not (405)
+    return partial, False
+
+
+def route_path(scope):
+    """Path template of the route a request is for, or None.
+
+    The router stores the matched route in the scope on the way down. Cache
+    hits and shed requests are answered by middleware before the router runs,
+    so for those the app's routes are matched here the same way.
+    """
+    route = scope.get("route")
+    if route is None:
+        router = getattr(scope.get("app"), "router", None)
+        route, _ = _match_route(getattr(router, "routes", ()), scope)
+    return getattr(route, "path", None)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware so streamed bodies are measured without buffering them."""
+
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request_size = 0
+        response_size = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal response_size, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.labels(method).dec()
+            route_label = route_path(scope) or "unmatched"
+            HTTP_REQUESTS.labels(method, route_label, str(status)).inc()
+            HTTP_LATENCY.labels(method, route_label).observe(elapsed)
+            HTTP_REQUEST_SIZE.labels(method, route_label).observe(request_size)
+            HTTP_RESPONSE_SIZE.labels(method, route_label).observe(response_size)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times MongoDB commands. Callbacks run on Motor's worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        # Most commands carry the collection name as the value of the command key;
+        # getMore's value is the cursor id and the name is in "collection"
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_LATENCY.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        payload = generate_latest(registry)
+    else:
+        payload = generate_latest()
+    return Response(payload, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the multiprocess aggregate on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
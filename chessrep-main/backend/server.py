@@ -1,18 +1,48 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager # Import for lifespan
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+import base64
+import hashlib
+import json
+import secrets
+import time
 import uuid
+import asyncio
 from datetime import datetime
 
 
 ROOT_DIR = Path(__file__).parent
+# Sibling modules resolve both as `uvicorn server:app` and `uvicorn backend.server:app`
+sys.path.insert(0, str(ROOT_DIR))
+
+from write_behind import WriteBehindBuffer
+from health import EventLoopLagMonitor, InFlightCounter, InFlightMiddleware, MongoPoolStats, mongo_client_options, warm_up_pool
+from admission import AdmissionControlMiddleware, RouteGroup, TokenBucketLimiter, admission_snapshot, parse_trusted_proxies
+from compression import CompressionMiddleware, PrecompressedFiles, negotiate_encoding
+from cache import LocalCacheBackend, RedisCacheBackend, ResponseCache, ResponseCacheMiddleware
+from indexes import check_query_plan, ensure_indexes
+from singleflight import default_group as read_flights, single_flight
+from fastjson import FastJSONResponse, dumps as fast_dumps
+from metrics import MongoCommandMetrics, PrometheusMiddleware, mark_worker_stopped, metrics_response
+from chessdata.archive import CONTENT_ENCODINGS, StudyArchive
+from chessdata.bitboard import STARTING_FEN, IllegalMoveError
+from chessdata.eco import EcoClassifier
+from chessdata.explorer import OpeningTree
+from chessdata.features import load_features
+from chessdata.positions import BALANCES, DIFFICULTIES, PHASES, SIDES, PositionStore
+from chessdata.position_index import PositionIndex
+from chessdata.position_table import PositionTable
+from chessdata.similarity import SimilarityIndex
+
 load_dotenv(ROOT_DIR / '.env')
 
 # Configure logging early
@@ -22,29 +52,164 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Static chess data shipped next to the app (scraped studies, position datasets)
+DATA_ROOT = ROOT_DIR.parent.parent
+STUDIES_DIR = Path(os.getenv("STUDIES_DIR", DATA_ROOT / "lichess_studies"))
+POSITIONS_CSV = Path(os.getenv("POSITIONS_CSV", DATA_ROOT / "aimchess_fens.csv"))
+# Training positions column store (chessdata.positions), loaded from POSITIONS_CSV at startup
+position_store: PositionStore = None
+POSITIONS_BATCH_MAX = int(os.getenv("POSITIONS_BATCH_MAX", "100"))
+POSITIONS_MAX_AGE = int(os.getenv("POSITIONS_MAX_AGE", "3600"))
+# Precomputed position features (python -m chessdata.features positions) enable score/phase/forcing filters
+POSITION_FEATURES_FILE = Path(os.getenv("POSITION_FEATURES_FILE", ROOT_DIR / "data" / "features" / "positions.npz"))
+# Single-archive study store (chessdata.archive); studies not in it fall back to STUDIES_DIR
+STUDIES_ARCHIVE = Path(os.getenv("STUDIES_ARCHIVE", DATA_ROOT / "lichess_studies.pack"))
+_study_archive: StudyArchive = None
+# Zobrist position index (python -m chessdata.position_index build), memory-mapped at startup
+POSITION_INDEX_DIR = Path(os.getenv("POSITION_INDEX_DIR", ROOT_DIR / "data" / "position_index"))
+position_index: PositionIndex = None
+# Opening explorer tree (python -m chessdata.explorer build), memory-mapped at startup
+EXPLORER_TREE_FILE = Path(os.getenv("EXPLORER_TREE_FILE", ROOT_DIR / "data" / "explorer" / "opening_tree.bin"))
+opening_tree: OpeningTree = None
+# ECO classification table (python -m chessdata.eco build), loaded at startup
+ECO_TABLE_FILE = Path(os.getenv("ECO_TABLE_FILE", ROOT_DIR / "data" / "eco" / "eco_table.json"))
+eco_classifier: EcoClassifier = None
+# Similar-position search (python -m chessdata.position_table build, then python -m chessdata.similarity build)
+POSITION_TABLE_DIR = Path(os.getenv("POSITION_TABLE_DIR", ROOT_DIR / "data" / "position_table"))
+SIMILARITY_INDEX_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", ROOT_DIR / "data" / "similarity"))
+SIMILAR_POSITIONS_MAX = int(os.getenv("SIMILAR_POSITIONS_MAX", "50"))
+similarity_index: SimilarityIndex = None
+
 # MongoDB connection details
 mongo_url = os.environ['MONGO_URL']
 db_name = os.environ['DB_NAME']
 client: AsyncIOMotorClient = None # Initialize client as None
 db = None # Initialize db as None
 
+# Optional write-behind batching for POST /api/status (off by default)
+STATUS_WRITE_BEHIND = os.getenv("STATUS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+status_writer: WriteBehindBuffer = None
+
+# Read-through response cache for GET routes; REDIS_URL shares it across workers
+redis_url = os.getenv("REDIS_URL")
+response_cache = ResponseCache(
+    RedisCacheBackend(redis_url) if redis_url else LocalCacheBackend(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "5")),
+)
+CACHED_ROUTES = {"/api/status": "status_checks"}
+
+async def invalidate_status_cache():
+    # Reads started after this point must not join a status query that began before the write
+    read_flights.forget()
+    await response_cache.invalidate("status_checks")
+
+# Admission control: per route-group concurrency limits with a bounded, deadline-limited
+# wait queue; beyond that requests get a fast 503 + Retry-After
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "256"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000")) / 1000
+admission_groups = [
+    RouteGroup("status", ("/api/status",), int(os.getenv("ADMISSION_STATUS_CONCURRENCY", "64")), ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT),
+    RouteGroup("api", ("/api/",), int(os.getenv("ADMISSION_API_CONCURRENCY", "128")), ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT),
+]
+# Per-client token bucket (requests/second, burst); 0 disables it
+RATE_LIMIT_PER_SEC = float(os.getenv("RATE_LIMIT_PER_SEC", "0"))
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_SEC, float(os.getenv("RATE_LIMIT_BURST", "20"))) if RATE_LIMIT_PER_SEC > 0 else None
+# Proxies whose X-Forwarded-For is believed (the bundled nginx runs on loopback)
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv("TRUSTED_PROXIES", "127.0.0.1, ::1"))
+
+# Large static payloads are compressed once per file version and served as-is
+precompressed = PrecompressedFiles(os.getenv("PRECOMPRESSED_DIR", ROOT_DIR / "data" / "precompressed"))
+
+# Health diagnostics (see health.py)
+pool_stats = MongoPoolStats()
+loop_lag = EventLoopLagMonitor(interval=float(os.getenv("HEALTH_LOOP_LAG_INTERVAL_MS", "500")) / 1000)
+in_flight = InFlightCounter()
+HEALTH_MAX_PING_MS = float(os.getenv("HEALTH_MAX_PING_MS", "250"))
+HEALTH_MAX_LOOP_LAG_MS = float(os.getenv("HEALTH_MAX_LOOP_LAG_MS", "200"))
+HEALTH_MAX_POOL_WAITERS = int(os.getenv("HEALTH_MAX_POOL_WAITERS", "10"))
+
 # Lifespan manager for startup and shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global client, db # Declare client and db as global to modify them
+    global client, db, status_writer, position_index, opening_tree, eco_classifier, position_store, similarity_index # Declare client and db as global to modify them
     # Startup: Connect to MongoDB
     logger.info("Application startup: Connecting to MongoDB...")
-    client = AsyncIOMotorClient(mongo_url)
+    client_options = mongo_client_options()
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[pool_stats, MongoCommandMetrics()], **client_options)
     db = client[db_name]
-    logger.info(f"Successfully connected to MongoDB database: {db_name}")
+    logger.info(f"Successfully connected to MongoDB database: {db_name} (maxPoolSize={client_options['maxPoolSize']})")
+    # Open a few pool connections up front so the first requests don't pay for the handshakes
+    warmup = int(os.getenv("MONGO_WARMUP_CONNECTIONS", "0"))
+    if warmup:
+        try:
+            opened = await warm_up_pool(db, warmup)
+            logger.info(f"Warmed up {opened}/{warmup} MongoDB connections")
+        except Exception as e:
+            logger.warning(f"MongoDB pool warm-up failed: {e}")
+    # Build indexes in the background; startup does not wait for them
+    index_task = asyncio.create_task(ensure_indexes(db), name="ensure-indexes")
+    loop_lag.start()
+    if PositionIndex.exists(POSITION_INDEX_DIR):
+        position_index = PositionIndex(POSITION_INDEX_DIR)
+        logger.info(f"Position index loaded: {len(position_index.hashes)} entries, {len(position_index.chapters)} chapters")
+    else:
+        logger.info(f"No position index at {POSITION_INDEX_DIR}; /api/studies/by-position is disabled")
+    if EXPLORER_TREE_FILE.exists():
+        opening_tree = OpeningTree(EXPLORER_TREE_FILE)
+        logger.info(f"Opening tree loaded: {opening_tree.node_count} positions")
+    else:
+        logger.info(f"No opening tree at {EXPLORER_TREE_FILE}; /api/explorer is disabled")
+    if POSITIONS_CSV.exists():
+        position_store = PositionStore.load(POSITIONS_CSV)
+        logger.info(f"Training positions loaded: {len(position_store)} rows (version {position_store.version})")
+        if POSITION_FEATURES_FILE.exists():
+            if position_store.attach_features(load_features(POSITION_FEATURES_FILE)):
+                logger.info(f"Position features loaded from {POSITION_FEATURES_FILE}")
+            else:
+                logger.warning(f"{POSITION_FEATURES_FILE} was built from another version of {POSITIONS_CSV.name}; ignored")
+    else:
+        logger.info(f"No positions dataset at {POSITIONS_CSV}; /api/positions is disabled")
+    if ECO_TABLE_FILE.exists():
+        eco_classifier = EcoClassifier.load(ECO_TABLE_FILE)
+        logger.info(f"ECO table loaded: {len(eco_classifier)} positions, {len(eco_classifier.labels)} openings")
+    else:
+        logger.info(f"No ECO table at {ECO_TABLE_FILE}; /api/eco/classify is disabled")
+    if PositionTable.exists(POSITION_TABLE_DIR) and SimilarityIndex.exists(SIMILARITY_INDEX_DIR):
+        try:
+            similarity_index = SimilarityIndex.load(SIMILARITY_INDEX_DIR, PositionTable(POSITION_TABLE_DIR))
+            logger.info(f"Similarity index loaded: {len(similarity_index)} positions")
+        except ValueError as e:
+            logger.warning(f"{e}; /api/positions/similar is disabled")
+    else:
+        logger.info(f"No similarity index at {SIMILARITY_INDEX_DIR}; /api/positions/similar is disabled")
+    if STATUS_WRITE_BEHIND:
+        status_writer = WriteBehindBuffer(
+            db.status_checks,
+            max_batch=int(os.getenv("STATUS_WRITE_BATCH", "500")),
+            max_delay=float(os.getenv("STATUS_WRITE_DELAY_MS", "50")) / 1000,
+            max_pending=int(os.getenv("STATUS_WRITE_MAX_PENDING", "10000")),
+            on_flush=invalidate_status_cache,
+        )
+        status_writer.start()
+        logger.info("Write-behind batching enabled for status checks")
     try:
         yield # Application is ready to serve requests
     finally:
+        if not index_task.done():
+            index_task.cancel()
+        await loop_lag.stop()
+        # Shutdown: flush buffered writes before the client goes away
+        if status_writer:
+            logger.info(f"Application shutdown: Flushing {status_writer.pending} buffered status checks...")
+            await status_writer.stop()
+            status_writer = None
         # Shutdown: Close MongoDB client
         if client:
             logger.info("Application shutdown: Closing MongoDB client.")
             client.close()
             logger.info("MongoDB client closed.")
+        await response_cache.close()
+        mark_worker_stopped()
 
 # Create the main app with the lifespan manager
 app = FastAPI(lifespan=lifespan)
@@ -62,33 +227,332 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class EcoQuery(BaseModel):
+    fen: Optional[str] = None          # the position itself, or the start of `moves`
+    moves: Optional[List[str]] = None  # SAN moves; classified by the deepest known position
+
+class EcoClassifyRequest(BaseModel):
+    positions: List[EcoQuery] = Field(..., max_length=1000)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Hello World from API"}
 
+def study_pgn_path(study_id: str) -> Path:
+    # Files are saved by the scraper as NNN_<studyId>.pgn
+    if not study_id.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid study id")
+    matches = sorted(STUDIES_DIR.glob(f"*_{study_id}.pgn"))
+    if not matches:
+        raise HTTPException(status_code=404, detail="Study not found")
+    return matches[-1]
+
+def study_archive():
+    global _study_archive
+    if _study_archive is None:
+        if not STUDIES_ARCHIVE.exists():
+            return None
+        _study_archive = StudyArchive(STUDIES_ARCHIVE)
+    else:
+        _study_archive.refresh()
+    return _study_archive
+
+def archived_study_response(archive: StudyArchive, study_id: str, accept_encoding: str):
+    entry = archive.entry(study_id)
+    headers = {"Vary": "Accept-Encoding", "Content-Disposition": f'attachment; filename="{study_id}.pgn"'}
+    media_type = "application/x-chess-pgn"
+    stored_encoding = CONTENT_ENCODINGS.get(archive.codec)
+    if stored_encoding and negotiate_encoding(accept_encoding, [stored_encoding]):
+        # The stored frame is already a valid body in an encoding the client accepts
+        headers.update({"Content-Encoding": stored_encoding, "Content-Length": str(entry["length"])})
+        return StreamingResponse(archive.iter_content(study_id, raw=True), media_type=media_type, headers=headers)
+    if archive.codec == "none":
+        # Slice of the memory-mapped pack
+        return Response(archive.read(study_id), media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(entry["size"])
+    return StreamingResponse(archive.iter_content(study_id), media_type=media_type, headers=headers)
+
+@api_router.get("/studies/{study_id}/pgn")
+async def get_study_pgn(study_id: str, request: Request):
+    if not study_id.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid study id")
+    archive = study_archive()
+    if archive is not None and study_id in archive:
+        return archived_study_response(archive, study_id, request.headers.get("accept-encoding", ""))
+    path = study_pgn_path(study_id)
+    return await precompressed.response(
+        path, request.headers.get("accept-encoding", ""), "application/x-chess-pgn", filename=f"{study_id}.pgn"
+    )
+
+@api_router.get("/studies/by-position")
+async def studies_by_position(fen: str, limit: int = Query(100, ge=1, le=1000)):
+    """Study chapters that reach the position (any move order), earliest ply first."""
+    if position_index is None:
+        raise HTTPException(status_code=503, detail="Position index not built")
+    try:
+        return position_index.lookup(fen, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
+
+@api_router.get("/explorer")
+async def explore_position(fen: str = STARTING_FEN):
+    """One opening-tree node: next moves with counts, openings and studies for the position."""
+    if opening_tree is None:
+        raise HTTPException(status_code=503, detail="Opening tree not built")
+    try:
+        return opening_tree.explore(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
+
+@api_router.post("/eco/classify")
+async def classify_eco(request: EcoClassifyRequest):
+    """ECO code and opening name per position or move list; null where nothing in the table matches."""
+    if eco_classifier is None:
+        raise HTTPException(status_code=503, detail="ECO table not built")
+    results = []
+    for query in request.positions:
+        try:
+            if query.moves is not None:
+                results.append(eco_classifier.classify_moves(query.moves, query.fen))
+            elif query.fen:
+                results.append(eco_classifier.classify_fen(query.fen))
+            else:
+                results.append({"error": "fen or moves required"})
+        except IllegalMoveError as e:
+            results.append({"error": f"Illegal move: {e}"})
+        except ValueError as e:
+            results.append({"error": f"Invalid FEN: {e}"})
+    return {"results": results}
+
+@api_router.get("/positions/similar")
+async def similar_positions(
+    fen: str,
+    k: int = Query(10, ge=1, le=SIMILAR_POSITIONS_MAX),
+    max_distance: Optional[int] = Query(None, ge=0),
+):
+    """Puzzle and study positions closest to the FEN in pawn structure and material, nearest first."""
+    if similarity_index is None:
+        raise HTTPException(status_code=503, detail="Similarity index not built")
+    try:
+        return similarity_index.search(fen, k, max_distance)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
+
+@api_router.get("/positions")
+async def get_positions(
+    request: Request,
+    n: int = Query(10, ge=1, le=POSITIONS_BATCH_MAX),
+    side: Optional[str] = Query(None, pattern=f"^({'|'.join(SIDES)})$"),
+    difficulty: Optional[str] = Query(None, pattern=f"^({'|'.join(name for name, _ in DIFFICULTIES)})$"),
+    balance: Optional[str] = Query(None, pattern=f"^({'|'.join(BALANCES)})$"),
+    seed: Optional[int] = Query(None, ge=0, lt=2**32),
+    min_score: Optional[int] = Query(None, ge=0, le=100),
+    max_score: Optional[int] = Query(None, ge=0, le=100),
+    phase: Optional[str] = Query(None, pattern=f"^({'|'.join(PHASES)})$"),
+    forcing: Optional[bool] = None,
+):
+    """A batch of up to n distinct training positions, random or filtered, in one round trip.
+
+    The same seed and filters always return the same batch, so seeded batches
+    are cacheable (ETag + max-age); unseeded ones pick a fresh seed, echoed in
+    the body so the client can replay it. min_score/max_score/phase/forcing
+    need the precomputed features file.
+    """
+    if position_store is None:
+        raise HTTPException(status_code=503, detail="Positions dataset not loaded")
+    filters = dict(side=side, difficulty=difficulty, balance=balance,
+                   min_score=min_score, max_score=max_score, phase=phase, forcing=forcing)
+    if not position_store.has_features and any(
+        filters[name] is not None for name in ("min_score", "max_score", "phase", "forcing")
+    ):
+        raise HTTPException(status_code=400, detail="Position features not built; score/phase/forcing filters unavailable")
+    seeded = seed is not None
+    if not seeded:
+        seed = secrets.randbelow(2**32)
+    query = "|".join(str(v) for v in (n, seed, position_store.features_version, *filters.values()))
+    etag = f'"{position_store.version}-{hashlib.sha1(query.encode()).hexdigest()[:16]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={POSITIONS_MAX_AGE}" if seeded else "no-store",
+    }
+    if seeded and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    selected, total = position_store.sample(n, seed, **filters)
+    return FastJSONResponse(
+        {"seed": seed, "total": total, "positions": position_store.rows(selected)}, headers=headers
+    )
+
+@api_router.get("/datasets/positions.csv")
+async def get_positions_dataset(request: Request):
+    if not POSITIONS_CSV.exists():
+        raise HTTPException(status_code=404, detail="Positions dataset not found")
+    return await precompressed.response(POSITIONS_CSV, request.headers.get("accept-encoding", ""), "text/csv")
+
+@api_router.get("/health")
+async def health():
+    # Readiness: 200 when healthy, 503 when degraded so load balancers can route around this worker
+    checks = {"status": "ok", "problems": []}
+    mongo = {"ok": False, "ping_ms": None}
+    if db is None:
+        checks["problems"].append("database not initialized")
+    else:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command("ping"), timeout=HEALTH_MAX_PING_MS * 4 / 1000)
+            mongo["ok"] = True
+        except Exception as e:
+            checks["problems"].append(f"mongodb ping failed: {e.__class__.__name__}")
+        mongo["ping_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        if mongo["ok"] and mongo["ping_ms"] > HEALTH_MAX_PING_MS:
+            checks["problems"].append("mongodb ping slow")
+
+    pool = pool_stats.snapshot()
+    if pool["waiting"] > HEALTH_MAX_POOL_WAITERS:
+        checks["problems"].append("mongodb pool saturated")
+    lag = loop_lag.snapshot()
+    if lag["last_ms"] > HEALTH_MAX_LOOP_LAG_MS:
+        checks["problems"].append("event loop lagging")
+
+    if checks["problems"]:
+        checks["status"] = "degraded" if mongo["ok"] else "unavailable"
+    checks.update({
+        "mongodb": mongo,
+        "pool": pool,
+        "event_loop_lag": lag,
+        "in_flight_requests": in_flight.snapshot(),
+        "response_cache": response_cache.stats(),
+        "single_flight": read_flights.stats(),
+        "admission": admission_snapshot(admission_groups, rate_limiter),
+        "write_behind": {"pending": status_writer.pending, "errors": status_writer.write_errors} if status_writer else None,
+    })
+    return JSONResponse(checks, status_code=200 if checks["status"] == "ok" else 503)
+
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input_data: StatusCheckCreate): # Renamed 'input' to 'input_data' to avoid shadowing built-in
+async def create_status_check(input_data: StatusCheckCreate, durable: bool = False): # Renamed 'input' to 'input_data' to avoid shadowing built-in
     status_dict = input_data.model_dump() # Use model_dump() for Pydantic v2+
     status_obj = StatusCheck(**status_dict)
     # Ensure db is available (it will be after lifespan startup)
     if db is None:
         raise HTTPException(status_code=500, detail="Database not initialized")
-    _ = await db.status_checks.insert_one(status_obj.model_dump()) # Use model_dump()
+    if status_writer is None:
+        _ = await db.status_checks.insert_one(status_obj.model_dump()) # Use model_dump()
+        await invalidate_status_cache()
+        return status_obj
+    # Write-behind: queue the insert; durable=true waits until its batch is written
+    try:
+        await status_writer.submit(status_obj.model_dump(), durable=durable)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store status check: {e}")
     return status_obj
 
+# Opt-in fast path: list responses are encoded straight from the Mongo documents
+# instead of StatusCheck(**doc) + response_model.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+# Only the response model's fields leave the database, so nothing else stored on a
+# document can reach a client through the fast path or the NDJSON stream
+STATUS_PROJECTION = {"_id": 0, **{name: 1 for name in StatusCheck.model_fields}}
+
+# Keyset pagination for status checks. Pages are ordered by (timestamp, id) and
+# the "after" cursor is the key of the last document of the previous page, so
+# every page is an index range scan instead of a growing skip().
+STATUS_SORT = [("timestamp", 1), ("id", 1)]
+STATUS_PAGE_MAX = 1000
+STATUS_STREAM_BATCH = int(os.getenv("STATUS_STREAM_BATCH", "500"))
+
+def _encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["timestamp"].isoformat(), doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(ts), str(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+def _status_filter(after: Optional[str]) -> dict:
+    if not after:
+        return {}
+    ts, doc_id = _decode_cursor(after)
+    return {"$or": [{"timestamp": {"$gt": ts}}, {"timestamp": ts, "id": {"$gt": doc_id}}]}
+
+@single_flight
+async def load_status_page(after: Optional[str], limit: int):
+    # Identical concurrent reads share this query; the result is read-only
+    query = _status_filter(after)
+    status_checks_cursor = db.status_checks.find(query, STATUS_PROJECTION).sort(STATUS_SORT).limit(limit + 1)
+    await check_query_plan("GET /api/status", status_checks_cursor, query)
+    status_checks_list = await status_checks_cursor.to_list(length=limit + 1)
+    # One extra document tells us whether there is a next page without a count()
+    page_headers = {}
+    if len(status_checks_list) > limit:
+        status_checks_list = status_checks_list[:limit]
+        next_cursor = _encode_cursor(status_checks_list[-1])
+        page_headers["X-Next-Cursor"] = next_cursor
+        page_headers["Link"] = f'</api/status?limit={limit}&after={next_cursor}>; rel="next"'
+    return status_checks_list, page_headers
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(
+    response: Response,
+    limit: int = Query(STATUS_PAGE_MAX, ge=1, le=STATUS_PAGE_MAX),
+    after: Optional[str] = None,
+    fast: bool = FAST_JSON_RESPONSES,
+):
     # Ensure db is available
     if db is None:
         raise HTTPException(status_code=500, detail="Database not initialized")
-    status_checks_cursor = db.status_checks.find()
-    status_checks_list = await status_checks_cursor.to_list(length=1000) # Specify length for to_list
+    status_checks_list, page_headers = await load_status_page(after, limit)
+    if fast:
+        # Our own documents: skip re-validation and encode once
+        return FastJSONResponse(status_checks_list, headers=page_headers)
+    response.headers.update(page_headers)
     return [StatusCheck(**status_check) for status_check in status_checks_list]
 
+@api_router.get("/status/stream")
+async def stream_status_checks(after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    # Ensure db is available
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    query = _status_filter(after)
+    status_checks_cursor = db.status_checks.find(query, STATUS_PROJECTION).sort(STATUS_SORT)
+    status_checks_cursor = status_checks_cursor.batch_size(STATUS_STREAM_BATCH)
+    if limit:
+        status_checks_cursor = status_checks_cursor.limit(limit)
+    await check_query_plan("GET /api/status/stream", status_checks_cursor, query)
+
+    async def ndjson_lines():
+        # Documents are written as the cursor yields them, one batch in memory at a time
+        try:
+            async for status_check in status_checks_cursor:
+                yield fast_dumps(status_check) + b"\n"
+        finally:
+            await status_checks_cursor.close()
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Shed load before it queues up inside the event loop (inside the response cache so
+# cache hits are never shed)
+app.add_middleware(AdmissionControlMiddleware, groups=admission_groups, limiter=rate_limiter,
+                   trusted_proxies=TRUSTED_PROXIES)
+
+# Serve repeated reads from the response cache (writes invalidate it)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes=CACHED_ROUTES)
+
+# Count requests currently being served (reported by /api/health), shed and cached ones included
+app.add_middleware(InFlightMiddleware, counter=in_flight)
+
+# Prometheus request metrics, scraped from /metrics
+app.add_middleware(PrometheusMiddleware)
+
+# Compress responses above COMPRESSION_MIN_SIZE bytes (streamed, never buffered)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -98,6 +562,10 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization", "x-auth-token"],
 )
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 # A simple root endpoint for the main app (optional)
 @app.get("/")
 async def main_app_root():
@@ -0,0 +1,68 @@
+"""
+Single-flight request coalescing.
+
+When several identical reads arrive while one is already running, the later
+callers await the first call's result instead of issuing their own query, so
+a burst of N identical requests costs one database round trip.
+
+    @single_flight
+    async def load_page(after, limit):
+        ...
+
+Results are shared between callers and must be treated as read-only.
+
+Writers call forget() once their write has landed: reads that start after
+that run a fresh query instead of joining one that began before the write.
+"""
+
+import asyncio
+import functools
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._in_flight[key] = task
+
+            def done(_):
+                # A newer call may own the key after forget()
+                if self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+
+            task.add_done_callback(done)
+        else:
+            self.shared += 1
+        # Shielded so one caller disconnecting does not cancel the query for the others
+        return await asyncio.shield(task)
+
+    def forget(self):
+        """Detach the running calls; their current callers still get their results."""
+        self._in_flight.clear()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
+
+
+default_group = SingleFlight()
+
+
+def single_flight(fn=None, *, group: SingleFlight = None):
+    """Decorator coalescing concurrent calls with equal arguments into one."""
+    if fn is None:
+        return functools.partial(single_flight, group=group)
+    flight = group or default_group
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        key = (fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        return await flight.do(key, fn, *args, **kwargs)
+
+    return wrapper
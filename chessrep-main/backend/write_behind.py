@@ -0,0 +1,154 @@
+"""
+Write-behind buffer for MongoDB inserts.
+
+Requests hand their documents to the buffer and return immediately; a single
+background task drains the buffer and merges whatever is pending into one
+insert_many(ordered=False) call. A batch goes out as soon as it reaches
+max_batch documents or max_delay seconds after its first document arrived,
+whichever comes first. Callers that need the write acknowledged can pass
+durable=True and wait for their batch to land. on_flush, if given, is awaited
+after every batch (e.g. to invalidate cached reads once the data is there).
+
+stop() flushes everything already queued; documents submitted once it has
+begun are written directly with insert_one.
+"""
+
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    def __init__(self, collection, max_batch=500, max_delay=0.05, max_pending=10000, on_flush=None):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        # Bounded so a stalled database pushes back on writers instead of growing memory
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: asyncio.Task = None
+        self._closing = False
+        self.batches_written = 0
+        self.documents_written = 0
+        self.write_errors = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="write-behind")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the drain task."""
+        if not self.running:
+            return
+        # Submits from here on write directly instead of queueing behind _STOP
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, document: dict, durable: bool = False):
+        if not self.running or self._closing:
+            # Not started, shutting down or shut down: fall back to a direct write
+            await self.collection.insert_one(document)
+            if self.on_flush is not None:
+                await self.on_flush()
+            return
+        future = asyncio.get_running_loop().create_future() if durable else None
+        await self._queue.put((document, future))
+        if future is not None:
+            await future
+
+    def _drain(self):
+        """Everything still queued, without waiting."""
+        items = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                items.append(item)
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        batch = []
+        try:
+            while not stopping:
+                item = await self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = loop.time() + self.max_delay
+                while len(batch) < self.max_batch:
+                    if self._queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        item = self._queue.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                await self._flush(batch)
+                batch = []
+            # A submit blocked on a full queue when stop() began lands behind _STOP
+            batch = self._drain()
+            if batch:
+                await self._flush(batch)
+                batch = []
+        finally:
+            # Cancelled or crashed: nobody will write these, so durable callers must not wait forever
+            for _, future in batch + self._drain():
+                if future is not None and not future.done():
+                    future.set_exception(RuntimeError("write-behind buffer stopped before the document was written"))
+
+    async def _flush(self, batch):
+        # insert_many adds _id to the dicts it is given; keep the callers' documents untouched
+        documents = [dict(document) for document, _ in batch]
+        failed = {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # With ordered=False everything except the listed indexes was written
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "write error")
+        except Exception as e:
+            logger.error(f"Write-behind batch of {len(batch)} documents failed: {e}")
+            failed = {index: str(e) for index in range(len(batch))}
+
+        self.batches_written += 1
+        self.documents_written += len(batch) - len(failed)
+        self.write_errors += len(failed)
+        if failed:
+            logger.warning(f"Write-behind batch: {len(failed)}/{len(batch)} documents not written")
+        if self.on_flush is not None and len(failed) < len(batch):
+            try:
+                await self.on_flush()
+            except Exception as e:
+                logger.warning(f"Write-behind on_flush callback failed: {e}")
+
+        for index, (_, future) in enumerate(batch):
+            if future is None or future.done():
+                continue
+            if index in failed:
+                future.set_exception(RuntimeError(failed[index]))
+            else:
+                future.set_result(None)
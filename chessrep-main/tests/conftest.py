@@ -0,0 +1,35 @@
+"""
+Shared fixtures. The backend modules are imported the way uvicorn runs them
+(`uvicorn server:app` from chessrep-main/backend); MongoDB is replaced by
+mongomock-motor and lifespan startup is skipped.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+os.environ.setdefault("DB_NAME", "chessrep_test")
+
+
+@pytest.fixture
+def server():
+    import server
+    from cache import LocalCacheBackend
+    from mongomock_motor import AsyncMongoMockClient
+
+    server.db = AsyncMongoMockClient()["chessrep_test"]
+    server.response_cache.backend = LocalCacheBackend()
+    yield server
+    server.db = None
+
+
+@pytest.fixture
+def client(server):
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
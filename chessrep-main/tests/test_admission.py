@@ -0,0 +1,63 @@
+import asyncio
+
+from admission import AdmissionControlMiddleware, RouteGroup, TokenBucketLimiter, client_key, parse_trusted_proxies
+
+PROXIES = parse_trusted_proxies("127.0.0.1, ::1, 10.0.0.0/8")
+
+
+def scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return {"type": "http", "method": "GET", "path": "/api/status", "headers": headers, "client": (peer, 51234)}
+
+
+def statuses(middleware, scopes):
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def run():
+        result = []
+        for s in scopes:
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            await middleware(s, None, send)
+            result.append(sent[0]["status"])
+        return result
+
+    middleware.app = ok
+    return asyncio.run(run())
+
+
+def limited_middleware():
+    # 2 requests of burst, effectively no refill during the test
+    group = RouteGroup("api", ("/api/",), 10, 10, 1.0)
+    return AdmissionControlMiddleware(None, [group], TokenBucketLimiter(0.001, 2), trusted_proxies=PROXIES)
+
+
+def test_forwarded_for_from_untrusted_peer_is_ignored():
+    assert client_key(scope("203.0.113.7", "1.2.3.4"), PROXIES) == "203.0.113.7"
+    assert client_key(scope("203.0.113.7", "1.2.3.4"), ()) == "203.0.113.7"
+
+
+def test_spoofed_forwarded_for_does_not_get_a_fresh_bucket():
+    spoofed = [scope("203.0.113.7", f"198.51.100.{i}") for i in range(4)]
+    assert statuses(limited_middleware(), spoofed) == [200, 200, 429, 429]
+
+
+def test_proxied_client_is_rightmost_untrusted_hop():
+    # Client-supplied value first, then what nginx appended, then an internal load balancer
+    assert client_key(scope("127.0.0.1", "6.6.6.6, 203.0.113.7, 10.1.2.3"), PROXIES) == "203.0.113.7"
+    assert client_key(scope("::1", "203.0.113.9"), PROXIES) == "203.0.113.9"
+    # Only trusted hops (or none at all): the peer itself
+    assert client_key(scope("127.0.0.1", "10.0.0.5"), PROXIES) == "127.0.0.1"
+    assert client_key(scope("127.0.0.1"), PROXIES) == "127.0.0.1"
+
+
+def test_clients_behind_the_proxy_get_separate_buckets():
+    through_nginx = [scope("127.0.0.1", f"{fake}, {real}")
+                     for real in ("203.0.113.7", "203.0.113.8") for fake in ("1.1.1.1", "2.2.2.2", "3.3.3.3")]
+    # Each real client is limited on its own, whatever it puts in front of the header
+    assert statuses(limited_middleware(), through_nginx) == [200, 200, 429, 200, 200, 429]
@@ -0,0 +1,178 @@
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+
+from chessdata.archive import HEADER_SIZE, StudyArchive, index_path, zstandard
+from chessdata.pgn import iter_chapters
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+CODECS = ["gzip", "none"] + (["zstd"] if zstandard is not None else [])
+
+
+def study_pgn(study_id, moves="1. e4 e5 2. Nf3 Nc6"):
+    return (f'[Event "{study_id}: Chapter 1"]\n[ChapterURL "https://lichess.org/study/{study_id}/ch1"]\n\n'
+            f"{moves} *\n").encode()
+
+
+def chunked(data, size=7):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def build(path, codec, studies):
+    with StudyArchive(path, codec=codec, writable=True) as archive:
+        for study_id, data in studies.items():
+            archive.append(study_id, chunked(data), f"{study_id}.pgn")
+    return StudyArchive(path)
+
+
+STUDIES = {f"study{i}": study_pgn(f"study{i}", "1. d4 d5 " * (i + 1)) for i in range(3)}
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_append_then_read_any_study_by_id(tmp_path, codec):
+    archive = build(tmp_path / "studies.pack", codec, STUDIES)
+
+    assert archive.codec == codec and sorted(archive.ids()) == sorted(STUDIES)
+    for study_id in ["study2", "study0", "study1"]:  # random access, not pack order
+        assert archive.read(study_id) == STUDIES[study_id]
+        assert b"".join(archive.iter_content(study_id, chunk_size=5)) == STUDIES[study_id]
+        entry = archive.entry(study_id)
+        assert entry["size"] == len(STUDIES[study_id]) and entry["file"] == f"{study_id}.pgn"
+    (chapter,) = iter_chapters(archive.open("study1"))
+    assert chapter.study_id == "study1" and len(chapter.moves) == 4
+    with pytest.raises(KeyError):
+        archive.read("missing")
+
+
+@pytest.mark.parametrize("codec", [c for c in CODECS if c != "none"])
+def test_stored_frames_are_complete_compressed_streams(tmp_path, codec):
+    archive = build(tmp_path / "studies.pack", codec, STUDIES)
+
+    frame = b"".join(archive.iter_content("study1", raw=True))
+
+    assert len(frame) == archive.entry("study1")["length"]
+    if codec == "gzip":
+        assert gzip.decompress(frame) == STUDIES["study1"]
+    else:
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(frame) == STUDIES["study1"]
+
+
+def test_uncompressed_reads_are_slices_of_the_memory_map(tmp_path):
+    archive = build(tmp_path / "studies.pack", "none", STUDIES)
+
+    data = archive.read("study2")
+
+    assert data == STUDIES["study2"]
+    entry = archive.entry("study2")
+    assert archive._mm is not None and archive._mm[entry["offset"]:entry["offset"] + entry["length"]] == data
+
+
+def test_changed_study_appends_a_frame_and_the_last_one_wins(tmp_path):
+    path = tmp_path / "studies.pack"
+    build(path, "gzip", STUDIES).close()
+
+    with StudyArchive(path, writable=True) as archive:
+        known = archive.entry("study0")["sha256"]
+        assert archive.append("study0", chunked(STUDIES["study0"]), skip_if_sha256=known) is None
+        assert archive.append("study0", chunked(study_pgn("study0", "1. c4"))) is not None
+
+    archive = StudyArchive(path)
+    assert archive.read("study0") == study_pgn("study0", "1. c4")
+    assert len(index_path(path).read_text().splitlines()) == 4
+
+
+def test_reopen_drops_a_frame_torn_by_a_crash(tmp_path):
+    path = tmp_path / "studies.pack"
+    build(path, "gzip", STUDIES).close()
+    end = path.stat().st_size
+    # Crash mid-append: part of a frame in the pack, half an index line
+    with open(path, "ab") as f:
+        f.write(gzip.compress(study_pgn("lost"))[:20])
+    with open(index_path(path), "a", encoding="utf-8") as f:
+        f.write('{"id": "lost", "offset": %d' % end)
+
+    with StudyArchive(path, writable=True) as archive:
+        assert "lost" not in archive
+        assert path.stat().st_size == end  # torn tail cut off
+        archive.append("study3", chunked(STUDIES["study0"]))
+
+    archive = StudyArchive(path)
+    assert archive.entry("study3")["offset"] == end
+    assert archive.read("study3") == STUDIES["study0"]
+    assert all(archive.read(study_id) == data for study_id, data in STUDIES.items())
+    assert [line.startswith("{") and line.endswith("}") for line in index_path(path).read_text().splitlines()] == [True] * 4
+
+
+def test_reader_refresh_sees_studies_appended_later(tmp_path):
+    path = tmp_path / "studies.pack"
+    writer = StudyArchive(path, codec="gzip", writable=True)
+    writer.append("study0", chunked(STUDIES["study0"]))
+    writer.sync()
+    reader = StudyArchive(path)
+    assert reader.read("study0") == STUDIES["study0"]
+
+    writer.append("study1", chunked(STUDIES["study1"]))
+    writer.close()
+    assert "study1" not in reader
+    reader.refresh()
+    assert reader.read("study1") == STUDIES["study1"]
+    assert not StudyArchive(path).writable and path.stat().st_size > HEADER_SIZE
+
+
+class StreamedResponse:
+    """The part of requests.Response the scraper uses for a streamed download."""
+
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+        self.headers = {"ETag": '"v1"'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        return chunked(self.body, 11)
+
+
+def test_streamed_download_goes_into_the_archive(tmp_path):
+    from scrape_lichess_studies import LichessStudyScraper
+
+    pack = tmp_path / "studies.pack"
+    scraper = LichessStudyScraper(output_folder=str(tmp_path / "studies"), archive=pack)
+    url = "https://lichess.org/study/study1"
+    try:
+        assert scraper.store_study_pgn(url, 1, StreamedResponse(STUDIES["study1"]))
+        # Same content again: no new frame
+        assert scraper.store_study_pgn(url, 1, StreamedResponse(STUDIES["study1"]))
+    finally:
+        scraper.archive.close()
+        scraper.journal.close()
+
+    archive = StudyArchive(pack)
+    assert archive.read("study1") == STUDIES["study1"]
+    assert len(index_path(pack).read_text().splitlines()) == 1
+    assert scraper.unchanged == 1
+    assert list(Path(scraper.output_folder).glob("*.pgn")) == []
+
+
+@pytest.mark.parametrize("accept_encoding, content_encoding", [("gzip", "gzip"), ("identity", None)])
+def test_study_download_endpoint_streams_from_the_archive(tmp_path, server, client, monkeypatch,
+                                                          accept_encoding, content_encoding):
+    monkeypatch.setattr(server, "_study_archive", build(tmp_path / "studies.pack", "gzip", STUDIES))
+
+    response = client.get("/api/studies/study2/pgn", headers={"Accept-Encoding": accept_encoding})
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == content_encoding
+    assert response.content == STUDIES["study2"]  # decoded by the client when gzip
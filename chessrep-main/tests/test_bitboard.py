@@ -0,0 +1,127 @@
+import pytest
+
+from chessdata.bitboard import STARTING_FEN, Board, IllegalMoveError, move_uci, perft
+from chessdata.validate import check_position_row
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+@pytest.mark.parametrize("fen, depth, nodes", [
+    (STARTING_FEN, 1, 20),
+    (STARTING_FEN, 3, 8902),
+    (KIWIPETE, 1, 48),
+    (KIWIPETE, 2, 2039),
+])
+def test_perft(fen, depth, nodes):
+    assert perft(Board(fen), depth) == nodes
+
+
+def test_push_keeps_fen_and_zobrist_in_step():
+    board = Board()
+    for san in ["e4", "c5", "e5", "d5"]:
+        board.push_san(san)
+
+    assert board.fen() == "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"
+    # En passant is available, so the key differs from the same placement without it
+    assert board.zobrist() == Board(board.fen()).zobrist()
+    assert board.zobrist() != Board(board.fen().replace(" d6 ", " - ")).zobrist()
+    board.push_san("exd6")
+    assert board.piece_at(35) == -1 and board.fen().startswith("rnbqkbnr/pp2pppp/3P4/2p5/")
+
+
+@pytest.mark.parametrize("fen, uci, san", [
+    # Disambiguation by file, by rank, and by both
+    ("4k3/8/8/8/8/8/4K3/R6R w - - 0 1", "a1d1", "Rad1"),
+    ("4k3/8/8/8/R7/8/8/R3K3 w - - 0 1", "a1a2", "R1a2"),
+    ("4k3/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1", "a1b2", "Qa1b2"),
+    ("6k1/P7/8/8/8/8/8/4K3 w - - 0 1", "a7a8q", "a8=Q+"),
+    ("1r4k1/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8n", "axb8=N"),
+    ("6k1/5ppp/8/8/8/8/8/R3K3 w - - 0 1", "a1a8", "Ra8#"),
+    ("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1", "e1g1", "O-O"),
+    ("r3k3/8/8/8/8/8/8/3K4 b q - 0 1", "e8c8", "O-O-O+"),
+])
+def test_san_round_trip(fen, uci, san):
+    board = Board(fen)
+
+    move = board.parse_san(san)
+
+    assert move_uci(move) == uci
+    assert board.san(move) == san
+
+
+def test_parse_san_accepts_loose_spellings_and_rejects_bad_moves():
+    board = Board("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert board.parse_san("0-0") == board.parse_san("O-O+")
+    rooks = Board("4k3/8/8/8/8/8/4K3/R6R w - - 0 1")
+    assert rooks.san(rooks.parse_san("Ra1d1")) == "Rad1"
+
+    with pytest.raises(IllegalMoveError, match="ambiguous"):
+        rooks.parse_san("Rd1")
+    with pytest.raises(IllegalMoveError, match="illegal"):
+        rooks.parse_san("Kd8")
+    with pytest.raises(IllegalMoveError, match="invalid"):
+        rooks.parse_san("Zz9")
+    with pytest.raises(IllegalMoveError):
+        Board("4k3/8/8/8/8/8/5r2/R3K2R w KQ - 0 1").parse_san("O-O")  # f1 attacked
+    with pytest.raises(IllegalMoveError):
+        Board("6k1/P7/8/8/8/8/8/4K3 w - - 0 1").parse_san("a8")  # promotion piece missing
+
+
+@pytest.mark.parametrize("fen, problems", [
+    (STARTING_FEN, []),
+    ("4k3/8/8/8/8/8/8/p3K3 b - - 0 1", ["pawn on the first or last rank"]),
+    ("P3k3/8/8/8/8/8/8/4K3 w - - 0 1", ["pawn on the first or last rank"]),
+    ("4k3/pppppppp/p7/8/8/8/8/4K3 w - - 0 1", ["too many black pieces"]),
+    ("4k3/8/8/8/8/8/8/4K2R w - - 0 1", []),
+    ("4k2R/8/8/8/8/8/8/4K3 w - - 0 1", ["side not to move is in check"]),
+    ("4k3/8/8/8/8/8/8/4K3 w - e3 0 1", ["invalid en passant square"]),
+])
+def test_problems(fen, problems):
+    board = Board(fen)
+
+    assert board.problems() == problems
+    # Impossible positions still generate moves instead of failing
+    assert all(move_uci(m) for m in board.legal_moves())
+
+
+def test_set_fen_rejects_unparsable_fens():
+    for fen in ["", "8/8/8/8/8/8/8/8 w - - 0 1", "4k3/8/8/8/8/8/8/4K3 x - - 0 1",
+                "4k3/8/8/8/8/8/8/4K4 w - - 0 1", "4k3/8/8/8/8/8/8/4K3 w - - zero 1"]:
+        with pytest.raises(ValueError):
+            Board(fen)
+    # Castling rights the placement contradicts are dropped
+    assert Board("4k3/8/8/8/8/8/8/4K3 w KQkq - 0 1").castling_fen() == "-"
+
+
+def row(fen, answer1, answer2, correct="Answer1"):
+    return {"Index": "1", "FEN": fen, "Answer1": answer1, "Answer2": answer2, "CorrectAnswer": correct}
+
+
+def test_check_position_row_normalizes_valid_rows():
+    result = check_position_row(row("4k3/8/8/8/8/8/8/R3K2R w KQ -", "Ra1d1", "0-0+"))
+
+    assert result["errors"] == []
+    assert result["normalized"] == row("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1", "Rd1", "O-O")
+    assert result["changes"] == ["FEN", "Answer1", "Answer2"]
+    assert check_position_row(row(STARTING_FEN, "e4", "d4", "Answer2"))["changes"] == []
+
+
+@pytest.mark.parametrize("fields, error", [
+    (("not a fen", "e4", "d4"), "FEN: invalid FEN placement"),
+    (("4k3/8/8/8/8/8/8/p3K3 b - - 0 1", "Kd7", "a1=Q"), "FEN: pawn on the first or last rank"),
+    (("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", "Kg8", "Kh7"), "FEN: no legal moves (game over)"),
+    ((STARTING_FEN, "e5", "d4"), "Answer1: illegal SAN 'e5'"),
+    ((STARTING_FEN, "e4", "e9"), "Answer2: invalid SAN 'e9'"),
+    ((STARTING_FEN, "Nf3", "Ngf3"), "Answer1 and Answer2 are the same move"),
+])
+def test_check_position_row_reports_invalid_rows(fields, error):
+    result = check_position_row(row(*fields))
+
+    assert result["normalized"] is None
+    assert any(e.startswith(error) for e in result["errors"]), result["errors"]
+
+
+def test_check_position_row_needs_a_correct_answer():
+    result = check_position_row(row(STARTING_FEN, "e4", "d4", "Answer3"))
+
+    assert result["errors"] == ["CorrectAnswer: 'Answer3'"]
@@ -0,0 +1,96 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from compression import CompressionMiddleware, PrecompressedFiles, negotiate_encoding
+
+SUPPORTED = ["br", "zstd", "gzip"]
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=nonsense", None),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip, br", "br"),            # equal weights: server preference order
+    ("zstd;q=0.8, gzip;q=0.9", "gzip"),
+    ("*", "br"),
+    ("*;q=0.1, gzip;q=0", "br"),
+    ("deflate", None),
+])
+def test_negotiate_encoding(accept, expected):
+    assert negotiate_encoding(accept, SUPPORTED) == expected
+
+
+def test_negotiate_encoding_only_offers_supported():
+    assert negotiate_encoding("br, gzip;q=0.5", ["gzip"]) == "gzip"
+    assert negotiate_encoding("br", ["gzip"]) is None
+
+
+def run_middleware(accept, chunks, minimum_size=100):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    async def run():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        headers = [(b"accept-encoding", accept.encode())] if accept else []
+        await CompressionMiddleware(app, minimum_size=minimum_size)({"type": "http", "headers": headers}, None, send)
+        start = sent[0]
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        return dict(start["headers"]), body
+
+    return asyncio.run(run())
+
+
+def test_large_body_is_gzipped_when_accepted():
+    payload = json.dumps([{"id": i, "client_name": "x" * 20} for i in range(50)]).encode()
+    headers, body = run_middleware("gzip", [payload])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body)
+    assert gzip.decompress(body) == payload
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    chunks = [json.dumps({"line": i, "pad": "y" * 80}).encode() + b"\n" for i in range(20)]
+    headers, body = run_middleware("gzip", chunks)
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert gzip.decompress(body) == b"".join(chunks)
+
+
+@pytest.mark.parametrize("accept", ["", "gzip;q=0", "identity"])
+def test_identity_when_not_accepted(accept):
+    payload = b"[" + b"1," * 200 + b"1]"
+    headers, body = run_middleware(accept, [payload])
+    assert b"content-encoding" not in headers and body == payload
+
+
+def test_small_body_is_left_alone():
+    headers, body = run_middleware("gzip", [b"[]"])
+    assert b"content-encoding" not in headers and body == b"[]"
+
+
+def test_precompressed_file_follows_accept_encoding(tmp_path):
+    source = tmp_path / "positions.csv"
+    source.write_text("Index,FEN\n" + "1,8/8/8/8/8/8/8/8 w - - 0 1\n" * 100)
+    files = PrecompressedFiles(tmp_path / "cache", encodings=["gzip"])
+
+    compressed = asyncio.run(files.response(source, "br;q=1, gzip;q=0.5", "text/csv"))
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(open(compressed.path, "rb").read()) == source.read_bytes()
+
+    plain = asyncio.run(files.response(source, "gzip;q=0", "text/csv"))
+    assert "content-encoding" not in plain.headers and plain.path == source
@@ -0,0 +1,37 @@
+import pytest
+
+from chessdata.bitboard import Board, IllegalMoveError
+from chessdata.eco import EcoClassifier
+
+
+def king_pawn_table():
+    board = Board()
+    board.push_san("e4")
+    return EcoClassifier([("B00", "King's Pawn Game")], [board.zobrist()], [0], [1])
+
+
+def test_classify_moves_takes_the_deepest_known_position():
+    assert king_pawn_table().classify_moves(["e4", "a6"]) == {"eco": "B00", "opening": "King's Pawn Game", "ply": 1}
+    assert king_pawn_table().classify_moves(["d4"]) is None
+
+
+def test_classify_moves_rejects_an_illegal_move():
+    # The legal prefix would match; the illegal move must not be silently dropped
+    with pytest.raises(IllegalMoveError):
+        king_pawn_table().classify_moves(["e4", "e4"])
+
+
+def test_classify_endpoint_reports_errors_per_query(server, client, monkeypatch):
+    monkeypatch.setattr(server, "eco_classifier", king_pawn_table())
+
+    response = client.post("/api/eco/classify", json={"positions": [
+        {"moves": ["e4", "Ke3"]},
+        {"fen": "not a fen"},
+        {"moves": ["e4"]},
+    ]})
+
+    assert response.status_code == 200
+    illegal, bad_fen, ok = response.json()["results"]
+    assert illegal["error"].startswith("Illegal move:")
+    assert bad_fen["error"].startswith("Invalid FEN:")
+    assert ok["eco"] == "B00"
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from chessdata.bitboard import STARTING_FEN, Board
+from chessdata.explorer import OpeningTree, build_tree
+
+STUDIES = {
+    "studyAAA1": [("ch1", "C40", "King's Knight Opening", "1. e4 e5 2. Nf3"),
+                  ("ch2", "B20", "Sicilian Defense", "1. e4 c5")],
+    # The second chapter reaches 1. e4 e5 2. Nf3 by another move order
+    "studyBBB2": [("ch1", "C44", "King's Pawn Game", "1. e4 e5 2. Nf3 Nc6"),
+                  ("ch2", "C40", "King's Knight Opening", "1. Nf3 e5 2. e4")],
+}
+
+
+def write_studies(folder, studies):
+    folder.mkdir(exist_ok=True)
+    paths = []
+    for number, (study_id, chapters) in enumerate(studies.items(), 1):
+        path = folder / f"{number:03d}_{study_id}.pgn"
+        path.write_text("".join(
+            f'[Event "{name}"]\n[ECO "{eco}"]\n[Opening "{name}"]\n'
+            f'[ChapterURL "https://lichess.org/study/{study_id}/{chapter_id}"]\n\n{moves} *\n\n'
+            for chapter_id, eco, name, moves in chapters
+        ))
+        paths.append(path)
+    return paths
+
+
+def fen_after(*sans):
+    board = Board()
+    for san in sans:
+        board.push_san(san)
+    return board.fen()
+
+
+@pytest.fixture(scope="module")
+def tree_file(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("studies")
+    paths = write_studies(folder, STUDIES)
+    with open(paths[0], "a") as f:
+        f.write('[Event "Atomic"]\n[Variant "Atomic"]\n\n1. d4 d5 *\n\n')
+    path = folder / "explorer" / "opening_tree.bin"
+    stats = build_tree(paths, path, workers=1)
+    return stats, path
+
+
+def test_build_shares_transposed_nodes(tree_file):
+    stats, path = tree_file
+    tree = OpeningTree(path)
+
+    assert (stats["chapters"], stats["bytes"]) == (4, path.stat().st_size)
+    # start, e4, Nf3, e4 e5, e4 c5, Nf3 e5, e4 e5 Nf3 (shared), ... Nc6
+    assert stats["nodes"] == tree.node_count == 8
+    assert stats["edges"] == 8
+    keys = np.asarray(tree.keys)
+    assert np.all(keys[:-1] < keys[1:])
+    assert tree.node_id(Board(fen_after("e4", "e5", "Nf3")).zobrist()) is not None
+    assert tree.node_id(Board(fen_after("d4")).zobrist()) is None
+
+
+def test_explore_child_stats(tree_file):
+    tree = OpeningTree(tree_file[1])
+
+    start = tree.explore()
+    assert start["occurrences"] == 4
+    assert [(m["san"], m["uci"], m["count"], m["occurrences"]) for m in start["moves"]] == [
+        ("e4", "e2e4", 3, 3), ("Nf3", "g1f3", 1, 1)]
+    assert start["moves"][0]["fen"] == fen_after("e4")
+    assert start["openings"][0] == {"name": "C40 King's Knight Opening", "count": 2}
+    assert sorted((s["study_id"], s["count"]) for s in start["studies"]) == [("studyAAA1", 2), ("studyBBB2", 2)]
+
+    # Two chapters play 2. Nf3 here, but three reach the resulting position
+    node = tree.explore(fen_after("e4", "e5"))
+    assert [(m["san"], m["count"], m["occurrences"]) for m in node["moves"]] == [("Nf3", 2, 3)]
+    assert tree.explore(fen_after("Nf3", "e5"))["moves"][0]["occurrences"] == 3
+    shared = tree.explore(fen_after("e4", "e5", "Nf3"))
+    assert shared["occurrences"] == 3 and [m["san"] for m in shared["moves"]] == ["Nc6"]
+
+
+def test_unknown_positions_and_files(tree_file, tmp_path):
+    tree = OpeningTree(tree_file[1])
+
+    node = tree.explore(fen_after("d4"))
+    assert (node["occurrences"], node["moves"], node["studies"]) == (0, [], [])
+    with pytest.raises(ValueError):
+        tree.explore("not a fen")
+    bad = tmp_path / "bad.bin"
+    bad.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        OpeningTree(bad)
+
+
+def test_max_ply_cuts_the_tree(tmp_path):
+    paths = write_studies(tmp_path / "studies", STUDIES)
+
+    stats = build_tree(paths, tmp_path / "tree.bin", max_ply=1, workers=1)
+
+    tree = OpeningTree(tmp_path / "tree.bin")
+    assert stats["nodes"] == 3
+    assert tree.explore(fen_after("e4"))["moves"] == []
+
+
+def test_explorer_endpoint(tree_file, server, client, monkeypatch):
+    assert client.get("/api/explorer").status_code == 503
+
+    monkeypatch.setattr(server, "opening_tree", OpeningTree(tree_file[1]))
+    response = client.get("/api/explorer")
+
+    assert response.status_code == 200
+    assert response.json()["position"] == Board(STARTING_FEN).epd()
+    assert [m["san"] for m in response.json()["moves"]] == ["e4", "Nf3"]
+    leaf = client.get("/api/explorer", params={"fen": fen_after("e4", "c5")})
+    assert leaf.status_code == 200 and (leaf.json()["occurrences"], leaf.json()["moves"]) == (1, [])
+    assert client.get("/api/explorer", params={"fen": "not a fen"}).status_code == 400
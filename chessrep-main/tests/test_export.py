@@ -0,0 +1,38 @@
+import pytest
+
+from chessdata.export import ParquetExporter, read_table
+
+CSV = "Index,FEN,Answer1,Answer2,CorrectAnswer\n{}\n"
+ROWS = [
+    "1,2r2rk1/1p1qbppp/pBnp1n2/3Np3/Q3P3/5N2/PPP2PPP/R3K2R b KQ - 0 1,Nb8,Qg4,Answer2",
+    "2,2r4k/p1r1p2p/3pQ1p1/8/5R2/PN1qp3/1P4PP/2R1K3 w - - 0 1,g4,Rd1,Answer2",
+]
+
+
+def test_back_to_back_exports_get_their_own_partitions(tmp_path):
+    csv_path = tmp_path / "positions.csv"
+    out = tmp_path / "warehouse"
+    batches = []
+    for row in ROWS:
+        csv_path.write_text(CSV.format(row))
+        batches.append(ParquetExporter(out).export_positions(csv_path)["batch"])
+
+    assert batches[0] != batches[1]
+    table = read_table(out, "positions", columns=["index", "batch"])
+    assert sorted(table.column("index").to_pylist()) == [1, 2]
+    assert sorted(set(table.column("batch").to_pylist())) == batches
+
+
+def test_export_refuses_an_existing_partition(tmp_path):
+    csv_path = tmp_path / "positions.csv"
+    out = tmp_path / "warehouse"
+    csv_path.write_text(CSV.format(ROWS[0]))
+    first = ParquetExporter(out)
+    first.export_positions(csv_path)
+
+    csv_path.write_text(CSV.format(ROWS[1]))
+    second = ParquetExporter(out)
+    second.batch = first.batch
+    with pytest.raises(FileExistsError):
+        second.export_positions(csv_path)
+    assert read_table(out, "positions", columns=["index"]).num_rows == 1
@@ -0,0 +1,21 @@
+import numpy as np
+
+from chessdata.bitboard import STARTING_FEN
+from chessdata.features import decode_planes, pack_planes, position_features, side_to_move
+
+
+def features_of(*fens):
+    return position_features(pack_planes(decode_planes(list(fens))), side_to_move(list(fens)))
+
+
+def test_pawn_shield_counts_the_pawns_in_front_of_the_king():
+    features = features_of(
+        "6k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1",       # f2 g2 h2 / f7 g7 h7
+        STARTING_FEN,
+        "6k1/8/6p1/8/8/5P2/7P/6K1 w - - 0 1",        # f3 h2 / g6: two ranks ahead still count
+        "6k1/8/8/8/8/8/PPP5/6K1 w - - 0 1",          # pawns far from the king
+        "k7/1p6/8/8/8/8/6PP/7K w - - 0 1",           # corner kings: no wrap around the board edge
+    )
+
+    np.testing.assert_array_equal(features["pawn_shield_white"], [3, 3, 2, 0, 2])
+    np.testing.assert_array_equal(features["pawn_shield_black"], [3, 3, 1, 0, 1])
@@ -0,0 +1,85 @@
+import asyncio
+
+from health import InFlightCounter, InFlightMiddleware
+
+
+def test_health_reports_ok_with_pool_and_lag_fields(server, client):
+    response = client.get("/api/health")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok" and body["problems"] == []
+    assert body["mongodb"]["ok"] is True and body["mongodb"]["ping_ms"] >= 0
+    assert set(body["pool"]) >= {"connections_open", "checked_out", "waiting", "avg_wait_ms", "max_wait_ms"}
+    assert set(body["event_loop_lag"]) == {"last_ms", "avg_ms", "max_ms"}
+    assert body["in_flight_requests"]["current"] == 1  # this request
+
+
+def test_health_is_503_without_a_database(server, client):
+    server.db = None
+
+    response = client.get("/api/health")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert "database not initialized" in response.json()["problems"]
+
+
+def test_health_is_degraded_by_a_saturated_pool_or_a_lagging_loop(server, client, monkeypatch):
+    monkeypatch.setattr(server.loop_lag, "_samples", [server.HEALTH_MAX_LOOP_LAG_MS / 1000 * 2])
+    monkeypatch.setattr(server.pool_stats, "checkouts_started",
+                        server.pool_stats.checkouts_started + server.HEALTH_MAX_POOL_WAITERS + 1)
+
+    response = client.get("/api/health")
+
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "degraded"
+    assert set(body["problems"]) == {"event loop lagging", "mongodb pool saturated"}
+    assert body["pool"]["waiting"] > server.HEALTH_MAX_POOL_WAITERS
+
+
+def test_cache_hits_are_counted_in_flight(server, client):
+    before = server.in_flight.snapshot()["total"]
+
+    for _ in range(3):
+        assert client.get("/api/status").status_code == 200
+
+    assert server.in_flight.snapshot()["total"] == before + 3
+    assert server.in_flight.snapshot()["current"] == 0
+
+
+def test_streamed_response_counts_until_its_last_chunk():
+    counter = InFlightCounter()
+    seen = []
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in (b"a", b"b"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        await send({"type": "http.response.trailers"})  # anything after the final chunk
+
+    async def send(message):
+        seen.append((message["type"], counter.current))
+
+    asyncio.run(InFlightMiddleware(streaming_app, counter)({"type": "http"}, None, send))
+
+    assert [current for _, current in seen] == [1, 1, 1, 1, 0]
+    assert counter.snapshot() == {"current": 0, "peak": 1, "total": 1}
+
+
+def test_failed_request_stops_counting():
+    counter = InFlightCounter()
+
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        try:
+            await InFlightMiddleware(failing_app, counter)({"type": "http"}, None, None)
+        except RuntimeError:
+            pass
+
+    asyncio.run(scenario())
+    assert counter.snapshot() == {"current": 0, "peak": 1, "total": 1}
@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import DeleteMany, UpdateOne
+
+from chessdata.importer import CHAPTERS_COLLECTION, STUDIES_COLLECTION, BulkImporter, study_operations
+
+
+class BulkCollection:
+    """mongomock collection with bulk_write replayed as single operations (mongomock's own
+    bulk_write does not accept the operations current pymongo versions build)."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            if isinstance(op, UpdateOne):
+                await self.collection.update_one(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, DeleteMany):
+                await self.collection.delete_many(op._filter)
+            else:
+                raise TypeError(f"unexpected operation {op!r}")
+
+
+class BulkDb:
+    def __init__(self):
+        self.db = AsyncMongoMockClient()["chessrep_test"]
+
+    def __getitem__(self, name):
+        return BulkCollection(self.db[name])
+
+
+def chapter(study_id, chapter_id, name, moves):
+    return (f'[Event "{name}"]\n[StudyName "Study {study_id}"]\n[ChapterName "{name}"]\n'
+            f'[ChapterURL "https://lichess.org/study/{study_id}/{chapter_id}"]\n\n{moves} *\n\n')
+
+
+def write_studies(folder, studies):
+    folder.mkdir(exist_ok=True)
+    paths = []
+    for number, (study_id, chapters) in enumerate(studies.items(), 1):
+        path = folder / f"{number:03d}_{study_id}.pgn"
+        path.write_text("".join(chapter(study_id, *c) for c in chapters))
+        paths.append(path)
+    return paths
+
+
+def run_import(db, paths, **options):
+    importer = BulkImporter(db, workers=2, **options)
+    asyncio.run(importer.run(paths))
+    return importer
+
+
+def chapters_of(db):
+    docs = asyncio.run(db[CHAPTERS_COLLECTION].find({}).sort("_id").to_list(None))
+    return {doc["_id"]: doc for doc in docs}
+
+
+STUDIES = {
+    "studyAAA1": [("ch1", "Italian", "1. e4 e5 2. Nf3 Nc6 3. Bc4"), ("ch2", "Scotch", "1. e4 e5 2. Nf3 Nc6 3. d4")],
+    "studyBBB2": [("ch1", "London", "1. d4 d5 2. Bf4")],
+}
+
+
+def test_import_upserts_studies_and_chapters(tmp_path):
+    db = BulkDb()
+    paths = write_studies(tmp_path / "studies", STUDIES)
+
+    importer = run_import(db, paths)
+
+    assert importer.failed_files == [] and importer.files_done == 2
+    assert (importer.chapters, importer.chapters_written) == (3, 3)
+    studies = asyncio.run(db[STUDIES_COLLECTION].find({}).sort("_id").to_list(None))
+    assert [(s["_id"], s["name"], s["chapter_count"], s["source_file"]) for s in studies] == [
+        ("studyAAA1", "Study studyAAA1", 2, "001_studyAAA1.pgn"),
+        ("studyBBB2", "Study studyBBB2", 1, "002_studyBBB2.pgn"),
+    ]
+    chapters = chapters_of(db)
+    assert list(chapters) == ["studyAAA1:ch1", "studyAAA1:ch2", "studyBBB2:ch1"]
+    assert [m["san"] for m in chapters["studyAAA1:ch2"]["moves"]] == ["e4", "e5", "Nf3", "Nc6", "d4"]
+    assert chapters["studyAAA1:ch2"]["index"] == 1
+
+
+def test_reimport_updates_changed_and_deletes_vanished_chapters(tmp_path):
+    db = BulkDb()
+    run_import(db, write_studies(tmp_path / "studies", STUDIES))
+
+    changed = dict(STUDIES, studyAAA1=[("ch2", "Scotch Gambit", "1. e4 e5 2. Nf3 Nc6 3. d4 exd4 4. Bc4")])
+    importer = run_import(db, write_studies(tmp_path / "studies", changed))
+
+    assert importer.failed_files == []
+    chapters = chapters_of(db)
+    assert list(chapters) == ["studyAAA1:ch2", "studyBBB2:ch1"]
+    assert chapters["studyAAA1:ch2"]["name"] == "Scotch Gambit"
+    assert chapters["studyAAA1:ch2"]["index"] == 0
+    assert asyncio.run(db[STUDIES_COLLECTION].find_one({"_id": "studyAAA1"}))["chapter_count"] == 1
+
+
+def test_upserts_never_set_the_id():
+    parsed = {
+        "study": {"_id": "s", "name": "S", "chapter_count": 1, "source_file": "001_s.pgn"},
+        "chapters": [{"_id": "s:c", "study_id": "s", "chapter_id": "c", "index": 0}],
+        "chapter_ids": ["s:c"],
+    }
+
+    study_op, chapter_ops = study_operations(parsed, datetime(2026, 1, 1))
+
+    for op in [study_op, chapter_ops[0]]:
+        assert "_id" in op._filter and "_id" not in op._doc["$set"]
+    assert study_op._doc["$set"]["imported_at"] == datetime(2026, 1, 1)
+
+
+def test_writers_drain_a_bounded_queue(tmp_path, monkeypatch):
+    sizes = []
+
+    class RecordingQueue(asyncio.Queue):
+        def _put(self, item):
+            super()._put(item)
+            sizes.append((self.qsize(), self.maxsize))
+
+    monkeypatch.setattr(asyncio, "Queue", RecordingQueue)
+    studies = {f"study{n:04d}": [(f"ch{i}", f"Line {i}", "1. e4 e5") for i in range(5)] for n in range(6)}
+    db = BulkDb()
+
+    importer = run_import(db, write_studies(tmp_path / "studies", studies), queue_size=3, batch_size=2, writers=2)
+
+    assert importer.failed_files == []
+    assert len(chapters_of(db)) == 30
+    # Producers waited for the writers instead of growing the queue
+    assert max(size for size, _ in sizes) == 3
+    assert all(size <= maxsize for size, maxsize in sizes)
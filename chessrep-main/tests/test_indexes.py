@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+import indexes
+from indexes import TTL_INDEX_NAME, _ensure_ttl_index, check_query_plan, ensure_indexes
+
+
+def index_names(db):
+    return set(asyncio.run(db.status_checks.index_information()))
+
+
+def test_retention_is_off_by_default():
+    assert indexes.STATUS_RETENTION_DAYS == 0
+    assert indexes.TTL_INDEXES["status_checks"] == ("timestamp", 0)
+
+
+def test_ensure_indexes_creates_the_keyset_index_without_ttl():
+    db = AsyncMongoMockClient()["chessrep_test"]
+
+    asyncio.run(ensure_indexes(db))
+
+    assert index_names(db) == {"_id_", "timestamp_id"}
+
+
+def test_ttl_index_follows_the_retention_setting(monkeypatch):
+    db = AsyncMongoMockClient()["chessrep_test"]
+
+    monkeypatch.setitem(indexes.TTL_INDEXES, "status_checks", ("timestamp", 30 * 86400))
+    asyncio.run(ensure_indexes(db))
+    ttl = asyncio.run(db.status_checks.index_information())[TTL_INDEX_NAME]
+    assert ttl["expireAfterSeconds"] == 30 * 86400
+
+    # Back to 0: retention switched off again
+    monkeypatch.setitem(indexes.TTL_INDEXES, "status_checks", ("timestamp", 0))
+    asyncio.run(ensure_indexes(db))
+    assert index_names(db) == {"_id_", "timestamp_id"}
+
+
+class ConflictingCollection:
+    async def create_index(self, keys, **options):
+        raise OperationFailure("Index with name: timestamp_ttl already exists with different options", code=85)
+
+
+class StubDb:
+    def __init__(self, collection):
+        self.collection = collection
+        self.commands = []
+
+    def __getitem__(self, name):
+        return self.collection
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+def test_changed_retention_updates_the_ttl_index_in_place():
+    db = StubDb(ConflictingCollection())
+
+    asyncio.run(_ensure_ttl_index(db, "status_checks", "timestamp", 7 * 86400))
+
+    assert db.commands == [(("collMod", "status_checks"),
+                            {"index": {"name": TTL_INDEX_NAME, "expireAfterSeconds": 7 * 86400}})]
+
+
+def test_index_failure_is_logged_and_does_not_stop_startup(monkeypatch, caplog):
+    class FailingCollection(ConflictingCollection):
+        async def create_indexes(self, models):
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+
+    db = StubDb(FailingCollection())
+    monkeypatch.setitem(indexes.TTL_INDEXES, "status_checks", ("timestamp", 86400))
+
+    with caplog.at_level(logging.ERROR, logger="indexes"):
+        asyncio.run(ensure_indexes(db))
+
+    assert "Failed to create indexes on status_checks" in caplog.text
+    assert db.commands  # the TTL step still ran
+
+
+class ExplainedCursor:
+    def __init__(self, plan=None, error=None):
+        self.plan = plan
+        self.error = error
+        self.explained = 0
+
+    async def explain(self):
+        self.explained += 1
+        if self.error is not None:
+            raise self.error
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+COLLSCAN = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+IXSCAN = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+
+
+def test_query_plan_is_only_explained_in_debug_mode(monkeypatch):
+    monkeypatch.setattr(indexes, "_explained_shapes", set())
+    cursor = ExplainedCursor(COLLSCAN)
+
+    asyncio.run(check_query_plan("GET /api/status", cursor, {}))
+
+    assert cursor.explained == 0
+
+
+def test_collscan_is_reported_once_per_query_shape(monkeypatch, caplog):
+    monkeypatch.setattr(indexes, "QUERY_EXPLAIN_DEBUG", True)
+    monkeypatch.setattr(indexes, "_explained_shapes", set())
+    scan, indexed = ExplainedCursor(COLLSCAN), ExplainedCursor(IXSCAN)
+
+    with caplog.at_level(logging.WARNING, logger="indexes"):
+        asyncio.run(check_query_plan("GET /api/status", scan, {"client_name": "x"}))
+        asyncio.run(check_query_plan("GET /api/status", scan, {"client_name": "y"}))
+        asyncio.run(check_query_plan("GET /api/status", indexed, {"$or": []}))
+        asyncio.run(check_query_plan("GET /api/status/stream", ExplainedCursor(error=RuntimeError("no")), {}))
+
+    assert scan.explained == 1 and indexed.explained == 1
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert warnings == ["Query for GET /api/status does a COLLSCAN (filter keys: ['client_name']); add an index"]
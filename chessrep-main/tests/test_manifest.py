@@ -0,0 +1,77 @@
+import asyncio
+
+from chessdata.importer import BulkImporter, study_id_from_filename
+from chessdata.manifest import StudyManifest, default_manifest_path, sha256_file
+from tests.test_importer import STUDIES, BulkDb, chapters_of, write_studies
+
+
+def run_import(db, paths, manifest):
+    importer = BulkImporter(db, workers=2, manifest=manifest)
+    asyncio.run(importer.run(paths))
+    manifest.save()
+    return importer
+
+
+def test_download_records_and_conditional_headers(tmp_path):
+    manifest = StudyManifest(tmp_path / "studies.manifest.json")
+
+    assert manifest.record_download("abc", "001_abc.pgn", "h1", 10, etag='"v1"', last_modified="Mon, 01 Jan 2026")
+    assert manifest.get("abc")["import_status"] == "pending"
+    manifest.update("abc", import_status="imported")
+    # Same content again: not a change, the import status stays
+    assert not manifest.record_download("abc", "001_abc.pgn", "h1", 10, etag='"v1"')
+    assert manifest.get("abc")["import_status"] == "imported"
+    assert manifest.conditional_headers("abc") == {"If-None-Match": '"v1"'}
+    manifest.save()
+
+    reloaded = StudyManifest(tmp_path / "studies.manifest.json")
+    assert reloaded.get("abc")["sha256"] == "h1"
+    assert default_manifest_path(tmp_path / "studies") == tmp_path / "studies.manifest.json"
+
+
+def test_unchanged_files_are_skipped_and_changed_ones_reimported(tmp_path):
+    db = BulkDb()
+    folder = tmp_path / "studies"
+    manifest = StudyManifest(default_manifest_path(folder))
+    paths = write_studies(folder, STUDIES)
+
+    first = run_import(db, paths, manifest)
+    assert (first.files_unchanged, first.chapters_written) == (0, 3)
+    entry = manifest.get("studyAAA1")
+    assert entry["import_status"] == "imported" and entry["imported_sha256"] == sha256_file(paths[0])
+    assert set(entry["chapter_hashes"]) == {"ch1", "ch2"}
+
+    manifest = StudyManifest(default_manifest_path(folder))
+    second = run_import(db, paths, manifest)
+    assert (second.files_done, second.files_unchanged, second.chapters_written, second.operations) == (2, 2, 0, 0)
+
+    # One chapter of one study changes: only that chapter is written again
+    changed = dict(STUDIES, studyAAA1=[STUDIES["studyAAA1"][0], ("ch2", "Scotch", "1. e4 e5 2. Nf3 Nc6 3. d4 exd4")])
+    paths = write_studies(folder, changed)
+    manifest = StudyManifest(default_manifest_path(folder))
+    third = run_import(db, paths, manifest)
+    assert (third.files_unchanged, third.chapters, third.chapters_written) == (1, 2, 1)
+    assert len(chapters_of(db)["studyAAA1:ch2"]["moves"]) == 6
+    assert manifest.get("studyAAA1")["imported_sha256"] == sha256_file(paths[0])
+
+
+def test_deleted_files_are_dropped(tmp_path):
+    db = BulkDb()
+    folder = tmp_path / "studies"
+    manifest = StudyManifest(default_manifest_path(folder))
+    paths = write_studies(folder, STUDIES)
+    run_import(db, paths, manifest)
+
+    paths[1].unlink()
+    remaining = sorted(folder.glob("*.pgn"))
+    manifest = StudyManifest(default_manifest_path(folder))
+    assert manifest.prune(study_id_from_filename(p) for p in remaining) == ["studyBBB2"]
+    manifest.save()
+
+    manifest = StudyManifest(default_manifest_path(folder))
+    assert set(manifest.studies) == {"studyAAA1"}
+    assert manifest.prune(["studyAAA1"]) == []
+    # The file comes back: imported as a new study, not skipped as unchanged
+    paths = write_studies(folder, STUDIES)
+    again = run_import(db, paths, manifest)
+    assert (again.files_unchanged, again.chapters_written) == (1, 1)
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from metrics import MongoCommandMetrics, PrometheusMiddleware, route_path
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def command_events(name, command, request_id):
+    common = dict(command_name=name, connection_id=("localhost", 27017), request_id=request_id)
+    return SimpleNamespace(command=command, **common), SimpleNamespace(duration_micros=1500, **common)
+
+
+def test_mongo_commands_are_timed_per_collection():
+    listener = MongoCommandMetrics()
+    labels = dict(collection="status_checks", outcome="success")
+    find_before = sample("mongodb_command_duration_seconds_count", command="find", **labels)
+    more_before = sample("mongodb_command_duration_seconds_count", command="getMore", **labels)
+
+    started, done = command_events("find", {"find": "status_checks", "filter": {}}, 1)
+    listener.started(started)
+    listener.succeeded(done)
+    # getMore's command value is the cursor id; the collection is a separate field
+    started, done = command_events("getMore", {"getMore": 1234567890, "collection": "status_checks"}, 2)
+    listener.started(started)
+    listener.succeeded(done)
+
+    assert sample("mongodb_command_duration_seconds_count", command="find", **labels) == find_before + 1
+    assert sample("mongodb_command_duration_seconds_count", command="getMore", **labels) == more_before + 1
+    assert sample("mongodb_command_duration_seconds_count", command="getMore", collection="", outcome="success") == 0
+
+
+def test_ignored_and_failed_commands():
+    listener = MongoCommandMetrics()
+    failed_before = sample("mongodb_command_duration_seconds_count",
+                           command="insert", collection="status_checks", outcome="failure")
+
+    started, done = command_events("hello", {"hello": 1}, 3)
+    listener.started(started)
+    listener.succeeded(done)
+    started, done = command_events("insert", {"insert": "status_checks", "documents": []}, 4)
+    listener.started(started)
+    listener.failed(done)
+
+    assert sample("mongodb_command_duration_seconds_count", command="hello", collection="", outcome="success") == 0
+    assert sample("mongodb_command_duration_seconds_count",
+                  command="insert", collection="status_checks", outcome="failure") == failed_before + 1
+
+
+def test_metrics_endpoint_exposes_request_metrics(client):
+    labels = dict(method="GET", route="/api/status", status="200")
+    before = sample("http_requests_total", **labels)
+
+    assert client.get("/api/status").status_code == 200
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert sample("http_requests_total", **labels) == before + 1
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/api/status",status="200"}' in text
+    assert 'http_request_duration_seconds_bucket{le="0.001",method="GET",route="/api/status"}' in text
+    assert "http_requests_in_progress" in text
+    # The scrape itself is not measured
+    assert 'route="/metrics"' not in text
+
+
+def test_cache_hits_keep_their_route_label(client):
+    labels = dict(method="GET", route="/api/status", status="200")
+    before = sample("http_requests_total", **labels)
+    unmatched = sample("http_requests_total", method="GET", route="unmatched", status="200")
+
+    for _ in range(3):
+        assert client.get("/api/status").status_code == 200
+
+    # The second and third are served by the response cache, before the router runs
+    assert sample("http_requests_total", **labels) == before + 3
+    assert sample("http_requests_total", method="GET", route="unmatched", status="200") == unmatched
+
+
+def test_route_path_matches_routes_the_router_never_saw(server):
+    def scope(method, path):
+        return {"type": "http", "method": method, "path": path, "root_path": "", "app": server.app}
+
+    assert route_path(scope("GET", "/api/studies/abc123/pgn")) == "/api/studies/{study_id}/pgn"
+    assert route_path(scope("DELETE", "/api/status")) == "/api/status"
+    assert route_path(scope("GET", "/no/such/page")) is None
+
+
+def test_shed_requests_keep_their_route_label(server):
+    async def shed(scope, receive, send):
+        # What admission control does: answer before the router runs
+        await send({"type": "http.response.start", "status": 429, "headers": []})
+        await send({"type": "http.response.body", "body": b"busy"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    labels = dict(method="GET", route="/api/status", status="429")
+    before = sample("http_requests_total", **labels)
+    scope = {"type": "http", "method": "GET", "path": "/api/status", "root_path": "", "app": server.app}
+
+    asyncio.run(PrometheusMiddleware(shed)(scope, receive, send))
+
+    assert sample("http_requests_total", **labels) == before + 1
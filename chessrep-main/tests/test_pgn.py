@@ -0,0 +1,62 @@
+from chessdata.pgn import parse_pgn
+
+
+def sans(line):
+    return [move.san for move in line]
+
+
+def test_mainline_variations_and_comments():
+    [chapter] = parse_pgn('[Event "t"]\n\n{Intro} 1. e4 {best} (1. d4 d5) 1... e5 $1 2. Nf3 *')
+    assert chapter.comment == "Intro"
+    assert sans(chapter.moves) == ["e4", "e5", "Nf3"]
+    assert chapter.moves[0].comment == "best"
+    assert sans(chapter.moves[0].variations[0]) == ["d4", "d5"]
+    assert chapter.moves[1].nags == [1]
+
+
+def test_nags_and_comment_before_first_variation_move_are_kept():
+    [chapter] = parse_pgn("1. e4 ( $140 {Also} {[%cal Gd2d4]} 1. d4 ) 1... e5 *")
+    first = chapter.moves[0].variations[0][0]
+    assert first.san == "d4"
+    assert first.nags_before == [140]
+    assert first.comment_before == "Also"
+    assert first.annotations == {"cal": "Gd2d4"}
+    assert first.nags == []
+
+
+def test_nag_before_first_mainline_move_is_kept():
+    [chapter] = parse_pgn("$10 1. e4 e5 *")
+    assert chapter.moves[0].nags_before == [10]
+
+
+def test_variation_before_first_mainline_move_becomes_its_alternative():
+    [chapter] = parse_pgn("( 1. d4 d5 ) 1. e4 e5 *")
+    assert sans(chapter.moves) == ["e4", "e5"]
+    assert [sans(line) for line in chapter.moves[0].variations] == [["d4", "d5"]]
+
+
+def test_variation_before_first_move_of_a_variation():
+    [chapter] = parse_pgn("1. e4 ( {Or} ( 1. c4 ) 1. d4 ) 1... e5 *")
+    first = chapter.moves[0].variations[0][0]
+    assert first.san == "d4" and first.comment_before == "Or"
+    assert [sans(line) for line in first.variations] == [["c4"]]
+
+
+def test_chapter_with_only_a_variation_keeps_its_moves():
+    [chapter] = parse_pgn("( 1. d4 d5 ) ( 1. c4 ) *")
+    assert sans(chapter.moves) == ["d4", "d5"]
+    assert [sans(line) for line in chapter.moves[0].variations] == [["c4"]]
+
+
+def test_indented_header_lines_are_headers():
+    text = '  [Event "First"]\n\t[Site "https://lichess.org/study/abc/def"]\n\n1. e4 e5\n  [Event "Second"]\n1. d4 *'
+    first, second = parse_pgn(text)
+    assert first.headers == {"Event": "First", "Site": "https://lichess.org/study/abc/def"}
+    assert sans(first.moves) == ["e4", "e5"]
+    assert second.headers == {"Event": "Second"} and sans(second.moves) == ["d4"]
+
+
+def test_bracket_inside_comment_is_not_a_header():
+    [chapter] = parse_pgn('[Event "t"]\n\n1. e4 {see\n [Event "not a header"]\n} e5 *')
+    assert chapter.headers == {"Event": "t"}
+    assert '[Event "not a header"]' in chapter.moves[0].comment
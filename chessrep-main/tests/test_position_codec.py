@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from chessdata.bitboard import STARTING_FEN, Board
+from chessdata.features import bitboards, decode_planes, pack_planes
+from chessdata.position_codec import (
+    KEY_SIZE, RECORD_SIZE, decode, decode_fen, encode, encode_fen, encode_key, key_bitboards, key_of, piece_count,
+)
+from chessdata.position_table import PositionCollision, PositionTable, _add, build_table
+from tests.test_importer import write_studies
+
+FENS = [
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3",
+    "8/2k5/8/8/8/8/5K2/8 b - - 49 120",
+    "r3k3/1P6/8/8/8/8/8/4K2R w Kq - 3 40",
+]
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_round_trip(fen):
+    data = encode_fen(fen)
+
+    assert len(data) == RECORD_SIZE and len(key_of(data)) == KEY_SIZE
+    assert decode_fen(data) == fen
+    assert decode(data).zobrist() == Board(fen).zobrist()
+    # The key alone drops the move counters
+    assert decode_fen(key_of(data)) == fen.rsplit(" ", 2)[0] + " 0 1"
+    assert piece_count(data) == sum(c.isalpha() for c in fen.split()[0])
+
+
+def test_equal_positions_encode_to_equal_keys():
+    # No black pawn can take on e3: the en passant square is not part of the position
+    without_capture = "4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1"
+    assert encode_key(Board(without_capture)) == encode_key(Board(without_capture.replace(" e3 ", " - ")))
+    assert decode_fen(encode_key(Board(without_capture))).split()[3] == "-"
+    # With a capture available it is
+    with_capture = "4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1"
+    assert encode_key(Board(with_capture)) != encode_key(Board(with_capture.replace(" e3 ", " - ")))
+    assert decode_fen(encode_key(Board(with_capture))).split()[3] == "e3"
+    # Castling rights the placement contradicts are dropped before encoding
+    assert encode_key(Board("4k3/8/8/8/8/8/8/4K3 w KQkq - 0 1")) == encode_key(Board("4k3/8/8/8/8/8/8/4K3 w - - 0 1"))
+
+
+def test_at_most_32_pieces():
+    assert piece_count(encode_fen(STARTING_FEN)) == 32
+
+    with pytest.raises(ValueError, match="more than 32 pieces"):
+        encode(Board("rnbqkbnr/pppppppp/8/8/4Q3/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"))
+    with pytest.raises(ValueError):
+        decode_fen(b"\0" * 10)
+
+
+def test_key_bitboards_match_the_feature_planes():
+    keys = np.frombuffer(b"".join(encode_key(Board(fen)) for fen in FENS), dtype=np.uint8).reshape(-1, KEY_SIZE)
+
+    boards = key_bitboards(keys)
+
+    assert boards.shape == (len(FENS), 12) and boards.dtype == np.uint64
+    np.testing.assert_array_equal(boards, bitboards(pack_planes(decode_planes(FENS))))
+    for fen, row in zip(FENS, boards):
+        assert [int(bb) for bb in row] == Board(fen).pieces
+
+
+def test_distinct_positions_under_one_id_are_rejected(tmp_path, monkeypatch):
+    table = {}
+    _add(table, 1, encode_key(Board()))
+    _add(table, 1, encode_key(Board()))
+    with pytest.raises(PositionCollision, match="two positions share id 0000000000000001"):
+        _add(table, 1, encode_key(Board(FENS[1])))
+
+    csv_path = tmp_path / "positions.csv"
+    csv_path.write_text("Index,FEN,Answer1,Answer2,CorrectAnswer\n"
+                        f"1,{FENS[0]},e4,d4,Answer1\n2,{FENS[3]},Kd6,Kb6,Answer2\n")
+    monkeypatch.setattr(Board, "zobrist", lambda self: 7)
+    with pytest.raises(PositionCollision):
+        build_table(csv_path, [], tmp_path / "table", workers=1)
+
+
+def test_table_stores_each_position_once(tmp_path):
+    csv_path = tmp_path / "positions.csv"
+    after_e4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    csv_path.write_text("Index,FEN,Answer1,Answer2,CorrectAnswer\n"
+                        f"10,{after_e4},e5,c5,Answer1\n11,{FENS[3]},Kd6,Kb6,Answer2\n12,not a fen,a,b,Answer1\n")
+    paths = write_studies(tmp_path / "studies", {"studyAAA1": [("ch1", "Open", "1. e4 e5"), ("ch2", "Closed", "1. d4")]})
+
+    stats = build_table(csv_path, paths, tmp_path / "table", workers=1)
+
+    table = PositionTable(tmp_path / "table")
+    # start, e4, e4 e5, d4 and the king ending; start and e4 are shared
+    assert (stats["positions"], stats["references"], stats["puzzles"], stats["chapters"]) == (5, 7, 2, 2)
+    assert len(table) == 5 and list(table.ids) == sorted(table.ids)
+    assert table.puzzle_fen(11) == FENS[3] and table.puzzle_fen(12) is None
+    e4 = Board(after_e4).zobrist()
+    assert table.fen(e4) == after_e4 and table.board(e4).zobrist() == e4
+    assert table.fen(12345) is None
+    assert [ply for ply, _ in table.chapter_positions("studyAAA1:ch1")] == [0, 1, 2]
+    after_d4 = "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1"
+    assert table.chapter_positions("studyAAA1:ch2") == [(0, Board().zobrist()), (1, Board(after_d4).zobrist())]
+    references = table.references(table.row(e4))
+    assert references["puzzles"] == [10]
+    assert [(c["chapter_id"], c["ply"]) for c in references["chapters"]] == [("studyAAA1:ch1", 1)]
+
+
+def test_puzzle_rows_resolve_every_id_exactly(tmp_path):
+    # Zobrist keys on both sides of 2**63: none may lose precision on the way to a row
+    fens = ["4k3/pppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1", "4k3/pppppppp/8/8/4P3/8/PPPP1PPP/4K3 b - - 0 1",
+            "4k3/1ppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1", "4k3/pppppppp/8/8/8/8/PPPPPPPP/3QK3 w - - 0 1",
+            "4k3/8/8/8/8/8/8/R3K3 w - - 0 1"]
+    assert len({Board(fen).zobrist() >= 1 << 63 for fen in fens}) == 2
+    csv_path = tmp_path / "positions.csv"
+    csv_path.write_text("Index,FEN,Answer1,Answer2,CorrectAnswer\n" + "".join(
+        f"{i},{fen},a,b,Answer1\n" for i, fen in enumerate(fens, start=1)))
+
+    build_table(csv_path, [], tmp_path / "table", workers=1)
+
+    table = PositionTable(tmp_path / "table")
+    for i, fen in enumerate(fens, start=1):
+        assert table.puzzle_fen(i) == fen
+        assert table.references(table.row(Board(fen).zobrist()))["puzzles"] == [i]
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from chessdata.bitboard import STARTING_FEN, Board
+from chessdata.position_index import PositionIndex, build_index
+from tests.test_importer import write_studies
+
+# The French reached by two move orders; the first chapter also has a sideline
+STUDIES = {
+    "studyFR01": [
+        ("french", "French", "1. e4 e6 2. d4 (2. d3 d5) 2... d5 3. Nc3"),
+        ("queens", "Queen's pawn", "1. d4 d5 2. e4 e6"),
+    ],
+}
+FRENCH = "rnbqkbnr/ppp2ppp/4p3/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3"
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("studies")
+    paths = write_studies(folder, STUDIES)
+    with open(paths[0], "a") as f:
+        f.write('[Event "Atomic"]\n[Variant "Atomic"]\n[ChapterURL "https://lichess.org/study/studyFR01/atomic"]\n\n'
+                "1. e4 d5 *\n\n")
+    out = folder / "index"
+    stats = build_index(paths, out, workers=1)
+    return stats, out
+
+
+def test_build_writes_sorted_key_chapter_rows(index):
+    stats, out = index
+    position_index = PositionIndex(out)
+
+    assert (stats["chapters"], stats["skipped_chapters"], stats["errors"]) == (2, 1, 0)
+    # Start, five mainline and two sideline positions, then start and four moves
+    assert stats["positions"] == 13
+    assert [c["id"] for c in position_index.chapters] == ["studyFR01:french", "studyFR01:queens"]
+    hashes = np.asarray(position_index.hashes)
+    assert np.all(hashes[:-1] <= hashes[1:])
+    # One row per (key, chapter); the start and the French are in both chapters
+    assert (stats["entries"], stats["unique_positions"]) == (13, 11)
+    assert PositionIndex.exists(out) and not PositionIndex.exists(out.parent)
+
+
+def test_transpositions_find_both_chapters(index):
+    position_index = PositionIndex(index[1])
+
+    result = position_index.lookup(FRENCH)
+
+    assert result["total"] == 2 and result["key"] == f"{Board(FRENCH).zobrist():016x}"
+    assert [(c["id"], c["ply"]) for c in result["chapters"]] == [("studyFR01:french", 4), ("studyFR01:queens", 4)]
+    # Move counters are not part of the key
+    assert position_index.lookup(FRENCH.replace(" 0 3", " 7 40"))["total"] == 2
+
+
+def test_lookup_of_sidelines_limits_and_unknown_positions(index):
+    position_index = PositionIndex(index[1])
+    board = Board()
+    for san in ["e4", "e6", "d3"]:
+        board.push_san(san)
+
+    assert [c["id"] for c in position_index.lookup(board.fen())["chapters"]] == ["studyFR01:french"]
+    start = position_index.lookup(STARTING_FEN, limit=1)
+    assert start["total"] == 2 and len(start["chapters"]) == 1 and start["chapters"][0]["ply"] == 0
+    # Only the Atomic chapter plays 1... d5 after 1. e4, and it is not indexed
+    board = Board()
+    board.push_san("e4")
+    board.push_san("d5")
+    unknown = position_index.lookup(board.fen())
+    assert (unknown["total"], unknown["chapters"]) == (0, [])
+
+
+def test_studies_by_position_endpoint(index, server, client, monkeypatch):
+    assert client.get("/api/studies/by-position", params={"fen": FRENCH}).status_code == 503
+
+    monkeypatch.setattr(server, "position_index", PositionIndex(index[1]))
+    response = client.get("/api/studies/by-position", params={"fen": FRENCH, "limit": 1})
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 2 and len(response.json()["chapters"]) == 1
+    assert client.get("/api/studies/by-position", params={"fen": "not a fen"}).status_code == 400
@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+
+from chessdata.positions import PositionStore
+
+ROWS = [
+    (1, "6k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1", "Kf1", "Kh1", False, 0, 8, 0),
+    (2, "6k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1", "Kf8", "Kh8", True, 1, 8, 0),
+]
+
+
+def features(score):
+    return {
+        "meta_version": np.asarray("v1"),
+        "difficulty": np.array(score, dtype=np.uint8),
+        "phase": np.array([1, 1], dtype=np.uint8),
+        "correct_capture": np.array([0, 1], dtype=np.uint8),
+        "correct_check": np.array([0, 0], dtype=np.uint8),
+    }
+
+
+def test_seeded_batch_etag_follows_the_attached_features(server, client, monkeypatch):
+    store = PositionStore(ROWS, "v1")
+    monkeypatch.setattr(server, "position_store", store)
+
+    def etag():
+        response = client.get("/api/positions", params={"n": 2, "seed": 7})
+        assert response.status_code == 200
+        return response.headers["etag"]
+
+    without = etag()
+    assert store.attach_features(features([10, 90]))
+    first = etag()
+    assert store.attach_features(features([10, 90]))
+    assert etag() == first
+    # Rebuilt features (same CSV version) must not revalidate batches cached under the old scores
+    assert store.attach_features(features([90, 10]))
+    assert len({without, first, etag()}) == 3
+
+
+CSV = """Index,FEN,Answer1,Answer2,CorrectAnswer
+1,6k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1,Kf1,Kh1,Answer1
+2,6k1/5ppp/8/8/8/8/5PPP/6KQ b - - 0 1,Kf8,Kh8,Answer2
+3,6k1/8/8/8/8/8/8/4K2R w - - 0 1,Rh8+,Kf2,Answer1
+4,r5k1/8/8/8/8/8/8/6K1 w - - 0 1,Kg2,Kf2,Answer2
+5,rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1,e5,c5,Answer1
+6,rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2,Nf3,Bc4,Answer2
+7,8/8/8/8/8/8/8/8 w - - 0 1,,,Answer1
+"""
+
+
+def load(tmp_path):
+    path = tmp_path / "positions.csv"
+    path.write_text(CSV)
+    return PositionStore.load(path)
+
+
+def test_load_skips_incomplete_rows_and_buckets_material(tmp_path):
+    store = load(tmp_path)
+
+    assert len(store) == 6 and len(store.version) == 16
+    assert list(store.side) == [0, 1, 0, 0, 1, 0]
+    assert [int(p) for p in store.pieces] == [8, 9, 3, 3, 32, 32]
+    # From the side to move: black to move with a queen down is behind
+    assert [int(b) for b in store.balance] == [0, -9, 5, -5, 0, 0]
+    rows = store.rows(np.array([1]))
+    assert rows == [{"fen": "6k1/5ppp/8/8/8/8/5PPP/6KQ b - - 0 1", "answer1": "Kf8", "answer2": "Kh8",
+                     "correctAnswer": "Answer2", "correctMove": "Kh8", "difficulty": "intermediate",
+                     "pieceCount": 9, "puzzleId": "2"}]
+
+
+def test_side_difficulty_and_balance_filters(tmp_path):
+    store = load(tmp_path)
+
+    def ids(**filters):
+        return sorted(int(store.index[i]) for i in store.sample(10, 0, **filters)[0])
+
+    assert ids(side="b") == [2, 5]
+    assert ids(difficulty="beginner") == [3, 4]
+    assert ids(difficulty="expert", side="w") == [6]
+    assert ids(balance="ahead") == [3]
+    assert ids(balance="behind") == [2, 4]
+    assert ids(balance="equal", difficulty="intermediate") == [1]
+    assert store.sample(10, 0, difficulty="advanced")[1] == 0
+
+
+def test_same_seed_same_batch(tmp_path):
+    store = load(tmp_path)
+
+    first, total = store.sample(3, 42)
+    again, _ = store.sample(3, 42)
+
+    assert total == 6 and len(set(first.tolist())) == 3
+    assert first.tolist() == again.tolist()
+    assert any(store.sample(3, seed)[0].tolist() != first.tolist() for seed in range(1, 10))
+
+
+def test_feature_filters(tmp_path):
+    store = load(tmp_path)
+    with pytest.raises(ValueError):
+        store.mask(phase="endgame")
+    assert not store.attach_features(dict(features([1, 2]), meta_version=np.asarray(store.version)))
+
+    attached = {
+        "meta_version": np.asarray(store.version),
+        "difficulty": np.array([10, 20, 30, 40, 50, 60], dtype=np.uint8),
+        "phase": np.array([1, 1, 1, 1, 0, 0], dtype=np.uint8),
+        "correct_capture": np.array([0, 0, 0, 0, 0, 1], dtype=np.uint8),
+        "correct_check": np.array([0, 0, 1, 0, 0, 0], dtype=np.uint8),
+    }
+    assert store.attach_features(attached)
+
+    assert list(np.flatnonzero(store.mask(min_score=20, max_score=40))) == [1, 2, 3]
+    assert list(np.flatnonzero(store.mask(phase="middlegame"))) == [4, 5]
+    assert list(np.flatnonzero(store.mask(forcing=True, phase="endgame"))) == [2]
+    assert store.rows(np.array([5]))[0]["score"] == 60
+
+
+@pytest.fixture
+def positions(tmp_path, server, monkeypatch):
+    store = load(tmp_path)
+    monkeypatch.setattr(server, "position_store", store)
+    return store
+
+
+def test_positions_endpoint_filters(positions, client):
+    response = client.get("/api/positions", params={"n": 5, "side": "b", "seed": 1})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["seed"], body["total"]) == (1, 2)
+    assert sorted(p["puzzleId"] for p in body["positions"]) == ["2", "5"]
+    assert client.get("/api/positions", params={"difficulty": "grandmaster"}).status_code == 422
+    assert client.get("/api/positions", params={"balance": "behind", "seed": 1}).json()["total"] == 2
+
+
+def test_seeded_batches_are_cacheable(positions, client):
+    params = {"n": 3, "seed": 9, "difficulty": "expert"}
+    first = client.get("/api/positions", params=params)
+    second = client.get("/api/positions", params=params)
+
+    assert first.json() == second.json()
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    revalidated = client.get("/api/positions", params=params, headers={"If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    other = client.get("/api/positions", params=dict(params, seed=10))
+    assert other.headers["etag"] != first.headers["etag"]
+
+
+def test_unseeded_batches_echo_their_seed_and_are_not_stored(positions, client):
+    response = client.get("/api/positions", params={"n": 6})
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    seed = response.json()["seed"]
+    replay = client.get("/api/positions", params={"n": 6, "seed": seed})
+    assert replay.json()["positions"] == response.json()["positions"]
+    # An unseeded request never revalidates, even with a matching ETag
+    again = client.get("/api/positions", params={"n": 6}, headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 200
+
+
+def test_feature_filters_need_the_features_file(positions, client):
+    for params in ({"min_score": 50}, {"phase": "endgame"}, {"forcing": "true"}):
+        response = client.get("/api/positions", params=params)
+        assert response.status_code == 400
+        assert "features" in response.json()["detail"]
+    assert client.get("/api/positions").status_code == 200
+
+
+def test_positions_endpoint_without_dataset(server, client):
+    assert client.get("/api/positions").status_code == 503
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import RedisCacheBackend, ResponseCache, ResponseCacheMiddleware
+
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis that RedisCacheBackend uses, in memory."""
+
+    def __init__(self):
+        self.values = {}   # key -> (value, expires_at or None)
+        self.sets = {}
+
+    def _live(self, key):
+        entry = self.values.get(key)
+        if entry and entry[1] is not None and entry[1] < time.monotonic():
+            del self.values[key]
+            return None
+        return entry
+
+    async def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key, value, px=None):
+        self.values[key] = (value, time.monotonic() + px / 1000 if px else None)
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    async def pexpire(self, key, ms):
+        return key in self.sets
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    import redis.asyncio
+
+    fake = FakeRedis()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url: fake)
+    return fake
+
+
+def test_redis_backend_round_trip_and_invalidation(fake_redis):
+    async def scenario():
+        cache = ResponseCache(RedisCacheBackend("redis://fake"), ttl=5)
+        key = cache.make_key("/api/status", b"limit=2")
+        await cache.store("status_checks", key, 200, [(b"content-type", b"application/json")], b"[]")
+        assert await cache.lookup(key) == (200, [(b"content-type", b"application/json")], b"[]")
+        await cache.invalidate("status_checks")
+        assert await cache.lookup(key) is None
+        assert fake_redis.values == {} and fake_redis.sets == {}
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["backend"] == "redis"
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (1, 1, 0)
+
+
+def test_miss_racing_with_a_write_is_not_stored(fake_redis):
+    """A response computed before an invalidation must not be cached after it."""
+    cache = ResponseCache(RedisCacheBackend("redis://fake"), ttl=5)
+
+    async def app(scope, receive, send):
+        # The write lands while this (pre-write) response is being produced
+        await cache.invalidate("status_checks")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"stale"})
+
+    async def scenario():
+        middleware = ResponseCacheMiddleware(app, cache, {"/api/status": "status_checks"})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/status", "query_string": b"", "headers": []}
+        await middleware(scope, None, send)
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent[-1]["body"] == b"stale"
+    assert fake_redis.values == {}
+
+
+def test_post_status_invalidates_cached_pages(server, client, fake_redis):
+    server.response_cache.backend = RedisCacheBackend("redis://fake")
+
+    first = client.get("/api/status")
+    assert first.headers["x-cache"] == "MISS"
+    assert client.get("/api/status").headers["x-cache"] == "HIT"
+    assert fake_redis.values
+
+    assert client.post("/api/status", json={"client_name": "new"}).status_code == 200
+    assert fake_redis.values == {}
+
+    after = client.get("/api/status")
+    assert after.headers["x-cache"] == "MISS"
+    assert [doc["client_name"] for doc in after.json()] == ["new"]
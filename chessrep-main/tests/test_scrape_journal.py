@@ -0,0 +1,126 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+import scrape_lichess_studies  # noqa: E402
+from scrape_journal import ScrapeJournal, default_journal_path  # noqa: E402
+
+URLS = [f"https://lichess.org/study/s{i}" for i in range(4)]
+
+
+def test_replay_restores_links_pages_and_results(tmp_path):
+    path = tmp_path / "studies.journal.jsonl"
+    journal = ScrapeJournal(path)
+    for url in URLS[:3]:
+        journal.record_link(url)
+    journal.record_page(1)
+    journal.record_result(URLS[0], True)
+    journal.record_result(URLS[1], False, attempts=2, error="HTTP 500")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"event": "result", "url": "' + URLS[2])  # torn write from a crash
+
+    replayed = ScrapeJournal(path)
+
+    assert replayed.links == URLS[:3]
+    assert (replayed.last_page, replayed.listing_complete) == (1, False)
+    assert replayed.is_done(URLS[0]) and not replayed.is_done(URLS[1])
+    assert replayed.attempts(URLS[1]) == 2 and replayed.failed() == [URLS[1]]
+    assert replayed.results[URLS[1]]["error"] == "HTTP 500"
+    assert replayed.attempts(URLS[2]) == 0
+    replayed.close()
+
+
+def test_every_run_appends_to_the_history(tmp_path):
+    path = default_journal_path(tmp_path / "studies")
+    for _ in range(3):
+        journal = ScrapeJournal(path)
+        journal.record_link(URLS[0])
+        journal.record_result(URLS[0], False, error="timeout")
+        journal.close()
+
+    journal = ScrapeJournal(path)
+    assert journal.links == [URLS[0]]
+    assert journal.attempts(URLS[0]) == 3
+    journal.close()
+    results = [json.loads(line) for line in path.read_text().splitlines() if '"result"' in line]
+    assert len(results) == 3
+
+
+def test_quiet_journal_is_still_fsynced(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr("scrape_journal.os.fsync", lambda fd: synced.append(fd))
+    journal = ScrapeJournal(tmp_path / "j.jsonl", fsync_every=100, fsync_interval=0.02)
+
+    journal.record_link(URLS[0])
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(synced) == 1  # without any further record
+    journal.close()
+    assert len(synced) == 1  # nothing left to sync
+
+
+class OfflineScraper(scrape_lichess_studies.LichessStudyScraper):
+    """Serves the links from a list and records which studies it downloads."""
+
+    def __init__(self, output_folder, links, fail=(), **kwargs):
+        super().__init__(output_folder=output_folder, **kwargs)
+        self.offline_links = links
+        self.fail = set(fail)
+        self.downloaded = []
+
+    def get_study_links(self, max_studies=100):
+        links = list(self.journal.links) if self.resume else []
+        for url in self.offline_links:
+            if url not in links:
+                self.journal.record_link(url)
+                links.append(url)
+        return links[:max_studies]
+
+    def download_study_pgn(self, study_url, index):
+        self.downloaded.append(study_url)
+        ok = study_url not in self.fail
+        self.journal.record_result(study_url, ok, error=None if ok else "HTTP 500")
+        return ok
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(scrape_lichess_studies.time, "sleep", lambda seconds: None)
+
+
+def test_resume_skips_done_and_exhausted_studies(tmp_path, no_sleep):
+    folder = str(tmp_path / "studies")
+    first = OfflineScraper(folder, URLS, fail=URLS[1:3])
+    first.scrape_studies(max_studies=10)
+    assert first.downloaded == URLS
+
+    # URLS[2] has failed twice in total after this run
+    second = OfflineScraper(folder, URLS, fail=URLS[2:3], resume=True)
+    second.scrape_studies(max_studies=10)
+    assert second.downloaded == URLS[1:3]
+
+    third = OfflineScraper(folder, URLS, fail=URLS[2:3], resume=True)
+    third.scrape_studies(max_studies=10, max_attempts=2)
+    assert third.downloaded == []
+
+
+def test_fresh_run_downloads_everything_but_keeps_the_history(tmp_path, no_sleep):
+    folder = str(tmp_path / "studies")
+    OfflineScraper(folder, URLS, fail=URLS[:1]).scrape_studies(max_studies=10)
+
+    fresh = OfflineScraper(folder, URLS)
+    fresh.scrape_studies(max_studies=10)
+
+    assert fresh.downloaded == URLS
+    journal = ScrapeJournal(default_journal_path(folder))
+    assert journal.attempts(URLS[0]) == 2 and journal.is_done(URLS[0])
+    journal.close()
@@ -0,0 +1,90 @@
+import pytest
+
+from chessdata.bitboard import Board
+from chessdata.position_table import PositionTable, build_table
+from chessdata.similarity import SimilarityIndex, build_similarity
+
+PAWNS = "4k3/pppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1"
+POSITIONS = [
+    PAWNS,
+    "4k3/pppppppp/8/8/4P3/8/PPPP1PPP/4K3 b - - 0 1",    # e-pawn advanced: pawn distance 2
+    "4k3/1ppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 1",      # a black pawn fewer: 1 + 1
+    "4k3/pppppppp/8/8/8/8/PPPPPPPP/3QK3 w - - 0 1",     # an extra queen: 9
+    "4k3/8/8/8/8/8/8/R3K3 w - - 0 1",                   # no pawns at all
+]
+
+
+@pytest.fixture(scope="module")
+def directories(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("similarity")
+    csv_path = folder / "positions.csv"
+    csv_path.write_text("Index,FEN,Answer1,Answer2,CorrectAnswer\n" + "".join(
+        f"{i},{fen},Ke2,Kd2,Answer1\n" for i, fen in enumerate(POSITIONS, start=1)))
+    build_table(csv_path, [], folder / "table", workers=1)
+    meta = build_similarity(PositionTable(folder / "table"), folder / "index", tables=8, bits=4)
+    assert meta["positions"] == len(POSITIONS)
+    return folder / "table", folder / "index"
+
+
+@pytest.fixture
+def index(directories):
+    table_dir, index_dir = directories
+    return SimilarityIndex.load(index_dir, PositionTable(table_dir))
+
+
+def test_load_checks_the_table_and_indexes_references(directories, tmp_path):
+    table_dir, index_dir = directories
+    table = PositionTable(table_dir)
+    assert table._by_row is None
+
+    SimilarityIndex.load(index_dir, table)
+
+    # Built at load time, not by the first request
+    assert table._by_row is not None
+    csv_path = tmp_path / "other.csv"
+    csv_path.write_text(f"Index,FEN,Answer1,Answer2,CorrectAnswer\n1,{PAWNS},Ke2,Kd2,Answer1\n")
+    build_table(csv_path, [], tmp_path / "other", workers=1)
+    with pytest.raises(ValueError, match="another position table"):
+        SimilarityIndex.load(index_dir, PositionTable(tmp_path / "other"))
+
+
+def test_nearest_first_without_the_position_itself(index):
+    result = index.search(PAWNS, k=10)
+
+    assert result["fen"] == PAWNS
+    fens = [p["fen"] for p in result["positions"]]
+    assert PAWNS not in fens
+    distances = [p["distance"] for p in result["positions"]]
+    assert distances == sorted(distances)
+    # Equal distance: the position with more pieces on the same squares first
+    assert fens[:3] == [POSITIONS[2], POSITIONS[1], POSITIONS[3]]
+    assert [(p["pawn_distance"], p["material_distance"]) for p in result["positions"][:3]] == [(1, 1), (2, 0), (0, 9)]
+    first = result["positions"][0]
+    assert first["id"] == f"{Board(POSITIONS[2]).zobrist():016x}" and first["puzzles"] == [3]
+
+
+def test_k_and_max_distance(index):
+    assert len(index.search(PAWNS, k=1)["positions"]) == 1
+
+    close = index.search(PAWNS, k=10, max_distance=2)
+
+    assert [p["fen"] for p in close["positions"]] == [POSITIONS[2], POSITIONS[1]]
+    assert index.search(PAWNS, k=10, max_distance=0)["positions"] == []
+    # A position outside the table is not excluded from anything
+    outside = index.search("4k3/pppppppp/8/8/8/8/PPPPPPPP/4KQ2 w - - 0 1", k=1)
+    assert [p["fen"] for p in outside["positions"]] == [POSITIONS[3]]
+    assert outside["positions"][0]["distance"] == 0
+
+
+def test_similar_positions_endpoint(index, server, client, monkeypatch):
+    assert client.get("/api/positions/similar", params={"fen": PAWNS}).status_code == 503
+
+    monkeypatch.setattr(server, "similarity_index", index)
+    response = client.get("/api/positions/similar", params={"fen": PAWNS, "k": 2})
+
+    assert response.status_code == 200
+    assert [p["fen"] for p in response.json()["positions"]] == [POSITIONS[2], POSITIONS[1]]
+    limited = client.get("/api/positions/similar", params={"fen": PAWNS, "max_distance": 1})
+    assert limited.json()["positions"] == []
+    assert client.get("/api/positions/similar", params={"fen": "not a fen"}).status_code == 400
+    assert client.get("/api/positions/similar", params={"fen": PAWNS, "k": 0}).status_code == 422
@@ -0,0 +1,82 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_query():
+    group = SingleFlight()
+    runs = []
+
+    async def read():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "page"
+
+    async def scenario():
+        return await asyncio.gather(*(group.do("key", read) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["page"] * 5
+    assert len(runs) == 1 and group.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+
+def test_read_after_forget_does_not_join_pre_write_query():
+    group = SingleFlight()
+    rows = []
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def read():
+            snapshot = list(rows)
+            started.set()
+            await release.wait()
+            return snapshot
+
+        before = asyncio.ensure_future(group.do("key", read))
+        await started.wait()  # the pre-write query has taken its snapshot
+        rows.append("written")
+        group.forget()  # what the write path does once the write has landed
+        after = asyncio.ensure_future(group.do("key", read))
+        await asyncio.sleep(0)
+        release.set()
+        return await before, await after
+
+    before, after = asyncio.run(scenario())
+    assert before == []
+    assert after == ["written"]
+    assert group.stats() == {"calls": 2, "shared": 0, "in_flight": 0}
+
+
+def test_durable_write_detaches_status_read_in_flight(server, monkeypatch):
+    from write_behind import WriteBehindBuffer
+
+    async def scenario():
+        paused, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_plan_check(route, cursor, query):
+            # Holds the first (pre-write) status read open across the write
+            if not paused.is_set():
+                paused.set()
+                await release.wait()
+
+        monkeypatch.setattr(server, "check_query_plan", slow_plan_check)
+        writer = WriteBehindBuffer(server.db.status_checks, max_delay=0.001, on_flush=server.invalidate_status_cache)
+        monkeypatch.setattr(server, "status_writer", writer)
+        writer.start()
+        calls = server.read_flights.calls
+        try:
+            in_flight = asyncio.ensure_future(server.load_status_page(None, 10))
+            await paused.wait()
+            await server.create_status_check(server.StatusCheckCreate(client_name="durable"), durable=True)
+            after_write = asyncio.ensure_future(server.load_status_page(None, 10))
+            await asyncio.sleep(0.01)
+            release.set()
+            await in_flight
+            docs, _ = await after_write
+        finally:
+            await writer.stop()
+        return docs, server.read_flights.calls - calls
+
+    docs, calls = asyncio.run(scenario())
+    assert [doc["client_name"] for doc in docs] == ["durable"]
+    assert calls == 2
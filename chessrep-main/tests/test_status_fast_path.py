@@ -0,0 +1,29 @@
+import asyncio
+import json
+from datetime import datetime
+
+FIELDS = {"id", "client_name", "timestamp"}
+
+
+def insert_with_extra_field(server):
+    doc = {"id": "id-0", "client_name": "c", "timestamp": datetime(2026, 1, 1), "ip_address": "203.0.113.9"}
+    asyncio.run(server.db.status_checks.insert_one(doc))
+
+
+def test_fast_path_returns_only_the_model_fields(server, client):
+    insert_with_extra_field(server)
+
+    fast = client.get("/api/status", params={"fast": "true"}).json()
+    validated = client.get("/api/status", params={"fast": "false", "limit": 999}).json()
+
+    assert [set(doc) for doc in fast] == [FIELDS]
+    assert fast[0]["id"] == validated[0]["id"] == "id-0"
+    assert [set(doc) for doc in validated] == [FIELDS]
+
+
+def test_stream_returns_only_the_model_fields(server, client):
+    insert_with_extra_field(server)
+
+    response = client.get("/api/status/stream")
+
+    assert [set(json.loads(line)) for line in response.text.splitlines()] == [FIELDS]
@@ -0,0 +1,64 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+
+def insert_status_checks(server, docs):
+    asyncio.run(server.db.status_checks.insert_many([dict(doc) for doc in docs]))
+
+
+def read_all_pages(client, limit):
+    pages, after = [], None
+    while True:
+        params = {"limit": limit, "after": after} if after else {"limit": limit}
+        response = client.get("/api/status", params=params)
+        assert response.status_code == 200
+        pages.append([doc["id"] for doc in response.json()])
+        after = response.headers.get("x-next-cursor")
+        if after is None:
+            return pages
+        assert response.headers["link"].endswith('rel="next"')
+
+
+def test_cursor_walks_every_document_once_in_order(server, client):
+    start = datetime(2026, 1, 1)
+    docs = [{"id": f"id-{i:02d}", "client_name": f"c{i}", "timestamp": start + timedelta(seconds=i)} for i in range(7)]
+    insert_status_checks(server, docs)
+
+    pages = read_all_pages(client, 3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == [doc["id"] for doc in docs]
+
+
+def test_cursor_breaks_timestamp_ties_by_id(server, client):
+    # Same timestamp for every document: only the id orders them
+    now = datetime(2026, 1, 1)
+    docs = [{"id": f"id-{i}", "client_name": "tie", "timestamp": now} for i in (4, 1, 3, 0, 2)]
+    insert_status_checks(server, docs)
+
+    assert sum(read_all_pages(client, 2), []) == [f"id-{i}" for i in range(5)]
+
+
+def test_last_full_page_has_no_next_cursor(server, client):
+    start = datetime(2026, 1, 1)
+    insert_status_checks(server, [{"id": f"id-{i}", "client_name": "c", "timestamp": start + timedelta(seconds=i)}
+                                  for i in range(4)])
+
+    assert [len(page) for page in read_all_pages(client, 2)] == [2, 2]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/api/status", params={"after": "not-a-cursor"}).status_code == 400
+
+
+def test_stream_resumes_after_cursor(server, client):
+    start = datetime(2026, 1, 1)
+    insert_status_checks(server, [{"id": f"id-{i}", "client_name": "c", "timestamp": start + timedelta(seconds=i)}
+                                  for i in range(5)])
+    cursor = client.get("/api/status", params={"limit": 2}).headers["x-next-cursor"]
+
+    response = client.get("/api/status/stream", params={"after": cursor})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == ["id-2", "id-3", "id-4"]
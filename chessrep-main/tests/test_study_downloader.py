@@ -0,0 +1,141 @@
+"""
+Concurrent study downloads against a local stub of lichess: a threaded
+http.server serving fixture study-list pages and PGNs, recording which
+connection and when each request arrived.
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+from scrape_lichess_studies import LichessStudyScraper  # noqa: E402
+from study_downloader import ConcurrentStudyDownloader  # noqa: E402
+
+STUDY_IDS = [f"stub{i:02d}" for i in range(8)]
+PGN = '[Event "Stub: Chapter 1"]\n[ChapterURL "https://lichess.org/study/{0}/ch1"]\n\n1. e4 e5 2. Nf3 *\n'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server
+        with stub.lock:
+            stub.requests.append((time.monotonic(), self.client_address[1], self.path))
+            throttle = self.path in stub.throttle
+            stub.throttle.discard(self.path)
+        path, _, query = self.path.partition("?")
+        if throttle:
+            self._send(429, headers=[("Retry-After", str(stub.retry_after))])
+        elif path == "/study":
+            links = "".join(f'<a href="/study/{sid}">{sid}</a>' for sid in STUDY_IDS) if query == "page=1" else ""
+            self._send(200, f"<html><body>{links}</body></html>".encode(), [("Content-Type", "text/html")])
+        elif path.startswith("/study/") and path.endswith(".pgn"):
+            study_id = path[len("/study/"):-len(".pgn")]
+            self._send(200, PGN.format(study_id).encode(), [("Content-Type", "application/x-chess-pgn")])
+        else:
+            self._send(404)
+
+
+@pytest.fixture
+def stub():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.throttle = set()
+    httpd.retry_after = 1
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def scraper(stub, tmp_path):
+    scraper = LichessStudyScraper(output_folder=str(tmp_path / "studies"), base_url=stub.base_url)
+    yield scraper
+    scraper.journal.close()
+    scraper.session.close()
+
+
+def jobs(scraper):
+    return [(index, f"{scraper.base_url}/study/{sid}") for index, sid in enumerate(STUDY_IDS, 1)]
+
+
+def pgn_requests(stub):
+    return [request for request in stub.requests if request[2].endswith(".pgn")]
+
+
+def test_study_links_come_from_the_listing_pages(stub, scraper):
+    links = scraper.get_study_links(max_studies=len(STUDY_IDS))
+
+    assert links == [f"{stub.base_url}/study/{sid}" for sid in STUDY_IDS]
+    assert stub.requests[0][2] == "/study?page=1"
+
+
+def test_downloads_reuse_pooled_connections(stub, scraper):
+    downloader = ConcurrentStudyDownloader(scraper, concurrency=2, rate=50, burst=2)
+
+    assert downloader.run(jobs(scraper)) == (len(STUDY_IDS), 0)
+
+    requests = pgn_requests(stub)
+    assert len(requests) == len(STUDY_IDS)
+    # Every request went over one of at most `concurrency` keep-alive connections
+    assert len({port for _, port, _ in requests}) <= 2
+    saved = sorted(p.name for p in Path(scraper.output_folder).glob("*.pgn"))
+    assert saved == [f"{index:03d}_{sid}.pgn" for index, sid in enumerate(STUDY_IDS, 1)]
+
+
+def test_request_rate_stays_under_the_global_limit(stub, scraper):
+    rate = 10
+    downloader = ConcurrentStudyDownloader(scraper, concurrency=4, rate=rate, burst=1)
+
+    assert downloader.run(jobs(scraper)) == (len(STUDY_IDS), 0)
+
+    times = [at for at, _, _ in pgn_requests(stub)]
+    assert len(times) == len(STUDY_IDS)
+    # Four workers, yet requests are spaced by the one shared bucket (small slack for scheduling)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) > 0.8 / rate
+    assert (len(times) - 1) / (times[-1] - times[0]) <= rate * 1.05
+
+
+def test_429_with_retry_after_pauses_every_download(stub, scraper):
+    throttled = f"/study/{STUDY_IDS[2]}.pgn"
+    stub.throttle.add(throttled)
+    downloader = ConcurrentStudyDownloader(scraper, concurrency=3, rate=50, burst=1)
+
+    assert downloader.run(jobs(scraper)) == (len(STUDY_IDS), 0)
+    assert downloader.throttled == 1
+    assert downloader.retries == 1
+
+    requests = pgn_requests(stub)
+    assert len(requests) == len(STUDY_IDS) + 1
+    paths = [path for _, _, path in requests]
+    assert paths.count(throttled) == 2
+    # No request of any study went out during the Retry-After window
+    limited_at = requests[paths.index(throttled)][0]
+    after = [at for at, _, _ in requests if at > limited_at]
+    assert after and min(after) - limited_at >= stub.retry_after * 0.95
+    assert scraper.journal.attempts(f"{scraper.base_url}{throttled[:-len('.pgn')]}") == 2
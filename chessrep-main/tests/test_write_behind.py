@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    """Records insert calls; insert_many can fail per index, fail outright or block."""
+
+    def __init__(self, failed_indexes=(), error=None):
+        self.batches = []
+        self.single = []
+        self.failed_indexes = set(failed_indexes)
+        self.error = error
+        self.gate = None  # an asyncio.Event that insert_many waits on, when set
+
+    async def insert_many(self, documents, ordered=True):
+        assert ordered is False
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        self.batches.append([d["n"] for d in documents])
+        if self.failed_indexes:
+            raise BulkWriteError({"writeErrors": [
+                {"index": i, "errmsg": f"duplicate {documents[i]['n']}"} for i in sorted(self.failed_indexes)
+            ]})
+
+    async def insert_one(self, document):
+        self.single.append(document["n"])
+
+
+def test_batch_goes_out_when_it_reaches_max_batch():
+    collection = FakeCollection()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=3, max_delay=60)
+        buffer.start()
+        for n in range(3):
+            await buffer.submit({"n": n})
+        for _ in range(5):
+            await asyncio.sleep(0)
+        written = list(collection.batches)
+        await buffer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == [[0, 1, 2]]
+
+
+def test_batch_goes_out_after_max_delay():
+    collection = FakeCollection()
+    flushes = []
+
+    async def on_flush():
+        flushes.append(len(collection.batches))
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=100, max_delay=0.02, on_flush=on_flush)
+        buffer.start()
+        await buffer.submit({"n": 0})
+        await buffer.submit({"n": 1})
+        assert collection.batches == []
+        await asyncio.sleep(0.1)
+        written = list(collection.batches)
+        await buffer.stop()
+        return written, buffer.batches_written, buffer.documents_written
+
+    assert asyncio.run(scenario()) == ([[0, 1]], 1, 2)
+    assert flushes == [1]
+
+
+def test_durable_submit_waits_for_its_batch():
+    collection = FakeCollection()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=100, max_delay=0.01)
+        buffer.start()
+        await buffer.submit({"n": 0}, durable=True)
+        written = list(collection.batches)
+        await buffer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == [[0]]
+
+
+def test_bulk_write_error_fails_only_the_listed_documents():
+    collection = FakeCollection(failed_indexes=[1])
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=3, max_delay=60)
+        buffer.start()
+        results = await asyncio.gather(
+            *(buffer.submit({"n": n}, durable=True) for n in range(3)), return_exceptions=True
+        )
+        await buffer.stop()
+        return buffer, results
+
+    buffer, results = asyncio.run(scenario())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], RuntimeError) and "duplicate 1" in str(results[1])
+    assert (buffer.documents_written, buffer.write_errors) == (2, 1)
+
+
+def test_failed_batch_fails_every_durable_submit():
+    collection = FakeCollection(error=ConnectionError("mongo down"))
+    flushes = []
+
+    async def on_flush():
+        flushes.append(1)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=2, max_delay=60, on_flush=on_flush)
+        buffer.start()
+        results = await asyncio.gather(
+            *(buffer.submit({"n": n}, durable=True) for n in range(2)), return_exceptions=True
+        )
+        await buffer.stop()
+        return buffer, results
+
+    buffer, results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) and "mongo down" in str(r) for r in results)
+    assert (buffer.documents_written, buffer.write_errors) == (0, 2)
+    assert flushes == []
+
+
+def test_stop_flushes_what_is_queued():
+    collection = FakeCollection()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(collection, max_batch=100, max_delay=60)
+        buffer.start()
+        for n in range(4):
+            await buffer.submit({"n": n})
+        await buffer.stop()
+        await buffer.submit({"n": 4})  # after shutdown: written directly
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert collection.batches == [[0, 1, 2, 3]]
+    assert collection.single == [4]
+    assert not buffer.running
+
+
+def test_submit_during_shutdown_is_written_directly():
+    collection = FakeCollection()
+
+    async def scenario():
+        collection.gate = asyncio.Event()
+        buffer = WriteBehindBuffer(collection, max_batch=100, max_delay=0)
+        buffer.start()
+        await buffer.submit({"n": 0})
+        await asyncio.sleep(0.01)  # batch [0] is now blocked inside insert_many
+        stopping = asyncio.ensure_future(buffer.stop())
+        await asyncio.sleep(0)
+        # Used to queue behind _STOP and wait forever
+        await asyncio.wait_for(buffer.submit({"n": 1}, durable=True), 1)
+        collection.gate.set()
+        await stopping
+
+    asyncio.run(scenario())
+    assert collection.single == [1]
+    assert collection.batches == [[0]]
+
+
+def test_cancelled_drain_task_fails_waiting_durable_submits():
+    collection = FakeCollection()
+
+    async def scenario():
+        collection.gate = asyncio.Event()  # never set: the database hangs
+        buffer = WriteBehindBuffer(collection, max_batch=1, max_delay=0)
+        buffer.start()
+        writes = [asyncio.ensure_future(buffer.submit({"n": n}, durable=True)) for n in range(2)]
+        await asyncio.sleep(0.01)
+        buffer._task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*writes, return_exceptions=True), 1)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 2
+    for result in results:
+        with pytest.raises(RuntimeError, match="stopped before"):
+            raise result
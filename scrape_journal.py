@@ -0,0 +1,139 @@
+"""
+Append-only journal for LichessStudyScraper runs.
+
+One JSON record per line in lichess_studies.journal.jsonl (next to the output
+folder):
+
+    {"event": "link", "url": ..., "index": n}          study link discovered
+    {"event": "page", "page": n, "last": bool}         listing page fully crawled
+    {"event": "result", "url": ..., "status": "done" | "failed",
+     "attempts": n, "error": ...}                      outcome of one download
+
+Every run appends to the same journal, so the attempt history of earlier
+runs is never lost. Replaying it gives the discovered links (in discovery
+order, so NNN_ file numbers stay stable), the last listing page crawled, and
+each study's latest outcome and total attempt count. Only `--resume` acts on
+that: it skips the crawl, never re-fetches completed studies and retries only
+the failures; a run without it crawls and downloads everything again.
+
+Writes go to the OS on every record but are fsync'ed in batches (every
+`fsync_every` records, every `fsync_interval` seconds from a background
+thread even when nothing else is written, and on close), so the hot path
+stays cheap; a crash loses at most the last unsynced batch, and that work is
+simply redone. A torn last line is ignored on replay.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def default_journal_path(output_folder) -> Path:
+    output_folder = Path(output_folder)
+    return output_folder.parent / f"{output_folder.name}.journal.jsonl"
+
+
+class ScrapeJournal:
+    def __init__(self, path, fsync_every=32, fsync_interval=1.0):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.links = []              # study URLs in discovery order
+        self.last_page = 0
+        self.listing_complete = False
+        self.results = {}            # url -> {"status", "attempts", "error"}
+        self._known_links = set()
+        if self.path.exists():
+            self._replay()
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._unsynced = 0
+        # Records are written from the scraper's threads and synced from the timer thread
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_periodically, name="journal-fsync", daemon=True)
+        self._syncer.start()
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                event = record.get("event")
+                if event == "link":
+                    if record["url"] not in self._known_links:
+                        self._known_links.add(record["url"])
+                        self.links.append(record["url"])
+                elif event == "page":
+                    self.last_page = max(self.last_page, record["page"])
+                    self.listing_complete = self.listing_complete or record.get("last", False)
+                elif event == "result":
+                    previous = self.results.get(record["url"], {})
+                    self.results[record["url"]] = {
+                        "status": record["status"],
+                        "attempts": previous.get("attempts", 0) + record.get("attempts", 1),
+                        "error": record.get("error"),
+                    }
+
+    def _append(self, record):
+        with self._lock:
+            self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._f.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._f.fileno())
+            self._unsynced = 0
+
+    def _sync_periodically(self):
+        # A journal that goes quiet (a long download, a backoff pause) still reaches the disk
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        with self._lock:
+            if not self._f.closed:
+                self._sync()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if not self._f.closed:
+                self._sync()
+                self._f.close()
+
+    def record_link(self, url):
+        if url in self._known_links:
+            return False
+        self._known_links.add(url)
+        self.links.append(url)
+        self._append({"event": "link", "url": url, "index": len(self.links)})
+        return True
+
+    def record_page(self, page, last=False):
+        self.last_page = max(self.last_page, page)
+        self.listing_complete = self.listing_complete or last
+        self._append({"event": "page", "page": page, "last": last})
+
+    def record_result(self, url, ok, attempts=1, error=None):
+        status = "done" if ok else "failed"
+        previous = self.results.get(url, {})
+        self.results[url] = {"status": status, "attempts": previous.get("attempts", 0) + attempts, "error": error}
+        record = {"event": "result", "url": url, "status": status, "attempts": attempts}
+        if error:
+            record["error"] = error
+        self._append(record)
+
+    def is_done(self, url) -> bool:
+        return self.results.get(url, {}).get("status") == "done"
+
+    def attempts(self, url) -> int:
+        return self.results.get(url, {}).get("attempts", 0)
+
+    def failed(self):
+        return [url for url, result in self.results.items() if result["status"] == "failed"]
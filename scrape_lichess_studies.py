@@ -3,38 +3,72 @@ Lichess Studies Scraper
 Scrapes chess studies from lichess.org/study and downloads their PGN files
 """
 
-import requests
+import argparse
 from bs4 import BeautifulSoup
+import hashlib
+import threading
 import time
 import os
+import sys
 from pathlib import Path
 import re
 
+# Shared corpus tooling (manifest, parser) lives with the backend
+sys.path.insert(0, str(Path(__file__).resolve().parent / "chessrep-main" / "backend"))
+from chessdata.archive import StudyArchive, default_archive_path
+from chessdata.manifest import StudyManifest, default_manifest_path
+from scrape_journal import ScrapeJournal, default_journal_path
+from study_downloader import ConcurrentStudyDownloader, pooled_session
+
+CHUNK_SIZE = 1 << 16
+
 class LichessStudyScraper:
-    def __init__(self, output_folder="lichess_studies"):
-        self.base_url = "https://lichess.org"
+    def __init__(self, output_folder="lichess_studies", base_url="https://lichess.org", pool_size=10, resume=False,
+                 archive=None):
+        self.base_url = base_url.rstrip("/")
         self.study_list_url = f"{self.base_url}/study"
         self.output_folder = output_folder
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
+        # One keep-alive connection pool for listing pages and PGN downloads
+        self.session = pooled_session(self.headers, pool_size=pool_size)
+
         # Create output folder if it doesn't exist
         Path(self.output_folder).mkdir(parents=True, exist_ok=True)
+
+        # Content hashes / validators of previous downloads, so unchanged studies are skipped
+        self.manifest = StudyManifest(default_manifest_path(self.output_folder))
+        self.unchanged = 0
+        # Guards the manifest and counters when downloads are stored from worker threads
+        self._lock = threading.Lock()
+
+        # Optional single-archive store (chessdata.archive) instead of one .pgn file per study
+        self.archive = StudyArchive(archive, writable=True) if archive else None
+
+        # Discovered links and per-study outcomes of every run; --resume continues from them
+        self.resume = resume
+        self.journal = ScrapeJournal(default_journal_path(self.output_folder))
     
     def get_study_links(self, max_studies=100):
         """
         Scrape study links from the main studies page
         """
-        print(f"Fetching studies from {self.study_list_url}...")
-        study_links = []
-        page = 1
+        # Links found by earlier runs (only used with --resume)
+        study_links = list(self.journal.links) if self.resume else []
+        if study_links and (self.journal.listing_complete or len(study_links) >= max_studies):
+            print(f"Using {len(study_links)} study links from the journal")
+            return study_links[:max_studies]
+        page = self.journal.last_page + 1 if self.resume else 1
+        seen = set(study_links)
+        print(f"Fetching studies from {self.study_list_url} (page {page})...")
         
         while len(study_links) < max_studies:
             try:
                 # Lichess uses pagination
                 url = f"{self.study_list_url}?page={page}"
-                response = requests.get(url, headers=self.headers, timeout=10)
+                response = self.session.get(url, timeout=10)
                 response.raise_for_status()
                 
                 soup = BeautifulSoup(response.text, 'html.parser')
@@ -45,18 +79,24 @@ class LichessStudyScraper:
                 
                 if not study_elements:
                     print(f"No more studies found on page {page}")
+                    self.journal.record_page(page, last=True)
                     break
                 
                 for element in study_elements:
                     study_path = element['href']
                     study_url = f"{self.base_url}{study_path}"
                     
-                    if study_url not in study_links:
+                    if study_url not in seen:
+                        seen.add(study_url)
+                        self.journal.record_link(study_url)
                         study_links.append(study_url)
                         print(f"Found study {len(study_links)}: {study_url}")
                     
                     if len(study_links) >= max_studies:
                         break
+                else:
+                    # Only a page whose links were all taken counts as crawled
+                    self.journal.record_page(page)
                 
                 page += 1
                 time.sleep(1)  # Be respectful to the server
@@ -67,38 +107,113 @@ class LichessStudyScraper:
         
         return study_links[:max_studies]
     
+    def _known_file(self, study_id):
+        """Manifest entry for a study, or None when there is no local copy yet."""
+        if self.archive is not None:
+            return self.archive.entry(study_id)
+        known = self.manifest.get(study_id)
+        if not known.get("file"):
+            # Downloaded before the manifest existed: adopt the existing file
+            existing = sorted(Path(self.output_folder).glob(f"*_{study_id}.pgn"))
+            if existing:
+                known = {"file": existing[-1].name, "sha256": None}
+        if known.get("file") and os.path.exists(os.path.join(self.output_folder, known["file"])):
+            return known
+        return None
+
+    def fetch_study_pgn(self, study_url):
+        """
+        Request the PGN for a study (conditional when we already have it); returns the response
+        """
+        study_id = study_url.split('/')[-1]
+        # Lichess PGN download URL format
+        pgn_url = f"{study_url}.pgn"
+        headers = {}
+        if self._known_file(study_id):
+            # Conditional request: lets the server answer 304 for an unchanged study
+            headers.update(self.manifest.conditional_headers(study_id))
+        # Streamed: the body is read chunk by chunk by store_study_pgn
+        return self.session.get(pgn_url, headers=headers, timeout=15, stream=True)
+
+    def store_study_pgn(self, study_url, index, response):
+        """
+        Save a fetched PGN unless it is unchanged; returns True on success
+        """
+        study_id = study_url.split('/')[-1]
+        known = self._known_file(study_id)
+        with response:
+            if response.status_code == 304:
+                with self._lock:
+                    self.unchanged += 1
+                print(f"= Unchanged (304): {known['file'] if known else study_id}")
+                return True
+            response.raise_for_status()
+
+            # Keep the existing NNN_ file name for a study we already have
+            filename = known["file"] if known and known.get("file") else f"{index:03d}_{study_id}.pgn"
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+            if self.archive is not None:
+                entry = self.archive.append(study_id, chunks, filename,
+                                            skip_if_sha256=known["sha256"] if known else None)
+                saved = entry is not None
+                digest, size = (entry["sha256"], entry["size"]) if saved else (known["sha256"], known["size"])
+            else:
+                filepath = os.path.join(self.output_folder, filename)
+                partial = filepath + ".part"
+                hasher = hashlib.sha256()
+                size = 0
+                with open(partial, 'wb') as f:
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        f.write(chunk)
+                digest = hasher.hexdigest()
+                saved = not known or digest != self.manifest.get(study_id).get("sha256")
+
+        with self._lock:
+            self.manifest.record_download(
+                study_id, filename, digest, size,
+                etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"),
+            )
+            if not saved:
+                self.unchanged += 1
+        if self.archive is None:
+            if saved:
+                os.replace(partial, filepath)
+            else:
+                os.remove(partial)
+        if not saved:
+            print(f"= Unchanged (same content hash): {filename}")
+            return True
+
+        print(f"✓ Saved: {filename}" + (f" (archive {self.archive.path.name})" if self.archive is not None else ""))
+        return True
+
     def download_study_pgn(self, study_url, index):
         """
         Download PGN file for a specific study
         """
         try:
-            # Extract study ID from URL
             study_id = study_url.split('/')[-1]
-            
-            # Lichess PGN download URL format
-            pgn_url = f"{study_url}.pgn"
-            
             print(f"Downloading PGN for study {index}: {study_id}...")
-            response = requests.get(pgn_url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            
-            # Save PGN file
-            filename = f"{index:03d}_{study_id}.pgn"
-            filepath = os.path.join(self.output_folder, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            
-            print(f"✓ Saved: {filename}")
-            return True
+            response = self.fetch_study_pgn(study_url)
+            ok = self.store_study_pgn(study_url, index, response)
+            self.journal.record_result(study_url, ok)
+            return ok
             
         except Exception as e:
             print(f"✗ Error downloading {study_url}: {e}")
+            self.journal.record_result(study_url, False, error=str(e))
             return False
     
-    def scrape_studies(self, max_studies=100):
+    def scrape_studies(self, max_studies=100, concurrency=1, rate=0.5, max_attempts=5):
         """
         Main method to scrape and download studies
+
+        concurrency > 1 downloads several studies at once over the shared
+        connection pool, at no more than `rate` requests per second overall.
+        When resuming, completed studies are skipped and failed ones are
+        retried until they have had `max_attempts` attempts in total.
         """
         print(f"\n{'='*60}")
         print(f"Lichess Studies Scraper")
@@ -107,39 +222,88 @@ class LichessStudyScraper:
         # Get study links
         study_links = self.get_study_links(max_studies)
         
+        # Numbering follows discovery order, so it stays stable across resumed runs
+        jobs = []
+        completed = exhausted = 0
+        for index, study_url in enumerate(study_links, 1):
+            if not self.resume:
+                jobs.append((index, study_url))
+            elif self.journal.is_done(study_url):
+                completed += 1
+            elif self.journal.attempts(study_url) >= max_attempts:
+                exhausted += 1
+            else:
+                jobs.append((index, study_url))
+
         print(f"\n{'='*60}")
         print(f"Found {len(study_links)} studies. Starting downloads...")
+        if self.resume:
+            print(f"Resuming: {completed} already done, {exhausted} gave up after {max_attempts} attempts, "
+                  f"{len(jobs)} to download")
         print(f"{'='*60}\n")
         
         # Download PGN files
         successful = 0
         failed = 0
         
-        for index, study_url in enumerate(study_links, 1):
-            if self.download_study_pgn(study_url, index):
-                successful += 1
+        try:
+            if concurrency > 1:
+                downloader = ConcurrentStudyDownloader(self, concurrency=concurrency, rate=rate)
+                successful, failed = downloader.run(jobs)
+                if downloader.throttled:
+                    print(f"Rate limited (429) {downloader.throttled} times, {downloader.retries} retries")
             else:
-                failed += 1
-            
-            # Be respectful to the server
-            time.sleep(2)
+                for index, study_url in jobs:
+                    if self.download_study_pgn(study_url, index):
+                        successful += 1
+                    else:
+                        failed += 1
+
+                    # Be respectful to the server
+                    time.sleep(2)
+        finally:
+            self.manifest.save()
+            self.journal.close()
+            if self.archive is not None:
+                self.archive.sync()
         
         # Summary
         print(f"\n{'='*60}")
         print(f"Download Complete!")
         print(f"{'='*60}")
         print(f"Successful: {successful}")
+        print(f"Unchanged (skipped): {self.unchanged}")
         print(f"Failed: {failed}")
-        print(f"Output folder: {os.path.abspath(self.output_folder)}")
+        if failed:
+            print(f"Run again with --resume to retry only the failed studies")
+        if self.archive is not None:
+            print(f"Archive: {os.path.abspath(self.archive.path)} ({len(self.archive)} studies)")
+        else:
+            print(f"Output folder: {os.path.abspath(self.output_folder)}")
         print(f"{'='*60}\n")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Download lichess studies as PGN")
+    parser.add_argument("--max-studies", type=int, default=100)
+    parser.add_argument("--output", default="lichess_studies")
+    parser.add_argument("--base-url", default="https://lichess.org", help="e.g. a local stub server for testing")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel downloads (1 = sequential)")
+    parser.add_argument("--rate", type=float, default=0.5, help="overall requests per second when concurrent")
+    parser.add_argument("--archive", action="store_true",
+                        help="store studies in one compressed <output>.pack archive instead of .pgn files")
+    parser.add_argument("--resume", action="store_true", help="continue from the journal of a previous run")
+    parser.add_argument("--max-attempts", type=int, default=5, help="give up on a study after this many attempts")
+    args = parser.parse_args()
+
     # Create scraper instance
-    scraper = LichessStudyScraper(output_folder="lichess_studies")
+    scraper = LichessStudyScraper(output_folder=args.output, base_url=args.base_url,
+                                  pool_size=max(args.concurrency, 1), resume=args.resume,
+                                  archive=default_archive_path(args.output) if args.archive else None)
     
-    # Scrape 100 studies
-    scraper.scrape_studies(max_studies=100)
+    # Scrape studies
+    scraper.scrape_studies(max_studies=args.max_studies, concurrency=args.concurrency, rate=args.rate,
+                           max_attempts=args.max_attempts)
 
 
 if __name__ == "__main__":
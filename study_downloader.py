@@ -0,0 +1,169 @@
+"""
+Concurrent study downloader for LichessStudyScraper.
+
+All requests go through one requests.Session whose connection pool is sized
+to the concurrency, so downloads reuse keep-alive connections instead of
+opening a new TCP/TLS connection per study. A handful of downloads run at
+once (blocking requests in worker threads driven by asyncio), all drawing
+from one token bucket, so the overall request rate stays under the polite
+ceiling while the time spent waiting on the network overlaps.
+
+A 429 pauses the whole bucket for Retry-After seconds (or an exponential
+backoff when the header is missing); 5xx responses and connection errors are
+retried with the same backoff.
+
+The scraper's base_url can point at a local stub server for testing:
+    python scrape_lichess_studies.py --base-url http://127.0.0.1:8000 --concurrency 4
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def pooled_session(headers=None, pool_size=10):
+    """A requests.Session keeping up to `pool_size` keep-alive connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Global rate limit shared by every download task: `rate` requests/s, bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock queues waiters so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (server asked us to back off)."""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        # Nothing saved up during the pause may be spent in a burst right after it
+        self.tokens = 0.0
+        self.updated = self.blocked_until
+
+
+class ConcurrentStudyDownloader:
+    def __init__(self, scraper, concurrency=4, rate=0.5, burst=1, max_retries=4, backoff=2.0, max_backoff=60.0):
+        self.scraper = scraper
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.throttled = 0
+        self.retries = 0
+
+    def _backoff_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _download(self, study_url, index, slots):
+        ok, attempts, error = await self._attempt(study_url, index, slots)
+        self.scraper.journal.record_result(study_url, ok, attempts, error)
+        return ok
+
+    async def _attempt(self, study_url, index, slots):
+        """Returns (ok, attempts made, last error)."""
+        study_id = study_url.rstrip("/").split("/")[-1]
+        error = None
+        attempt = 0
+        async with slots:
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire()
+                print(f"Downloading PGN for study {index}: {study_id}...")
+                try:
+                    response = await asyncio.to_thread(self.scraper.fetch_study_pgn, study_url)
+                except requests.RequestException as e:
+                    error = str(e)
+                    if attempt == self.max_retries:
+                        print(f"✗ Error downloading {study_url}: {e}")
+                        return False, attempt + 1, error
+                    delay = self._backoff_delay(attempt)
+                    print(f"! {study_id}: {e}; retrying in {delay:.1f}s")
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = self._backoff_delay(attempt)
+                    if response.status_code == 429:
+                        # Rate limited: every task waits, not just this one
+                        self.throttled += 1
+                        self.bucket.pause(delay)
+                    print(f"! {study_id}: HTTP {response.status_code}; retrying in {delay:.1f}s")
+                    self.retries += 1
+                    response.close()
+                    await asyncio.sleep(delay)
+                    continue
+
+                # The body is streamed while it is stored, so this runs in a worker thread too
+                try:
+                    ok = await asyncio.to_thread(self.scraper.store_study_pgn, study_url, index, response)
+                    return ok, attempt + 1, None
+                except Exception as e:
+                    print(f"✗ Error downloading {study_url}: {e}")
+                    return False, attempt + 1, str(e)
+        return False, attempt + 1, error
+
+    async def download_all(self, jobs):
+        """Download every (index, study URL) job; returns (successful, failed)."""
+        slots = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*[self._download(url, index, slots) for index, url in jobs])
+        successful = sum(1 for ok in results if ok)
+        return successful, len(results) - successful
+
+    def run(self, jobs):
+        return asyncio.run(self.download_all(jobs))